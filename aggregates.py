@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+import pricing
+from pmap import PMap
+
+
+# Reservation statuses tracked by the aggregates
+RESERVED = "reserved"
+CHECKED_IN = "checked_in"
+CHECKED_OUT = "checked_out"
+
+
+def status_of(checked_in, checked_out):
+    if checked_out:
+        return CHECKED_OUT
+    if checked_in:
+        return CHECKED_IN
+    return RESERVED
+
+
+# Running totals behind generate_report, kept up to date on every event so a
+# report never has to walk the reservation history.
+#
+# A stay's revenue is what pricing.py quotes for it, the amount its bill
+# (Billing.generate_bill, calculate_bill) comes to, in Decimal; revenue is
+# split by status because the two front ends count different statuses as
+# revenue. revenue_by_day holds each night's rate before long-stay discounts.
+class HotelAggregates:
+    def __init__(self):
+        self.total_rooms = 0
+        self.occupied_rooms = 0
+        self.status_counts = Counter()                 # status -> reservations
+        self.revenue_by_status = defaultdict(Decimal)  # status -> revenue
+        self.revenue_by_day = PMap()                   # night -> revenue; persistent so copy() can share it
+        self.revenue_by_room_type = defaultdict(Decimal)
+        self.history_loaded = False                  # Checked-out history folded in yet?
+
+    def copy(self):
+        aggregates = HotelAggregates()
+        aggregates.total_rooms = self.total_rooms
+        aggregates.occupied_rooms = self.occupied_rooms
+        aggregates.status_counts = Counter(self.status_counts)
+        aggregates.revenue_by_status = defaultdict(Decimal, self.revenue_by_status)
+        aggregates.revenue_by_day = self.revenue_by_day
+        aggregates.revenue_by_room_type = defaultdict(Decimal, self.revenue_by_room_type)
+        aggregates.history_loaded = self.history_loaded
+        return aggregates
+
+    # ---------------- events ----------------
+
+    def add_room(self, available=True):
+        self.total_rooms += 1
+        if not available:
+            self.occupied_rooms += 1
+
+    def set_occupied(self, was_available, now_available):
+        """Records a room flipping between available and occupied."""
+        if was_available and not now_available:
+            self.occupied_rooms += 1
+        elif now_available and not was_available:
+            self.occupied_rooms -= 1
+
+    def add_reservation(self, room_type, price, start_date, end_date, status=RESERVED):
+        engine = pricing.get_engine()
+        revenue = engine.quote(room_type, price, start_date, end_date).total
+        self.status_counts[status] += 1
+        self.revenue_by_status[status] += revenue
+        self.revenue_by_room_type[room_type] += revenue
+        for day, rate in engine.nightly_rates(room_type, price, start_date, end_date):
+            self.revenue_by_day = self.revenue_by_day.set(day, self.revenue_by_day.get(day, Decimal(0)) + rate)
+
+    def change_status(self, room_type, price, start_date, end_date, old_status, new_status):
+        if old_status == new_status:
+            return
+        # The shared engine's plans are fixed for the process, so this is the amount booked
+        revenue = pricing.quote(room_type, price, start_date, end_date).total
+        self.status_counts[old_status] -= 1
+        self.status_counts[new_status] += 1
+        self.revenue_by_status[old_status] -= revenue
+        self.revenue_by_status[new_status] += revenue
+
+    # ---------------- queries ----------------
+
+    def revenue(self, statuses=(RESERVED, CHECKED_IN, CHECKED_OUT)):
+        return sum(self.revenue_by_status[status] for status in statuses)
+
+
+# Build aggregates from scratch.
+#   rooms:        iterable of available flags, one per room
+#   reservations: iterable of (room_type, price, start_date, end_date, status)
+def recompute(rooms, reservations):
+    aggregates = HotelAggregates()
+    for available in rooms:
+        aggregates.add_room(available)
+    for room_type, price, start_date, end_date, status in reservations:
+        aggregates.add_reservation(room_type, price, start_date, end_date, status)
+    aggregates.history_loaded = True
+    return aggregates
+
+
+def check_consistency(aggregates, rooms, reservations):
+    """Compares maintained aggregates with a full recompute; returns a list of mismatches.
+
+    Each mismatch is (field, maintained value, recomputed value); an empty list
+    means the aggregates are consistent.
+    """
+    expected = recompute(rooms, reservations)
+    mismatches = []
+    for field in ("total_rooms", "occupied_rooms"):
+        if getattr(aggregates, field) != getattr(expected, field):
+            mismatches.append((field, getattr(aggregates, field), getattr(expected, field)))
+    for field in ("status_counts", "revenue_by_status", "revenue_by_day", "revenue_by_room_type"):
+        maintained, recomputed = getattr(aggregates, field), getattr(expected, field)
+        for key in set(maintained) | set(recomputed):
+            if maintained.get(key, 0) != recomputed.get(key, 0):
+                mismatches.append((f"{field}[{key}]", maintained.get(key, 0), recomputed.get(key, 0)))
+    return mismatches
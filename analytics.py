@@ -0,0 +1,184 @@
+"""Columnar revenue analytics: occupancy, ADR, RevPAR and revenue by room type.
+
+Usage: python analytics.py START END   (dates as YYYY-MM-DD, END exclusive)
+
+Reservations are loaded once into NumPy arrays (room index, start/end as day
+ordinals, status flags, long-stay discount); every metric over a date window
+is then a handful of vectorized operations instead of a Python loop per stay.
+Requires numpy (pip install numpy).
+
+Revenue is priced as the bills are (pricing.py): each night's rate is the rack
+rate times the room type's plan multiplier for that night, rounded half up to
+the cent in integer arithmetic, less the stay's long-stay discount. Stays that
+lie inside the window match their bills to within the rounding of that
+discount to the cent.
+"""
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+
+import pricing
+from mydb import iter_rows
+
+# Plan multipliers are applied as integers over this scale (exact to six decimals)
+MULTIPLIER_SCALE = 10**6
+
+
+def _ordinal(value):
+    return (value if isinstance(value, date) else date.fromisoformat(str(value))).toordinal()
+
+
+class ReservationColumns:
+    """Rooms and reservations as parallel NumPy arrays."""
+
+    def __init__(self, room_rows, reservation_rows):
+        # Rooms, sorted by number so reservations can be mapped with searchsorted
+        room_rows = sorted(room_rows, key=lambda row: int(row[0]))
+        self.type_names = sorted({str(row[1]) for row in room_rows})
+        type_codes = {name: code for code, name in enumerate(self.type_names)}
+        self.room_numbers = np.array([int(row[0]) for row in room_rows], dtype=np.int64)
+        self.room_type_codes = np.array([type_codes[str(row[1])] for row in room_rows], dtype=np.int64)
+        self.room_cents = np.array([int(pricing.money(row[2]) * 100) for row in room_rows], dtype=np.int64)
+
+        rows = list(reservation_rows)
+        numbers = np.array([int(row[1]) for row in rows], dtype=np.int64)
+        room_index = np.searchsorted(self.room_numbers, numbers)
+        # Drop reservations whose room no longer exists
+        known = room_index < len(self.room_numbers)
+        known[known] = self.room_numbers[room_index[known]] == numbers[known]
+
+        self.room_index = room_index[known]
+        self.start = np.array([_ordinal(row[2]) for row in rows], dtype=np.int64)[known]
+        self.end = np.array([_ordinal(row[3]) for row in rows], dtype=np.int64)[known]
+        self.checked_in = np.array([bool(row[4]) for row in rows], dtype=bool)[known]
+        self.checked_out = np.array([bool(row[5]) for row in rows], dtype=bool)[known]
+
+        # Fraction off each stay under its room type's long-stay discounts
+        self.plans = pricing.get_engine().plans
+        self.discount = np.zeros(len(self.start), dtype=np.float64)
+        stay_types = self.room_type_codes[self.room_index]
+        nights = self.end - self.start
+        for code, name in enumerate(self.type_names):
+            plan = self.plans.get(name)
+            for minimum, fraction in plan.long_stay if plan else ():
+                self.discount[(stay_types == code) & (nights >= minimum)] = float(fraction)
+
+    @classmethod
+    def from_records(cls, rooms, reservations):
+        """Builds columns from the dicts returned by get_records."""
+        room_rows = [(r["room_number"], r["room_type"], r["price"], r["available"]) for r in rooms]
+        reservation_rows = [
+            (res["customer"]["name"], res["room"]["room_number"], res["start_date"], res["end_date"],
+             res["checked_in"], res["checked_out"])
+            for res in reservations
+        ]
+        return cls(room_rows, reservation_rows)
+
+    @classmethod
+    def load(cls):
+        """Streams every room and reservation from the configured backend."""
+        return cls(iter_rows("rooms"), iter_rows("reservations"))
+
+    def __len__(self):
+        return len(self.start)
+
+    # Stays clipped to [first, last) as (room index, start offset, end offset, share kept after discounts)
+    def _clip(self, first, last, stayed_only):
+        mask = self.checked_in | self.checked_out if stayed_only else np.ones(len(self), dtype=bool)
+        start = np.clip(self.start[mask], first, last) - first
+        end = np.clip(self.end[mask], first, last) - first
+        keep = end > start
+        return self.room_index[mask][keep], start[keep], end[keep], 1 - self.discount[mask][keep]
+
+    def nightly_rates(self, first, last):
+        """rooms x nights matrix of each room's rate in dollars for the nights [first, last) (ordinals)."""
+        nights = last - first
+        scaled = np.empty((len(self.type_names), nights), dtype=np.int64)
+        for code, name in enumerate(self.type_names):
+            plan = self.plans.get(name)
+            if plan is None:
+                scaled[code] = MULTIPLIER_SCALE
+            else:
+                day = date.fromordinal(first)
+                scaled[code] = [int(plan.multiplier(day + timedelta(days=n)) * MULTIPLIER_SCALE)
+                                for n in range(nights)]
+        # Half up to the cent, as pricing.PricingEngine.nightly_rate rounds
+        products = self.room_cents[:, None] * scaled[self.room_type_codes]
+        return (products + MULTIPLIER_SCALE // 2) // MULTIPLIER_SCALE / 100
+
+    def occupancy_matrix(self, start_date, end_date, stayed_only=False):
+        """rooms x nights boolean matrix; True where the room is sold that night."""
+        first, last = start_date.toordinal(), end_date.toordinal()
+        nights = last - first
+        room, start, end, _ = self._clip(first, last, stayed_only)
+        # +1 at arrival, -1 at departure, then a running sum along each room's row
+        width = nights + 1
+        size = len(self.room_numbers) * width
+        diff = (np.bincount(room * width + start, minlength=size)
+                - np.bincount(room * width + end, minlength=size)).reshape(-1, width)
+        return np.cumsum(diff[:, :nights], axis=1) > 0
+
+    def revenue_by_night(self, start_date, end_date, stayed_only=False):
+        first, last = start_date.toordinal(), end_date.toordinal()
+        nights = last - first
+        room, start, end, share = self._clip(first, last, stayed_only)
+        # Discounted share of each room's rate sold per night, by the same running sum as occupancy_matrix
+        width = nights + 1
+        size = len(self.room_numbers) * width
+        diff = (np.bincount(room * width + start, weights=share, minlength=size)
+                - np.bincount(room * width + end, weights=share, minlength=size)).reshape(-1, width)
+        sold = np.cumsum(diff[:, :nights], axis=1)
+        return (sold * self.nightly_rates(first, last)).sum(axis=0)
+
+    def revenue_by_room_type(self, start_date, end_date, stayed_only=False):
+        first, last = start_date.toordinal(), end_date.toordinal()
+        room, start, end, share = self._clip(first, last, stayed_only)
+        # Running totals of each room's rates, so a stay's nights cost two lookups
+        totals = np.zeros((len(self.room_numbers), last - first + 1))
+        np.cumsum(self.nightly_rates(first, last), axis=1, out=totals[:, 1:])
+        revenue = (totals[room, end] - totals[room, start]) * share
+        by_type = np.bincount(self.room_type_codes[room], weights=revenue, minlength=len(self.type_names))
+        return dict(zip(self.type_names, by_type.tolist()))
+
+    def summary(self, start_date, end_date, stayed_only=False):
+        """Occupancy, ADR and RevPAR over [start_date, end_date)."""
+        matrix = self.occupancy_matrix(start_date, end_date, stayed_only)
+        revenue = self.revenue_by_night(start_date, end_date, stayed_only)
+        rooms, nights = matrix.shape
+        sold = int(matrix.sum())
+        available = rooms * nights
+        total_revenue = float(revenue.sum())
+        return {
+            "rooms": rooms,
+            "nights": nights,
+            "room_nights_sold": sold,
+            "occupancy": sold / available if available else 0.0,
+            "revenue": total_revenue,
+            "adr": total_revenue / sold if sold else 0.0,
+            "revpar": total_revenue / available if available else 0.0,
+            "occupancy_by_night": matrix.mean(axis=0) if rooms else np.zeros(nights),
+            "revenue_by_room_type": self.revenue_by_room_type(start_date, end_date, stayed_only),
+        }
+
+
+def print_report(summary):
+    print(f"Rooms: {summary['rooms']}, Nights: {summary['nights']}, Room nights sold: {summary['room_nights_sold']}")
+    print(f"Occupancy: {summary['occupancy']:.1%}")
+    print(f"Revenue: ${summary['revenue']:.2f}")
+    print(f"ADR: ${summary['adr']:.2f}")
+    print(f"RevPAR: ${summary['revpar']:.2f}")
+    for room_type, revenue in summary["revenue_by_room_type"].items():
+        print(f"  {room_type}: ${revenue:.2f}")
+
+
+def main(argv):
+    if len(argv) != 2:
+        print(__doc__)
+        return
+    start_date, end_date = date.fromisoformat(argv[0]), date.fromisoformat(argv[1])
+    print_report(ReservationColumns.load().summary(start_date, end_date))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,284 @@
+"""Binary columnar snapshot of rooms, customers and reservations, read through mmap.
+
+Usage: python archive.py PATH   (exports the configured database to PATH)
+
+get_records pays for a query per table and a dict, two date parses and a few
+str()/int() calls per row, in every process that loads. An archive is written
+once and then opened in microseconds: the file is mapped read-only and each
+column is a typed memoryview over the mapping, so nothing is copied or
+decoded until a row is asked for, and every process that maps the file shares
+the same page-cache pages.
+
+Layout (native byte order, recorded in the header; every section 8-byte aligned):
+
+  header    magic, version, byte order, then (offset, count) per section
+  strings   offsets (int64, count + 1) and UTF-8 bytes; each distinct string once
+  rooms     number int32, type string int32, price in cents int64, available int8
+  customers name, contact_info, payment_method string ids, int32 each
+  reservations, sorted by (room number, start date):
+            customer name string int32, room number int32, start and end as
+            day ordinals int32, status bits int8 (1 checked in, 2 checked out)
+
+Rows come back in the tables' column order, with dates as date and prices as
+Decimal, so code that reads mydb.iter_rows can read an archive instead. An
+archive is a point-in-time copy: changes made after export are not in it.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import date
+from decimal import Decimal
+
+import mydb
+import pricing
+
+MAGIC = b"HOTELARC"
+VERSION = 1
+
+_CHECKED_IN = 1
+_CHECKED_OUT = 2
+
+# (section, array typecode), in file order
+SECTIONS = (
+    ("string_offsets", "q"),
+    ("string_data", "B"),
+    ("room_numbers", "i"),
+    ("room_types", "i"),
+    ("room_prices", "q"),
+    ("room_available", "b"),
+    ("customer_names", "i"),
+    ("customer_contacts", "i"),
+    ("customer_payments", "i"),
+    ("reservation_customers", "i"),
+    ("reservation_rooms", "i"),
+    ("reservation_starts", "i"),
+    ("reservation_ends", "i"),
+    ("reservation_statuses", "b"),
+)
+
+_HEADER = struct.Struct("<8sIB3x" + "QQ" * len(SECTIONS))
+_BYTE_ORDERS = {"little": 0, "big": 1}
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def _ordinal(value):
+    return (value if isinstance(value, date) else date.fromisoformat(str(value))).toordinal()
+
+
+# ============================================================
+# Writing
+# ============================================================
+
+class _StringTable:
+    def __init__(self):
+        self._ids = {}
+        self.offsets = array("q", [0])
+        self.data = bytearray()
+
+    def id(self, text):
+        text = str(text)
+        string_id = self._ids.get(text)
+        if string_id is None:
+            string_id = self._ids[text] = len(self.offsets) - 1
+            self.data += text.encode()
+            self.offsets.append(len(self.data))
+        return string_id
+
+
+def write(path, room_rows, customer_rows, reservation_rows):
+    """Writes an archive from raw rows in the tables' column order; returns the counts written.
+
+    The file is written beside `path` and renamed over it, so readers never
+    see a partial archive.
+    """
+    strings = _StringTable()
+    columns = {name: array(code) for name, code in SECTIONS[2:]}
+
+    for number, room_type, price, available in room_rows:
+        columns["room_numbers"].append(int(number))
+        columns["room_types"].append(strings.id(room_type))
+        columns["room_prices"].append(int(pricing.money(price) * 100))
+        columns["room_available"].append(1 if available else 0)
+
+    for name, contact_info, payment_method in customer_rows:
+        columns["customer_names"].append(strings.id(name))
+        columns["customer_contacts"].append(strings.id(contact_info))
+        columns["customer_payments"].append(strings.id(payment_method))
+
+    stays = sorted(
+        (int(room_number), _ordinal(start_date), _ordinal(end_date), strings.id(customer_name),
+         (_CHECKED_IN if checked_in else 0) | (_CHECKED_OUT if checked_out else 0))
+        for customer_name, room_number, start_date, end_date, checked_in, checked_out in reservation_rows
+    )
+    for room_number, start, end, customer, status in stays:
+        columns["reservation_customers"].append(customer)
+        columns["reservation_rooms"].append(room_number)
+        columns["reservation_starts"].append(start)
+        columns["reservation_ends"].append(end)
+        columns["reservation_statuses"].append(status)
+    del stays
+
+    sections = [strings.offsets, strings.data] + [columns[name] for name, _ in SECTIONS[2:]]
+    layout, offset = [], _align(_HEADER.size)
+    for section in sections:
+        count = len(section)
+        layout += [offset, count]
+        offset = _align(offset + count * (section.itemsize if isinstance(section, array) else 1))
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, _BYTE_ORDERS[sys.byteorder], *layout))
+        for section, section_offset in zip(sections, layout[::2]):
+            f.write(b"\0" * (section_offset - f.tell()))
+            f.write(section)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return {"rooms": len(columns["room_numbers"]), "customers": len(columns["customer_names"]),
+            "reservations": len(columns["reservation_rooms"])}
+
+
+def export(path):
+    """Writes every room, customer and reservation in the configured database to an archive."""
+    return write(path, mydb.iter_rows("rooms"), mydb.iter_rows("customers"), mydb.iter_rows("reservations"))
+
+
+# ============================================================
+# Reading
+# ============================================================
+
+class Archive:
+    """A read-only mapped archive; columns are memoryviews, rows are decoded on access."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, byte_order, *layout = _HEADER.unpack_from(self._map)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} hotel archive")
+            if byte_order != _BYTE_ORDERS[sys.byteorder]:
+                raise ValueError(f"{path} was written on a machine of the other byte order")
+            self._views = []
+            buffer = memoryview(self._map)
+            self._views.append(buffer)
+            for (name, code), offset, count in zip(SECTIONS, layout[::2], layout[1::2]):
+                view = buffer[offset:offset + count * array(code).itemsize].cast(code)
+                self._views.append(view)
+                setattr(self, name, view)
+        except Exception:
+            self.close()
+            raise
+        self._strings = {}  # string id -> str, filled as rows are read
+
+    def close(self):
+        # Views must be released before the mapping can be closed
+        for view in reversed(getattr(self, "_views", ())):
+            view.release()
+        self._views = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, string_id):
+        text = self._strings.get(string_id)
+        if text is None:
+            start, end = self.string_offsets[string_id], self.string_offsets[string_id + 1]
+            text = self._strings[string_id] = str(self.string_data[start:end], "utf-8")
+        return text
+
+    def __len__(self):
+        return len(self.reservation_rooms)
+
+    # ---------------- rows, in the tables' column order ----------------
+
+    def room_rows(self):
+        for i in range(len(self.room_numbers)):
+            yield (self.room_numbers[i], self.string(self.room_types[i]),
+                   Decimal(self.room_prices[i]).scaleb(-2), bool(self.room_available[i]))
+
+    def customer_rows(self):
+        string = self.string
+        for i in range(len(self.customer_names)):
+            yield (string(self.customer_names[i]), string(self.customer_contacts[i]),
+                   string(self.customer_payments[i]))
+
+    def reservation_range(self, low=None, high=None):
+        """Positions of the reservations of rooms [low, high): reservations are sorted by room."""
+        rooms = self.reservation_rooms
+        first = 0 if low is None else bisect_left(rooms, low)
+        last = len(rooms) if high is None else bisect_left(rooms, high, first)
+        return range(first, last)
+
+    def reservation_rows(self, low=None, high=None, start_date=None, end_date=None):
+        """Reservations of rooms [low, high) overlapping [start_date, end_date), if given.
+
+        Stays are filtered on the raw ordinals, so only matching rows are decoded.
+        """
+        first = -1 if start_date is None else start_date.toordinal()
+        last = sys.maxsize if end_date is None else end_date.toordinal()
+        customers, rooms = self.reservation_customers, self.reservation_rooms
+        starts, ends, statuses = self.reservation_starts, self.reservation_ends, self.reservation_statuses
+        string, fromordinal = self.string, date.fromordinal
+        for i in self.reservation_range(low, high):
+            if starts[i] < last and ends[i] > first:
+                status = statuses[i]
+                yield (string(customers[i]), rooms[i], fromordinal(starts[i]), fromordinal(ends[i]),
+                       bool(status & _CHECKED_IN), bool(status & _CHECKED_OUT))
+
+    def records(self, active_only=False):
+        """(rooms, customers, reservations) as the dicts get_records returns."""
+        rooms = [{"room_number": number, "room_type": self.string(room_type), "price": cents / 100,
+                  "available": bool(available)}
+                 for number, room_type, cents, available
+                 in zip(self.room_numbers, self.room_types, self.room_prices, self.room_available)]
+        string = self.string
+        customers = [{"name": string(name), "contact_info": string(contact), "payment_method": string(payment)}
+                     for name, contact, payment
+                     in zip(self.customer_names, self.customer_contacts, self.customer_payments)]
+        rooms_by_number = {room["room_number"]: room for room in rooms}
+        # Reservations hold the customer's name string id, so link on that without decoding
+        customers_by_name = dict(zip(self.customer_names, customers))
+        # Stays share one date object per day, as they would share the day's page of rows
+        first = min(self.reservation_starts, default=0)
+        days = [date.fromordinal(day) for day in range(first, max(self.reservation_ends, default=0) + 1)]
+        reservations = [
+            {"customer": customers_by_name.get(customer), "room": rooms_by_number.get(room),
+             "start_date": days[start - first], "end_date": days[end - first],
+             "checked_in": bool(status & _CHECKED_IN), "checked_out": bool(status & _CHECKED_OUT)}
+            for customer, room, start, end, status
+            in zip(self.reservation_customers, self.reservation_rooms, self.reservation_starts,
+                   self.reservation_ends, self.reservation_statuses)
+            if not (active_only and status & _CHECKED_OUT)
+        ]
+        return rooms, customers, reservations
+
+
+def load_records(path, active_only=False):
+    """get_records from an archive file instead of the database."""
+    with Archive(path) as snapshot:
+        return snapshot.records(active_only)
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(__doc__.splitlines()[2])
+        sys.exit(2)
+    counts = export(sys.argv[1])
+    print(f"Archived {counts['rooms']} rooms, {counts['customers']} customers and "
+          f"{counts['reservations']} reservations to {sys.argv[1]} ({os.path.getsize(sys.argv[1])} bytes)")
+
+
+if __name__ == "__main__":
+    main()
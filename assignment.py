@@ -0,0 +1,140 @@
+"""Automatic room assignment that keeps inventory sellable.
+
+First fit (the lowest free room number) scatters stays, and the nights left
+between them end up as one- or two-night gaps nobody books. The assigner looks
+at the free gap each candidate room has around the requested stay, from the
+availability index's sorted stays, and picks the room whose leftovers do the
+least damage, in order:
+
+  1. fewest orphan gaps created (1 to ORPHAN_NIGHTS nights, hard to sell)
+  2. fewest gaps created at all (a stay that exactly fills a gap, or sits
+     back to back with its neighbours, creates none)
+  3. smallest leftover nights around the stay (best fit)
+  4. prefer filling a closed gap over extending into a room's open calendar
+  5. the room that comes first in the index (rooms are added in number order)
+
+A stay that exactly fills a closed gap cannot be beaten, so the search stops
+at the first one.
+
+Nights before `today` cannot be sold, so a room's calendar is taken to start
+there. assign_block() places a group's stays together, planning on
+copy-on-write views of the index so nothing is booked unless every stay fits.
+"""
+import os
+from datetime import date
+
+ORPHAN_NIGHTS = int(os.environ.get('HOTEL_ORPHAN_NIGHTS', 2))  # gaps this short are counted as unsellable
+
+
+def _gap_score(nights):
+    """(orphan gaps, gaps) created by leaving `nights` free."""
+    if nights <= 0:
+        return 0, 0
+    return (1 if nights <= ORPHAN_NIGHTS else 0), 1
+
+
+_PERFECT = (0, 0, 0, False)  # Fills a closed gap exactly
+
+
+class RoomAssigner:
+    """Chooses rooms for stays from an AvailabilityIndex, minimising fragmentation."""
+
+    def __init__(self, availability, today=None):
+        self.availability = availability
+        self.today = today  # None follows the calendar
+
+    def _today(self):
+        return (self.today or date.today()).toordinal()
+
+    def score(self, availability, room_number, start_date, end_date, today):
+        """Sort key for putting the stay in this room (lower is better), or None if the room is taken.
+
+        today is the first sellable night, as an ordinal.
+        """
+        gap = availability.free_gap(room_number, start_date, end_date)
+        if gap is None:
+            return None
+        before, after = gap
+        left = start_date.toordinal() - max(before if before is not None else today, today)
+        left_orphans, left_gaps = _gap_score(left)
+        if after is None:  # Open calendar after the stay: nothing is cut off on that side
+            right, right_orphans, right_gaps = 0, 0, 0
+        else:
+            right = after - end_date.toordinal()
+            right_orphans, right_gaps = _gap_score(right)
+        return left_orphans + right_orphans, left_gaps + right_gaps, max(left, 0) + right, after is None
+
+    def _choose(self, availability, room_type, start_date, end_date, today):
+        best, chosen = None, None
+        for room_number in availability.rooms_of_type(room_type):
+            key = self.score(availability, room_number, start_date, end_date, today)
+            if key is not None and (best is None or key < best):
+                best, chosen = key, room_number
+                if key == _PERFECT:
+                    break
+        return chosen
+
+    def choose(self, room_type, start_date, end_date):
+        """Room number of the given type that best fits [start_date, end_date), or None if none is free."""
+        if end_date <= start_date:
+            return None
+        return self._choose(self.availability, room_type, start_date, end_date, self._today())
+
+    def assign_block(self, stays):
+        """Room numbers for a group's stays [(room_type, start_date, end_date)], in order; None if any cannot be placed.
+
+        Longer stays are placed first, since they have the fewest rooms to
+        choose from. Each placement is planned on a copy of the index, so the
+        shared index is untouched and the caller books the result.
+        """
+        planned, today = self.availability, self._today()
+        rooms = [None] * len(stays)
+        order = sorted(range(len(stays)), key=lambda i: (stays[i][1] - stays[i][2], stays[i][1]))
+        for i in order:
+            room_type, start_date, end_date = stays[i]
+            room_number = None if end_date <= start_date else self._choose(planned, room_type, start_date, end_date, today)
+            if room_number is None:
+                return None
+            planned = planned.with_booking(room_number, start_date, end_date)
+            rooms[i] = room_number
+        return rooms
+
+
+def first_fit(availability, room_type, start_date, end_date):
+    """The lowest-numbered free room of the type: how rooms were picked before the assigner."""
+    for room_number in availability.rooms_of_type(room_type):
+        if availability.is_free(room_number, start_date, end_date):
+            return room_number
+    return None
+
+
+def fragmentation(availability, room_numbers, start_date, end_date):
+    """Free-space statistics over [start_date, end_date) for the rooms.
+
+    free_nights: nights not booked; gaps: free runs that end at a stay (the
+    window's first night counts as a boundary, like `today` for the assigner);
+    orphan_gaps / orphan_nights: those runs of ORPHAN_NIGHTS nights or fewer;
+    largest_gap: the longest free run, i.e. the longest stay still sellable.
+    """
+    first, last = start_date.toordinal(), end_date.toordinal()
+    stats = {"free_nights": 0, "gaps": 0, "orphan_gaps": 0, "orphan_nights": 0, "largest_gap": 0}
+    for room_number in room_numbers:
+        night = first
+        for start, end in availability.stays(room_number):
+            if start >= last:
+                break
+            if end <= first:
+                continue
+            if start > night:
+                free = start - night
+                stats["free_nights"] += free
+                stats["largest_gap"] = max(stats["largest_gap"], free)
+                stats["gaps"] += 1
+                if free <= ORPHAN_NIGHTS:
+                    stats["orphan_gaps"] += 1
+                    stats["orphan_nights"] += free
+            night = max(night, end)
+        if night < last:
+            stats["free_nights"] += last - night
+            stats["largest_gap"] = max(stats["largest_gap"], last - night)
+    return stats
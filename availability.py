@@ -0,0 +1,132 @@
+from bisect import bisect_left
+
+from pmap import PMap
+
+
+# Per-room index of booked date ranges, used for overlap checks and free-room search.
+#
+# Each room keeps two parallel sorted arrays of day ordinals (starts, ends) for its
+# stays. Stays never overlap, so sorting by start also sorts by end, and a range
+# check is a single bisect. Ranges are half-open: a stay ending on the 7th leaves
+# the 7th free for the next arrival.
+class AvailabilityIndex:
+    def __init__(self):
+        # Persistent maps, so the copy-on-write updates below share them
+        self._starts = PMap()      # room_number -> sorted start ordinals
+        self._ends = PMap()        # room_number -> matching end ordinals
+        self._room_types = PMap()  # room_number -> room_type
+        self._rooms_by_type = {}   # room_type -> [room_number]
+
+    # Build an index from the dict records returned by get_records
+    @classmethod
+    def from_records(cls, rooms, reservations):
+        index = cls()
+        for room in rooms:
+            index.add_room(room["room_number"], room["room_type"])
+        for res in reservations:
+            index.book(res["room"]["room_number"], res["start_date"], res["end_date"])
+        return index
+
+    def add_room(self, room_number, room_type):
+        if room_number not in self._room_types:
+            self._starts = self._starts.set(room_number, [])
+            self._ends = self._ends.set(room_number, [])
+            self._room_types = self._room_types.set(room_number, room_type)
+            self._rooms_by_type.setdefault(room_type, []).append(room_number)
+
+    def is_free(self, room_number, start_date, end_date):
+        """True if the room has no stay overlapping [start_date, end_date)."""
+        start, end = start_date.toordinal(), end_date.toordinal()
+        if end <= start or room_number not in self._starts:
+            return False
+        starts = self._starts[room_number]
+        # The last stay starting before `end` is the only one that can overlap
+        i = bisect_left(starts, end)
+        return i == 0 or self._ends[room_number][i - 1] <= start
+
+    def free_gap(self, room_number, start_date, end_date):
+        """(end of the stay before, start of the stay after) around a free range, as ordinals.
+
+        Either side is None when there is no stay there; returns None if the range is taken.
+        """
+        start, end = start_date.toordinal(), end_date.toordinal()
+        starts = self._starts.get(room_number)
+        if end <= start or starts is None:
+            return None
+        i = bisect_left(starts, end)
+        if i == 0:
+            return None, (starts[0] if starts else None)
+        before = self._ends[room_number][i - 1]
+        if before > start:
+            return None
+        return before, (starts[i] if i < len(starts) else None)
+
+    def stays(self, room_number):
+        """[(start, end)] ordinals of the room's stays, in date order."""
+        return list(zip(self._starts.get(room_number, ()), self._ends.get(room_number, ())))
+
+    def rooms_of_type(self, room_type):
+        return list(self._rooms_by_type.get(room_type, ()))
+
+    def book(self, room_number, start_date, end_date):
+        """Records a stay; returns False (and records nothing) if the dates are taken."""
+        if not self.is_free(room_number, start_date, end_date):
+            return False
+        starts, ends = self._starts[room_number], self._ends[room_number]
+        i = bisect_left(starts, start_date.toordinal())
+        starts.insert(i, start_date.toordinal())
+        ends.insert(i, end_date.toordinal())
+        return True
+
+    def release(self, room_number, start_date, end_date):
+        """Forgets a stay recorded with exactly these dates."""
+        starts, ends = self._starts.get(room_number, []), self._ends.get(room_number, [])
+        i = bisect_left(starts, start_date.toordinal())
+        if i < len(starts) and starts[i] == start_date.toordinal() and ends[i] == end_date.toordinal():
+            del starts[i]
+            del ends[i]
+
+    def find_available(self, room_type, start_date, end_date):
+        """Room numbers of the given type that are free for the whole range."""
+        return [
+            room_number for room_number in self._rooms_by_type.get(room_type, ())
+            if self.is_free(room_number, start_date, end_date)
+        ]
+
+    # ---------------- copy-on-write updates for functional.py ----------------
+
+    def _copy(self):
+        index = AvailabilityIndex()
+        index._starts = self._starts
+        index._ends = self._ends
+        index._room_types = self._room_types
+        index._rooms_by_type = self._rooms_by_type
+        return index
+
+    def with_room(self, room_number, room_type):
+        """New index with the room added; this one is left untouched."""
+        index = self._copy()
+        index._rooms_by_type = {**self._rooms_by_type, room_type: list(self._rooms_by_type.get(room_type, []))}
+        index.add_room(room_number, room_type)
+        return index
+
+    def with_booking(self, room_number, start_date, end_date):
+        """New index with the stay booked, or None if the dates are taken.
+
+        Only the booked room's arrays are copied; every other room is shared.
+        """
+        if not self.is_free(room_number, start_date, end_date):
+            return None
+        index = self._copy()
+        index._starts = self._starts.set(room_number, list(self._starts[room_number]))
+        index._ends = self._ends.set(room_number, list(self._ends[room_number]))
+        index.book(room_number, start_date, end_date)
+        return index
+
+    def without_booking(self, room_number, start_date, end_date):
+        """New index with the stay released; only that room's arrays are copied."""
+        index = self._copy()
+        index._starts = self._starts.set(room_number, list(self._starts.get(room_number, [])))
+        index._ends = self._ends.set(room_number, list(self._ends.get(room_number, [])))
+        index.release(room_number, start_date, end_date)
+        return index
@@ -0,0 +1,815 @@
+"""Storage engines behind the mydb API.
+
+Every backend stores the same three tables (rooms, customers, reservations) and
+implements insert / delete / update / select_all; mydb picks one by configuration.
+"""
+import operator
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+# mysql.connector, imported by the first MySQLBackend: only that backend needs
+# the driver, and importing it costs clients on the other backends startup time
+mysql = None
+pooling = None
+
+
+def _import_mysql():
+    global mysql, pooling
+    if mysql is None:
+        try:
+            import mysql.connector
+            from mysql.connector import pooling
+        except ImportError:
+            raise RuntimeError("The MySQL backend needs mysql-connector-python: pip install mysql-connector-python")
+    return mysql
+
+
+# change_counters row counting writes that no event log recorded
+UNLOGGED = 'unlogged'
+
+# Bump this whenever the schema changes so existing databases get migrated
+SCHEMA_VERSION = 5
+
+ROOMS_TABLE = '''
+CREATE TABLE IF NOT EXISTS rooms (
+    number INT PRIMARY KEY,
+    type VARCHAR(50),
+    price DECIMAL(10, 2),
+    available BOOLEAN DEFAULT TRUE
+);
+'''
+
+CUSTOMERS_TABLE = '''
+CREATE TABLE IF NOT EXISTS customers (
+    name VARCHAR(100) PRIMARY KEY,
+    contact_info VARCHAR(255),
+    payment_method VARCHAR(50)
+);
+'''
+
+RESERVATIONS_TABLE = '''
+CREATE TABLE IF NOT EXISTS reservations (
+    customer_name VARCHAR(100),
+    room_number INT,
+    start_date DATE,
+    end_date DATE,
+    checked_in BOOLEAN DEFAULT FALSE,
+    checked_out BOOLEAN DEFAULT FALSE,
+    PRIMARY KEY (customer_name, room_number, start_date),
+    FOREIGN KEY (customer_name) REFERENCES customers(name) ON DELETE CASCADE,
+    FOREIGN KEY (room_number) REFERENCES rooms(number) ON DELETE CASCADE
+);
+'''
+
+SCHEMA = [ROOMS_TABLE, CUSTOMERS_TABLE, RESERVATIONS_TABLE]
+
+# Statements that upgrade a database from the previous version to this one
+MIGRATIONS = {
+    2: [
+        # Overlap checks: room_number = ? AND end_date > ? AND start_date < ?.
+        # end_date leads the range so a booking only walks the room's stays that
+        # end after its arrival, not the whole checked-out history
+        "CREATE INDEX idx_reservations_room_dates ON reservations (room_number, end_date, start_date)",
+        # Active/history split used by the startup load and the streaming readers
+        "CREATE INDEX idx_reservations_status ON reservations (checked_out, checked_in)",
+    ],
+    # Per-table change counters, bumped by triggers on every write from any
+    # process; caches poll them to notice rows changed elsewhere
+    3: [
+        "CREATE TABLE change_counters (table_name VARCHAR(50) PRIMARY KEY, counter BIGINT NOT NULL DEFAULT 0)",
+        "INSERT INTO change_counters (table_name, counter) VALUES ('rooms', 0), ('customers', 0)",
+    ] + [
+        f"CREATE TRIGGER {table}_{event.lower()}_count AFTER {event} ON {table} FOR EACH ROW "
+        f"BEGIN UPDATE change_counters SET counter = counter + 1 WHERE table_name = '{table}'; END"
+        for table in ('rooms', 'customers') for event in ('INSERT', 'UPDATE', 'DELETE')
+    ],
+    # Night audit (night_audit.py): nightly room charges posted to stays, the
+    # status changes it made, and per-shard progress so a crashed run resumes
+    4: [
+        "CREATE TABLE room_charges (customer_name VARCHAR(100), room_number INT, start_date DATE, night DATE, "
+        "amount DECIMAL(10, 2), PRIMARY KEY (customer_name, room_number, start_date, night))",
+        "CREATE INDEX idx_room_charges_night ON room_charges (night)",
+        "CREATE TABLE audit_log (audit_date DATE, kind VARCHAR(20), customer_name VARCHAR(100), room_number INT, "
+        "start_date DATE, end_date DATE, PRIMARY KEY (audit_date, kind, customer_name, room_number, start_date))",
+        "CREATE TABLE audit_checkpoints (audit_date DATE, shard_low INT, shard_high INT, next_room INT, "
+        "charges INT DEFAULT 0, revenue_cents BIGINT DEFAULT 0, overdue INT DEFAULT 0, no_shows INT DEFAULT 0, "
+        "PRIMARY KEY (audit_date, shard_low))",
+    ],
+    # Writes made by processes that keep no event log (eventlog.py), so a desk
+    # starting from its log can tell that the database has changed behind it
+    5: [
+        f"INSERT INTO change_counters (table_name, counter) VALUES ('{UNLOGGED}', 0)",
+    ],
+}
+
+# Tables whose writes are counted in change_counters
+COUNTED_TABLES = ('rooms', 'customers')
+
+# Column order of each table, as returned by select_all
+COLUMNS = {
+    'rooms': ('number', 'type', 'price', 'available'),
+    'customers': ('name', 'contact_info', 'payment_method'),
+    'reservations': ('customer_name', 'room_number', 'start_date', 'end_date', 'checked_in', 'checked_out'),
+    'room_charges': ('customer_name', 'room_number', 'start_date', 'night', 'amount'),
+    'audit_log': ('audit_date', 'kind', 'customer_name', 'room_number', 'start_date', 'end_date'),
+    'audit_checkpoints': ('audit_date', 'shard_low', 'shard_high', 'next_room',
+                          'charges', 'revenue_cents', 'overdue', 'no_shows'),
+}
+
+# Columns supplied by add_record; the others take their defaults
+INSERT_COLUMNS = {
+    'rooms': COLUMNS['rooms'],
+    'customers': COLUMNS['customers'],
+    'reservations': COLUMNS['reservations'][:4],
+    'room_charges': COLUMNS['room_charges'],
+    'audit_log': COLUMNS['audit_log'],
+    'audit_checkpoints': COLUMNS['audit_checkpoints'][:4],
+}
+
+DEFAULTS = {
+    'rooms': {'available': True},
+    'customers': {},
+    'reservations': {'checked_in': False, 'checked_out': False},
+    'room_charges': {},
+    'audit_log': {},
+    'audit_checkpoints': {'charges': 0, 'revenue_cents': 0, 'overdue': 0, 'no_shows': 0},
+}
+
+PRIMARY_KEYS = {
+    'rooms': ('number',),
+    'customers': ('name',),
+    'reservations': ('customer_name', 'room_number', 'start_date'),
+    'room_charges': ('customer_name', 'room_number', 'start_date', 'night'),
+    'audit_log': ('audit_date', 'kind', 'customer_name', 'room_number', 'start_date'),
+    'audit_checkpoints': ('audit_date', 'shard_low'),
+}
+
+# child column -> (parent table, parent column); deleting the parent cascades
+FOREIGN_KEYS = {
+    'reservations': {'customer_name': ('customers', 'name'), 'room_number': ('rooms', 'number')},
+}
+
+
+# A stay [start, end) for the room that overlaps the one being booked; parameters
+# are (room_number, new start_date, new end_date). Checked-out stays hold no
+# nights, so a guest who leaves early frees the rest of the stay
+OVERLAP_QUERY = ("SELECT COUNT(*) FROM reservations "
+                 "WHERE room_number = {0} AND end_date > {0} AND start_date < {0} AND checked_out = 0")
+
+# Attempts and base delay (seconds, doubled per retry with jitter) when a
+# booking transaction loses a lock conflict
+LOCK_RETRIES = 8
+LOCK_BACKOFF = 0.005
+
+
+def create_tables(cursor):
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+
+# Comparison operators accepted in (column, op, value) filters
+OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def _key_columns(column, value):
+    """Normalises a column name or tuple of names (and its value) to parallel tuples."""
+    if isinstance(column, tuple):
+        return column, tuple(value)
+    return (column,), (value,)
+
+
+def _check_columns(table, columns):
+    unknown = set(columns) - set(COLUMNS[table])
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(sorted(unknown))}")
+
+
+class StorageError(Exception):
+    """Constraint violation raised by the in-memory backend."""
+
+
+class StorageBackend:
+    """Interface every storage engine implements."""
+
+    # Exception type the engine raises for failed statements; mydb catches it
+    Error = StorageError
+
+    # Called with the seconds each statement waited for a connection (set by metrics)
+    on_acquire = None
+
+    def insert(self, table, data):
+        raise NotImplementedError
+
+    def insert_many(self, table, rows):
+        """Inserts all rows in one transaction; either every row lands or none does."""
+        raise NotImplementedError
+
+    # `column` in delete and update is one column name or a tuple of names,
+    # such as a full primary key, with `value` a tuple to match
+
+    def delete(self, table, column, value):
+        raise NotImplementedError
+
+    def update(self, table, updates, column, value):
+        raise NotImplementedError
+
+    def update_many(self, changes):
+        """Applies (table, updates, column, value) changes in order, in one transaction."""
+        raise NotImplementedError
+
+    def write_batch(self, inserts=(), changes=(), deletes=()):
+        """Inserts (table, row) rows, applies (table, updates, column, value) changes and
+        deletes (table, column, value) rows, in that order, in one transaction."""
+        raise NotImplementedError
+
+    def book(self, customer_name, room_number, start_date, end_date):
+        """Inserts a reservation unless the room has a stay overlapping [start_date, end_date).
+
+        The overlap check and the insert happen atomically, so two concurrent
+        bookings of the same dates cannot both succeed. Returns False if the
+        dates are taken.
+        """
+        return self.book_many([(customer_name, room_number, start_date, end_date)])
+
+    def book_many(self, stays):
+        """Inserts (customer_name, room_number, start_date, end_date) reservations in one
+        transaction, checking each as book() does; returns False, with nothing inserted,
+        if any stay overlaps a booked one or another stay in the list."""
+        raise NotImplementedError
+
+    def select_all(self, table):
+        raise NotImplementedError
+
+    def select_key(self, table, key):
+        """The row whose primary key equals the key tuple, or None."""
+        raise NotImplementedError
+
+    def change_counters(self):
+        """{table: number of writes so far} for COUNTED_TABLES, plus the UNLOGGED count."""
+        raise NotImplementedError
+
+    def count_unlogged_write(self):
+        """Adds one to the UNLOGGED counter, in its own transaction."""
+        raise NotImplementedError
+
+    def iter_pages(self, table, page_size, filters=()):
+        """Yields lists of at most page_size rows matching every (column, op, value) filter."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# ============================================================
+# SQL engines
+# ============================================================
+
+class SQLBackend(StorageBackend):
+    """Shared statement building for the DB-API engines."""
+
+    placeholder = '%s'
+
+    @contextmanager
+    def connection(self):
+        raise NotImplementedError
+        yield
+
+    def adapt(self, params):
+        return tuple(params)
+    def migrate(self, cursor):
+        """Creates or upgrades the schema, recording the applied version."""
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)")
+        cursor.execute("SELECT MAX(version) FROM schema_version")
+        current = cursor.fetchone()[0] or 0
+        if current >= SCHEMA_VERSION:
+            return
+        if current == 0:
+            create_tables(cursor)
+            current = 1
+        for version in range(current + 1, SCHEMA_VERSION + 1):
+            for statement in MIGRATIONS[version]:
+                cursor.execute(statement)
+        cursor.execute(f"INSERT INTO schema_version (version) VALUES ({SCHEMA_VERSION})")
+
+    def execute(self, query, params=()):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, self.adapt(params))
+                conn.commit()
+            except self.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def insert_query(self, table):
+        columns = INSERT_COLUMNS[table]
+        values = ', '.join([self.placeholder] * len(columns))
+        return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({values})"
+
+    def insert(self, table, data):
+        self.execute(self.insert_query(table), data)
+
+    def insert_many(self, table, rows):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.executemany(self.insert_query(table), [self.adapt(row) for row in rows])
+                conn.commit()
+            except self.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def key_clause(self, table, column, value):
+        """Parameterised WHERE condition matching the column(s); returns (sql, params)."""
+        columns, values = _key_columns(column, value)
+        _check_columns(table, columns)
+        return ' AND '.join(f"{name} = {self.placeholder}" for name in columns), list(values)
+
+    def delete(self, table, column, value):
+        where, params = self.key_clause(table, column, value)
+        self.execute(f"DELETE FROM {table} WHERE {where}", params)
+
+    def update_statement(self, table, updates, column, value):
+        _check_columns(table, list(updates))
+        where, params = self.key_clause(table, column, value)
+        assignments = ', '.join(f"{name} = {self.placeholder}" for name in updates)
+        return (f"UPDATE {table} SET {assignments} WHERE {where}",
+                self.adapt(list(updates.values()) + params))
+
+    def update(self, table, updates, column, value):
+        self.execute(*self.update_statement(table, updates, column, value))
+
+    def update_many(self, changes):
+        statements = [self.update_statement(*change) for change in changes]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for query, params in statements:
+                    cursor.execute(query, params)
+                conn.commit()
+            except self.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def write_batch(self, inserts=(), changes=(), deletes=()):
+        rows_by_table = {}
+        for table, row in inserts:
+            rows_by_table.setdefault(table, []).append(self.adapt(row))
+        statements = [self.update_statement(*change) for change in changes]
+        for table, column, value in deletes:
+            where, params = self.key_clause(table, column, value)
+            statements.append((f"DELETE FROM {table} WHERE {where}", self.adapt(params)))
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for table, rows in rows_by_table.items():
+                    cursor.executemany(self.insert_query(table), rows)
+                for query, params in statements:
+                    cursor.execute(query, params)
+                conn.commit()
+            except self.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def lock_rooms(self, cursor, room_numbers):
+        """Starts the booking transaction holding write locks that cover the rooms."""
+        raise NotImplementedError
+
+    def is_lock_conflict(self, err):
+        """True if err is a lock wait or deadlock that is worth retrying."""
+        return False
+
+    def _book(self, stays):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # In room order, so two blocks sharing rooms cannot deadlock
+                self.lock_rooms(cursor, sorted({room_number for _, room_number, _, _ in stays}))
+                for customer_name, room_number, start_date, end_date in stays:
+                    # Stays inserted earlier in this transaction are counted too
+                    cursor.execute(OVERLAP_QUERY.format(self.placeholder),
+                                   self.adapt((room_number, start_date, end_date)))
+                    if cursor.fetchone()[0]:
+                        conn.rollback()
+                        return False
+                    cursor.execute(self.insert_query('reservations'),
+                                   self.adapt((customer_name, room_number, start_date, end_date)))
+                conn.commit()
+                return True
+            except self.Error:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+    def book_many(self, stays):
+        for attempt in range(LOCK_RETRIES):
+            try:
+                return self._book(stays)
+            except self.Error as err:
+                if attempt == LOCK_RETRIES - 1 or not self.is_lock_conflict(err):
+                    raise
+            # Exponential backoff with full jitter so retrying writers spread out
+            time.sleep(LOCK_BACKOFF * 2 ** attempt * random.random())
+
+    def select_all(self, table):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {', '.join(COLUMNS[table])} FROM {table}")
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def select_key(self, table, key):
+        where, params = self.key_clause(table, PRIMARY_KEYS[table], key)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(f"SELECT {', '.join(COLUMNS[table])} FROM {table} WHERE {where}", self.adapt(params))
+                return cursor.fetchone()
+            finally:
+                cursor.close()
+
+    def change_counters(self):
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT table_name, counter FROM change_counters")
+                counters = dict(cursor.fetchall())
+                # End the read so the next poll sees other connections' commits
+                conn.commit()
+                return counters
+            finally:
+                cursor.close()
+
+    def count_unlogged_write(self):
+        self.execute(f"UPDATE change_counters SET counter = counter + 1 WHERE table_name = '{UNLOGGED}'")
+
+    def where_clause(self, table, filters):
+        _check_columns(table, [column for column, _, _ in filters])
+        conditions = []
+        for column, op, _ in filters:
+            if op not in OPERATORS:
+                raise ValueError(f"Unsupported filter operator {op!r}")
+            conditions.append(f"{column} {op} {self.placeholder}")
+        return ' AND '.join(conditions), [value for _, _, value in filters]
+
+    def iter_pages(self, table, page_size, filters=()):
+        # Stream through one unbuffered (server-side) cursor
+        where, params = self.where_clause(table, filters)
+        query = f"SELECT {', '.join(COLUMNS[table])} FROM {table}" + (f" WHERE {where}" if where else "")
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, self.adapt(params))
+                while True:
+                    rows = cursor.fetchmany(page_size)
+                    if not rows:
+                        return
+                    yield rows
+            finally:
+                # Drain anything the caller did not read so the connection can be reused
+                conn.consume_results()
+                cursor.close()
+
+
+class MySQLBackend(SQLBackend):
+    """MySQL server reached through a shared connection pool."""
+
+    def __init__(self, config, database, pool_size=5):
+        self.Error = _import_mysql().connector.Error
+        self.config = config
+        self.database = database
+        self.pool_size = pool_size
+        self._pool = None
+
+    def connect(self):
+        """Opens a standalone connection that is not bound to the database."""
+        return mysql.connector.connect(**self.config)
+
+    def create_database(self, cursor):
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {self.database}")
+        cursor.execute(f"USE {self.database}")
+
+    def init_db(self):
+        """Bootstraps the schema once and opens the connection pool."""
+        conn = self.connect()
+        cursor = conn.cursor()
+        try:
+            self.create_database(cursor)
+            self.migrate(cursor)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        # pool_reset_session=False saves a COM_RESET_CONNECTION round trip on every release
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name="hotel",
+            pool_size=self.pool_size,
+            pool_reset_session=False,
+            database=self.database,
+            **self.config
+        )
+
+    def lock_rooms(self, cursor, room_numbers):
+        # Row locks on the rooms: concurrent bookings of the same room queue here,
+        # other rooms are not blocked
+        for room_number in room_numbers:
+            cursor.execute("SELECT number FROM rooms WHERE number = %s FOR UPDATE", (room_number,))
+            cursor.fetchall()
+
+    def is_lock_conflict(self, err):
+        return getattr(err, 'errno', None) in (1205, 1213)  # Lock wait timeout, deadlock
+
+    @contextmanager
+    def connection(self):
+        if self._pool is None:
+            self.init_db()
+        start = time.perf_counter()
+        conn = self._pool.get_connection()
+        if self.on_acquire is not None:
+            self.on_acquire(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            conn.close()  # Hands the connection back to the pool
+
+
+class SQLiteBackend(SQLBackend):
+    """Embedded SQLite database, either a file (WAL mode) or ':memory:'."""
+
+    placeholder = '?'
+    Error = sqlite3.Error
+
+    def __init__(self, path=':memory:', synchronous='NORMAL'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            # NORMAL only syncs at WAL checkpoints; FULL syncs every commit
+            self._conn.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor = self._conn.cursor()
+        self.migrate(cursor)
+        self._conn.commit()
+        cursor.close()
+
+    @contextmanager
+    def connection(self):
+        # One connection shared by all threads; statements are serialised
+        start = time.perf_counter()
+        with self._lock:
+            if self.on_acquire is not None:
+                self.on_acquire(time.perf_counter() - start)
+            yield self._conn
+
+    def lock_rooms(self, cursor, room_numbers):
+        # SQLite has no row locks; BEGIN IMMEDIATE takes the database write lock
+        # up front so no other connection can insert between check and insert
+        cursor.execute("BEGIN IMMEDIATE")
+
+    def is_lock_conflict(self, err):
+        return isinstance(err, sqlite3.OperationalError) and ('locked' in str(err) or 'busy' in str(err))
+
+    def adapt(self, params):
+        adapted = []
+        for value in params:
+            if isinstance(value, date):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            adapted.append(value)
+        return tuple(adapted)
+
+    def iter_pages(self, table, page_size, filters=()):
+        # Keyset pages on rowid; the lock is only held while a page is read, so
+        # the caller may write between pages
+        where, params = self.where_clause(table, filters)
+        query = (f"SELECT rowid, {', '.join(COLUMNS[table])} FROM {table} WHERE rowid > ?"
+                 + (f" AND {where}" if where else "") + " ORDER BY rowid LIMIT ?")
+        last_rowid = 0
+        while True:
+            with self.connection() as conn:
+                rows = conn.execute(query, self.adapt([last_rowid] + params + [page_size])).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+# ============================================================
+# Pure-Python engine
+# ============================================================
+
+class MemoryBackend(StorageBackend):
+    """Dict-backed tables with primary and foreign key checks; nothing is persisted.
+
+    Foreign key columns are indexed, so deletes and updates matching on them
+    (and on single-column primary keys) do not scan the table.
+    """
+
+    def __init__(self):
+        self._tables = {table: {} for table in COLUMNS}  # primary key -> row dict
+        # table -> column -> value -> set of primary keys
+        self._indexes = {table: {column: {} for column in FOREIGN_KEYS.get(table, {})} for table in COLUMNS}
+        self._changes = {table: 0 for table in COUNTED_TABLES + (UNLOGGED,)}
+        self._lock = threading.RLock()
+
+    def _count_change(self, table):
+        if table in self._changes:
+            self._changes[table] += 1
+
+    def _index(self, table, key, row):
+        for column, index in self._indexes[table].items():
+            index.setdefault(row[column], set()).add(key)
+
+    def _unindex(self, table, key, row):
+        for column, index in self._indexes[table].items():
+            index[row[column]].discard(key)
+
+    def _matching_keys(self, table, column, value):
+        rows = self._tables[table]
+        columns, values = _key_columns(column, value)
+        if PRIMARY_KEYS[table] == columns:
+            return [values] if values in rows else []
+        if len(columns) == 1 and column in self._indexes[table]:
+            return list(self._indexes[table][column].get(value, ()))
+        return [key for key, row in rows.items() if all(row[name] == v for name, v in zip(columns, values))]
+
+    def _insert(self, table, data):
+        row = dict(DEFAULTS[table])
+        row.update(zip(INSERT_COLUMNS[table], data))
+        key = tuple(row[column] for column in PRIMARY_KEYS[table])
+        if key in self._tables[table]:
+            raise StorageError(f"Duplicate entry {key} for {table}")
+        for column, (parent, parent_column) in FOREIGN_KEYS.get(table, {}).items():
+            if (row[column],) not in self._tables[parent]:
+                raise StorageError(f"No {parent} row with {parent_column} = {row[column]!r}")
+        self._tables[table][key] = row
+        self._index(table, key, row)
+        self._count_change(table)
+        return key
+
+    def _remove(self, table, key):
+        row = self._tables[table].pop(key)
+        self._unindex(table, key, row)
+        self._count_change(table)
+
+    def insert(self, table, data):
+        with self._lock:
+            self._insert(table, data)
+
+    def _insert_all(self, inserts):
+        """Inserts (table, row) rows, all or none."""
+        inserted = []
+        try:
+            for table, data in inserts:
+                inserted.append((table, self._insert(table, data)))
+        except StorageError:
+            # Roll back the rows this call already added
+            for table, key in inserted:
+                self._remove(table, key)
+            raise
+
+    def insert_many(self, table, rows):
+        with self._lock:
+            self._insert_all((table, data) for data in rows)
+
+    def delete(self, table, column, value):
+        _check_columns(table, _key_columns(column, value)[0])
+        with self._lock:
+            removed = self._matching_keys(table, column, value)
+            for key in removed:
+                self._remove(table, key)
+            # ON DELETE CASCADE
+            for child, references in FOREIGN_KEYS.items():
+                for child_column, (parent, parent_column) in references.items():
+                    if parent == table:
+                        for key in removed:
+                            self.delete(child, child_column, key[0])
+
+    def _overlaps(self, room_number, start_date, end_date):
+        rows = self._tables['reservations']
+        return any(rows[key]['start_date'] < end_date and rows[key]['end_date'] > start_date
+                   and not rows[key]['checked_out']
+                   for key in self._matching_keys('reservations', 'room_number', room_number))
+
+    def book_many(self, stays):
+        with self._lock:
+            inserted = []
+            booked = False
+            try:
+                for stay in stays:
+                    # Stays inserted earlier in this call count as booked
+                    if self._overlaps(*stay[1:]):
+                        return False
+                    inserted.append(self._insert('reservations', stay))
+                booked = True
+                return True
+            finally:
+                if not booked:
+                    for key in inserted:
+                        self._remove('reservations', key)
+
+    def update(self, table, updates, column, value):
+        _check_columns(table, list(updates) + list(_key_columns(column, value)[0]))
+        with self._lock:
+            rows = self._tables[table]
+            for key in self._matching_keys(table, column, value):
+                self._unindex(table, key, rows[key])
+                rows[key].update(updates)
+                self._index(table, key, rows[key])
+                self._count_change(table)
+
+    def update_many(self, changes):
+        # Column checks are the only failure, so running them first keeps this all-or-nothing
+        for table, updates, column, value in changes:
+            _check_columns(table, list(updates) + list(_key_columns(column, value)[0]))
+        with self._lock:
+            for change in changes:
+                self.update(*change)
+
+    def write_batch(self, inserts=(), changes=(), deletes=()):
+        for table, updates, column, value in changes:
+            _check_columns(table, list(updates) + list(_key_columns(column, value)[0]))
+        for table, column, value in deletes:
+            _check_columns(table, _key_columns(column, value)[0])
+        with self._lock:
+            # Inserts are the only statements that can fail once the columns are checked
+            self._insert_all(inserts)
+            for change in changes:
+                self.update(*change)
+            for table, column, value in deletes:
+                self.delete(table, column, value)
+
+    def select_all(self, table):
+        columns = COLUMNS[table]
+        with self._lock:
+            return [tuple(row[column] for column in columns) for row in self._tables[table].values()]
+
+    def select_key(self, table, key):
+        with self._lock:
+            row = self._tables[table].get(tuple(key))
+            return None if row is None else tuple(row[column] for column in COLUMNS[table])
+
+    def change_counters(self):
+        with self._lock:
+            return dict(self._changes)
+
+    def count_unlogged_write(self):
+        with self._lock:
+            self._changes[UNLOGGED] += 1
+
+    def iter_pages(self, table, page_size, filters=()):
+        _check_columns(table, [column for column, _, _ in filters])
+        checks = [(column, OPERATORS[op], value) for column, op, value in filters]
+        columns = COLUMNS[table]
+        with self._lock:
+            rows = list(self._tables[table].values())
+        page = []
+        for row in rows:
+            if all(compare(row[column], value) for column, compare, value in checks):
+                page.append(tuple(row[column] for column in columns))
+                if len(page) == page_size:
+                    yield page
+                    page = []
+        if page:
+            yield page
+
+
+BACKENDS = {
+    'mysql': MySQLBackend,
+    'sqlite': SQLiteBackend,
+    'memory': MemoryBackend,
+}
+
+
+def create_backend(name, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}; choose one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,1392 @@
+"""Benchmarks for the hotel system.
+
+Usage: python benchmark.py [name ...]   (runs every benchmark when no name is given)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import backends
+import mydb
+
+
+# ============================================================
+# Round trips per storage operation
+# ============================================================
+
+# Read a global server counter (Questions = statements, Connections = handshakes)
+def _server_counter(name):
+    conn = mydb.get_backend().connect()
+    cursor = conn.cursor()
+    cursor.execute(f"SHOW GLOBAL STATUS LIKE '{name}'")
+    value = int(cursor.fetchone()[1])
+    cursor.close()
+    conn.close()
+    return value
+
+
+# The pre-pool code path: fresh connection plus full DDL before the statements
+def _legacy_execute(*statements):
+    backend = mydb.get_backend()
+    conn = backend.connect()
+    cursor = conn.cursor()
+    backend.create_database(cursor)
+    backends.create_tables(cursor)
+    for query, data in statements:
+        cursor.execute(query, data)
+        if cursor.with_rows:
+            cursor.fetchall()
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+def _legacy_operations(room_number):
+    return [
+        ("add_record", lambda: _legacy_execute(
+            ("INSERT INTO rooms (number, type, price, available) VALUES (%s, %s, %s, %s)",
+             (room_number, "Single", 100, True)))),
+        ("update_record", lambda: _legacy_execute(
+            (f"UPDATE rooms SET available = False WHERE number = {room_number}", None))),
+        ("get_records", lambda: _legacy_execute(
+            ("SELECT * FROM rooms", None),
+            ("SELECT * FROM customers", None),
+            ("SELECT * FROM reservations", None))),
+        ("remove_record", lambda: _legacy_execute(
+            (f"DELETE FROM rooms WHERE number = {room_number}", None))),
+    ]
+
+
+def _pooled_operations(room_number):
+    return [
+        ("add_record", lambda: mydb.add_record("rooms", (room_number, "Single", 100, True))),
+        ("update_record", lambda: mydb.update_record("rooms", {"available": False}, room_number)),
+        ("get_records", lambda: mydb.get_records()),
+        ("remove_record", lambda: mydb.remove_record("rooms", room_number)),
+    ]
+
+
+def _counters():
+    return _server_counter("Questions"), _server_counter("Connections")
+
+
+# Run each operation of the add/update/get/remove cycle `repeat` times and
+# return (statements, handshakes, milliseconds) per call
+def _measure(operations, repeat):
+    # Calibrate away the cost of reading the counters themselves
+    q0, c0 = _counters()
+    q1, c1 = _counters()
+    overhead = (q1 - q0, c1 - c0)
+
+    totals = {name: [0, 0, 0.0] for name, _ in operations}
+    for _ in range(repeat):
+        for name, operation in operations:
+            questions, connections = _counters()
+            start = time.perf_counter()
+            operation()
+            elapsed = time.perf_counter() - start
+            after_questions, after_connections = _counters()
+            totals[name][0] += after_questions - questions - overhead[0]
+            totals[name][1] += after_connections - connections - overhead[1]
+            totals[name][2] += elapsed
+    return {name: (q / repeat, c / repeat, t / repeat * 1000) for name, (q, c, t) in totals.items()}
+
+
+def bench_round_trips(repeat=50):
+    """Compares statements and handshakes per CRUD call before and after pooling."""
+    mydb.configure("mysql").init_db()
+    room_number = 990001  # Outside any real room range; removed again at the end of each cycle
+    before = _measure(_legacy_operations(room_number), repeat)
+    after = _measure(_pooled_operations(room_number), repeat)
+
+    print(f"{'operation':<15}{'stmts before':>14}{'stmts after':>13}{'conns before':>14}{'conns after':>13}{'ms before':>11}{'ms after':>10}")
+    for name in before:
+        b, a = before[name], after[name]
+        print(f"{name:<15}{b[0]:>14.1f}{a[0]:>13.1f}{b[1]:>14.1f}{a[1]:>13.1f}{b[2]:>11.2f}{a[2]:>10.2f}")
+
+
+# ============================================================
+# Bulk inserts
+# ============================================================
+
+def _room_rows(count):
+    return [(number, "Double", 120.0, True) for number in range(1, count + 1)]
+
+
+# Point mydb at an empty database of the given engine
+def _fresh_backend(name, directory, label):
+    if name == "sqlite":
+        return mydb.configure("sqlite", path=os.path.join(directory, f"{label}.db"))
+    return mydb.configure(name)
+
+
+def bench_bulk_insert(count=10000):
+    """Times add_record in a loop against add_records on SQLite and the memory backend."""
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("sqlite", "memory"):
+            _fresh_backend(name, directory, "single")
+            start = time.perf_counter()
+            for row in _room_rows(count):
+                mydb.add_record("rooms", row)
+            single = time.perf_counter() - start
+
+            _fresh_backend(name, directory, "bulk")
+            start = time.perf_counter()
+            committed = mydb.add_records("rooms", _room_rows(count))
+            bulk = time.perf_counter() - start
+            mydb.get_backend().close()
+
+            print(f"{name:<8} add_record x{count}: {single:.2f}s ({count / single:,.0f} rows/sec)   "
+                  f"add_records: {bulk:.2f}s ({committed / bulk:,.0f} rows/sec)")
+
+
+# ============================================================
+# Startup load
+# ============================================================
+
+# Fill the current backend with a synthetic property and its booking history
+def _seed_history(rooms, customers, reservations):
+    mydb.add_records("rooms", _room_rows(rooms))
+    mydb.add_records("customers", ((f"Guest {i}", f"guest{i}@example.com", "card") for i in range(customers)))
+    first_day = date(2020, 1, 1).toordinal()
+    mydb.add_records("reservations", (
+        (f"Guest {i % customers}", i % rooms + 1,
+         date.fromordinal(first_day + i // rooms * 3), date.fromordinal(first_day + i // rooms * 3 + 2))
+        for i in range(reservations)
+    ))
+
+
+def bench_load(reservations=100000):
+    """Times get_records and HotelManagementSystem() over a large reservation history."""
+    from imperative import HotelManagementSystem
+
+    mydb.configure("memory")
+    _seed_history(1000, 10000, reservations)
+
+    start = time.perf_counter()
+    mydb.get_records()
+    records = time.perf_counter() - start
+
+    start = time.perf_counter()
+    hotel_system = HotelManagementSystem()
+    startup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(10000):
+        hotel_system.repository.get_customer(f"Guest {i}")
+        hotel_system.repository.get_room(i % 1000 + 1)
+        hotel_system.repository.find_reservation(f"Guest {i}", i % 1000 + 1)
+    lookups = (time.perf_counter() - start) / 10000
+
+    print(f"{reservations} reservations: get_records {records:.2f}s, HotelManagementSystem() {startup:.2f}s, "
+          f"menu lookups {lookups * 1e6:.1f}us each")
+
+
+# ============================================================
+# Date-range availability
+# ============================================================
+
+ROOM_TYPES = ("Single", "Double", "Suite")
+
+
+def bench_availability(rooms=1000, nights=1000000, queries=10000):
+    """find_available over 1k rooms with 1M booked nights, against a scan of all stays."""
+    from availability import AvailabilityIndex
+
+    rng = random.Random(42)
+    first_day = date(2024, 1, 1).toordinal()
+    index = AvailabilityIndex()
+    stays = []
+    booked = 0
+    start = time.perf_counter()
+    for room_number in range(1, rooms + 1):
+        index.add_room(room_number, ROOM_TYPES[room_number % 3])
+        day = first_day
+        while booked < nights * room_number // rooms:
+            day += rng.randint(0, 2)  # Gap before the next stay
+            length = rng.randint(1, 7)
+            index.book(room_number, date.fromordinal(day), date.fromordinal(day + length))
+            stays.append((room_number, day, day + length))
+            day += length
+            booked += length
+    build = time.perf_counter() - start
+    horizon = day - first_day
+
+    ranges = []
+    for _ in range(queries):
+        begin = first_day + rng.randrange(horizon)
+        ranges.append((ROOM_TYPES[rng.randrange(3)], date.fromordinal(begin), date.fromordinal(begin + rng.randint(1, 7))))
+
+    start = time.perf_counter()
+    for room_type, begin, end in ranges:
+        index.find_available(room_type, begin, end)
+    indexed = (time.perf_counter() - start) / queries
+
+    scanned_queries = ranges[:20]
+    start = time.perf_counter()
+    for room_type, begin, end in scanned_queries:
+        busy = {room for room, s, e in stays if s < end.toordinal() and e > begin.toordinal()}
+        [n for n in range(1, rooms + 1) if ROOM_TYPES[n % 3] == room_type and n not in busy]
+    scanned = (time.perf_counter() - start) / len(scanned_queries)
+
+    print(f"{rooms} rooms, {booked} booked nights in {len(stays)} stays (index built in {build:.2f}s)")
+    print(f"find_available: {indexed * 1000:.3f}ms per query   full scan: {scanned * 1000:.1f}ms per query")
+
+
+# ============================================================
+# Cold start with a long history
+# ============================================================
+
+def bench_cold_start(reservations=200000):
+    """Startup time and peak memory, full load vs active-only load, on a SQLite file."""
+    from imperative import HotelManagementSystem
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend = _fresh_backend("sqlite", directory, "history")
+        _seed_history(1000, 10000, reservations)
+        # Everything but the last five rounds of stays is history
+        cutoff = date(2020, 1, 1) + timedelta(days=(reservations // 1000 - 5) * 3)
+        backend.execute("UPDATE reservations SET checked_in = 1, checked_out = 1 WHERE start_date < ?", (cutoff,))
+
+        for label, load in (("get_records()", lambda: mydb.get_records()),
+                            ("get_records(active_only=True)", lambda: mydb.get_records(active_only=True)),
+                            ("HotelManagementSystem()", HotelManagementSystem)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            load()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:<32}{elapsed:>7.2f}s  peak {peak / 2**20:>7.1f} MiB")
+        backend.close()
+
+
+# ============================================================
+# Report generation
+# ============================================================
+
+def bench_report(reservations=100000):
+    """generate_report from maintained aggregates against a full recompute, plus the consistency check."""
+    import contextlib
+    import io
+    from imperative import Billing, HotelManagementSystem
+
+    mydb.configure("memory")
+    _seed_history(1000, 10000, reservations)
+    hotel_system = HotelManagementSystem()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        hotel_system.generate_report()  # The first report folds in the checked-out history
+        start = time.perf_counter()
+        for _ in range(100):
+            hotel_system.generate_report()
+        maintained = (time.perf_counter() - start) / 100
+
+    start = time.perf_counter()
+    sum(1 for room in hotel_system.repository.rooms.values() if not room.available)
+    sum(Billing.generate_bill(res) for res in hotel_system.repository.reservations.values())
+    recomputed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    mismatches = hotel_system.check_aggregates()
+    checked = time.perf_counter() - start
+
+    print(f"{reservations} reservations: generate_report {maintained * 1e6:.0f}us, "
+          f"full recompute {recomputed * 1000:.1f}ms, consistency check {checked * 1000:.0f}ms "
+          f"({len(mismatches)} mismatches)")
+
+
+# ============================================================
+# Vectorized analytics
+# ============================================================
+
+# Synthetic get_records-style dicts: back-to-back stays over roughly three years
+def _synthetic_records(rooms=1000, stays_per_room=300, seed=7):
+    rng = random.Random(seed)
+    room_dicts = [{"room_number": n, "room_type": ROOM_TYPES[n % 3], "price": 80.0 + 40 * (n % 3), "available": True}
+                  for n in range(1, rooms + 1)]
+    customer = {"name": "Guest", "contact_info": "", "payment_method": "card"}
+    reservations = []
+    for room in room_dicts:
+        day = date(2022, 1, 1).toordinal()
+        for _ in range(stays_per_room):
+            day += rng.randint(0, 1)
+            length = rng.randint(1, 5)
+            reservations.append({"customer": customer, "room": room,
+                                 "start_date": date.fromordinal(day), "end_date": date.fromordinal(day + length),
+                                 "checked_in": True, "checked_out": True})
+            day += length
+    return room_dicts, reservations
+
+
+# The per-dict way: walk every stay night by night
+def _dict_summary(rooms, reservations, start_date, end_date):
+    sold_by_night = {}
+    revenue = 0.0
+    revenue_by_type = {}
+    for res in reservations:
+        night = max(res["start_date"], start_date)
+        while night < min(res["end_date"], end_date):
+            sold_by_night[night] = sold_by_night.get(night, 0) + 1
+            revenue += res["room"]["price"]
+            revenue_by_type[res["room"]["room_type"]] = revenue_by_type.get(res["room"]["room_type"], 0) + res["room"]["price"]
+            night += timedelta(days=1)
+    sold = sum(sold_by_night.values())
+    available = len(rooms) * (end_date - start_date).days
+    return {"revenue": revenue, "adr": revenue / sold, "revpar": revenue / available,
+            "revenue_by_room_type": revenue_by_type}
+
+
+def bench_analytics():
+    """RevPAR/ADR/occupancy over a multi-year window: NumPy columns vs per-dict loops."""
+    try:
+        from analytics import ReservationColumns
+    except ImportError:
+        print("numpy is not installed; skipping (pip install numpy)")
+        return
+
+    rooms, reservations = _synthetic_records()
+    start_date, end_date = date(2022, 1, 1), date(2024, 12, 31)
+
+    start = time.perf_counter()
+    expected = _dict_summary(rooms, reservations, start_date, end_date)
+    per_dict = time.perf_counter() - start
+
+    start = time.perf_counter()
+    columns = ReservationColumns.from_records(rooms, reservations)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    summary = columns.summary(start_date, end_date)
+    vectorized = time.perf_counter() - start
+
+    assert abs(summary["revenue"] - expected["revenue"]) < 1e-6 * expected["revenue"]
+    print(f"{len(reservations)} reservations over {(end_date - start_date).days} nights")
+    print(f"per-dict loops: {per_dict:.2f}s   numpy: {vectorized * 1000:.1f}ms (+{build:.2f}s one-off column build)")
+
+
+# ============================================================
+# Functional session
+# ============================================================
+
+# Menu inputs for a long desk session: set up rooms and guests, then keep
+# cycling book / check in / check out with the odd report
+def _session_inputs(operations, rooms=1000):
+    for n in range(1, rooms + 1):
+        yield from ("1", str(n), ROOM_TYPES[n % 3], "100")
+        yield from ("2", f"Guest {n}", "", "card")
+    operations -= 2 * rooms
+    cycle = 0
+    while operations > 0:
+        n = cycle % rooms + 1
+        day = date(2025, 1, 1) + timedelta(days=2 * (cycle // rooms))
+        yield from ("3", f"Guest {n}", str(n), day.isoformat(), (day + timedelta(days=2)).isoformat())
+        yield from ("4", f"Guest {n}", str(n))
+        yield from ("5", f"Guest {n}", str(n))
+        operations -= 3
+        if cycle % 1000 == 0:
+            yield "6"
+            operations -= 1
+        cycle += 1
+    yield "7"
+
+
+def bench_functional_session(operations=100000):
+    """100k menu actions through functional.menu_system in one session."""
+    import contextlib
+    import io
+    import functional
+
+    mydb.configure("memory")
+    inputs = _session_inputs(operations)
+    limit = sys.getrecursionlimit()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = functional.menu_system(functional.load_state([], [], []), read=lambda prompt: next(inputs))
+    elapsed = time.perf_counter() - start
+
+    mismatches = functional.check_aggregates(state)
+    print(f"{operations} actions in {elapsed:.1f}s ({operations / elapsed:.0f} actions/s), "
+          f"{len(state.rooms)} rooms, {len(state.reservations)} reservations in session "
+          f"(recursion limit {limit}), {len(mismatches)} aggregate mismatches")
+
+
+# ============================================================
+# Booking contention
+# ============================================================
+
+# One desk hammering a few rooms with random stays; runs in its own process
+def _contend(path, desk, attempts, rooms, locked):
+    mydb.configure("sqlite", path=path)
+    rng = random.Random(desk)
+    booked = 0
+    start = time.perf_counter()
+    for attempt in range(attempts):
+        room_number = rng.randint(1, rooms)
+        start_date = date(2025, 1, 1) + timedelta(days=rng.randint(0, 60))
+        end_date = start_date + timedelta(days=rng.randint(1, 3))
+        if locked:
+            booked += bool(mydb.book_reservation(f"Desk {desk}", room_number, start_date, end_date))
+        else:
+            # Check, then insert: the race the booking transaction closes
+            clash = [("room_number", "=", room_number), ("start_date", "<", end_date), ("end_date", ">", start_date)]
+            if not any(True for _ in mydb.iter_rows("reservations", clash)):
+                mydb.add_record("reservations", (f"Desk {desk}", room_number, start_date, end_date))
+                booked += 1
+    return booked, time.perf_counter() - start
+
+
+def _double_bookings(rows):
+    """Pairs of reservations for the same room whose stays overlap."""
+    by_room = {}
+    for customer_name, room_number, start_date, end_date in rows:
+        by_room.setdefault(room_number, []).append((str(start_date), str(end_date)))
+    clashes = 0
+    for stays in by_room.values():
+        stays.sort()
+        latest_end = ""
+        for start_date, end_date in stays:
+            clashes += start_date < latest_end
+            latest_end = max(latest_end, end_date)
+    return clashes
+
+
+def bench_contention(desks=8, attempts=300, rooms=4):
+    """Desks in separate processes booking the same few rooms: check-then-insert vs book_reservation."""
+    import multiprocessing
+
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        for locked in (False, True):
+            label = "book_reservation" if locked else "check-then-insert"
+            path = os.path.join(directory, f"{label}.db")
+            backend = _fresh_backend("sqlite", directory, label)
+            backend.insert_many("rooms", _room_rows(rooms))
+            backend.insert_many("customers", [(f"Desk {desk}", "", "card") for desk in range(desks)])
+            backend.close()
+
+            with context.Pool(desks) as pool:
+                results = pool.starmap(_contend, [(path, desk, attempts, rooms, locked) for desk in range(desks)])
+            booked = sum(count for count, _ in results)
+            elapsed = max(seconds for _, seconds in results)
+            backend = backends.SQLiteBackend(path)
+            rows = [row[:4] for row in backend.select_all("reservations")]
+            backend.close()
+            print(f"{label:>18}: {desks} desks x {attempts} attempts, {desks * attempts / elapsed:,.0f} attempts/s, "
+                  f"{booked} booked, {len(rows)} stored, {_double_bookings(rows)} double bookings")
+
+
+# ============================================================
+# Check-in storm
+# ============================================================
+
+def _check_in_statements(room_number):
+    # The old check-in: one commit per statement
+    key = (f"Guest {room_number - 1}", room_number, date(2025, 6, 1))
+    mydb.update_record("reservations", {"checked_in": True}, key)
+    mydb.update_record("reservations", {"checked_out": False}, key)
+    mydb.update_record("rooms", {"available": False}, room_number)
+
+
+def _check_in_grouped(room_number):
+    mydb.update_records([
+        ("reservations", {"checked_in": True, "checked_out": False}, (f"Guest {room_number - 1}", room_number, date(2025, 6, 1))),
+        ("rooms", {"available": False}, room_number),
+    ])
+
+
+def bench_checkin_storm(guests=300, desks=8):
+    """A tour bus checking in at several desks at once: commit per statement, per check-in, write-behind."""
+    import threading
+
+    modes = [
+        ("commit per statement", _check_in_statements, False),
+        ("commit per check-in", _check_in_grouped, False),
+        ("write-behind", _check_in_grouped, True),
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        for label, check_in, write_behind in modes:
+            # synchronous=FULL: every commit is an fsync, as on a durable server
+            backend = mydb.configure("sqlite", path=os.path.join(directory, f"{label}.db"),
+                                     synchronous="FULL", write_behind=write_behind)
+            backend.insert_many("rooms", _room_rows(guests))
+            backend.insert_many("customers", [(f"Guest {n}", "", "card") for n in range(guests)])
+            backend.insert_many("reservations", [(f"Guest {n}", n + 1, date(2025, 6, 1), date(2025, 6, 4))
+                                                 for n in range(guests)])
+
+            def desk(rooms):
+                for room_number in rooms:
+                    check_in(room_number)
+
+            threads = [threading.Thread(target=desk, args=(range(d + 1, guests + 1, desks),)) for d in range(desks)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            mydb.flush()
+            elapsed = time.perf_counter() - start
+
+            queue = mydb.get_write_behind()
+            commits = queue.commits if queue else guests * (3 if check_in is _check_in_statements else 1)
+            checked_in = sum(1 for row in backend.select_all("reservations") if row[4])
+            print(f"{label:>21}: {guests} check-ins at {desks} desks in {elapsed * 1000:.0f}ms "
+                  f"({guests / elapsed:,.0f}/s), {commits} commits, {checked_in} checked in")
+            mydb.shutdown()
+
+
+# ============================================================
+# History growth
+# ============================================================
+
+def bench_history_growth(sizes=(1000, 10000, 100000), operations=1000):
+    """Per-operation cost of status updates and booking checks as the reservation history grows."""
+    rng = random.Random(3)
+    first_day = date(2020, 1, 1).toordinal()
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            backend = _fresh_backend("sqlite", directory, f"history-{size}")
+            _seed_history(1000, 1000, size)
+            # Keys of existing stays, in _seed_history's layout
+            keys = [(f"Guest {i % 1000}", i % 1000 + 1, date.fromordinal(first_day + i // 1000 * 3))
+                    for i in rng.sample(range(size), operations)]
+
+            start = time.perf_counter()
+            for key in keys:
+                mydb.update_records([("reservations", {"checked_in": True}, key)])
+            keyed = (time.perf_counter() - start) / operations
+
+            # The old WHERE room_number = ? update, for comparison
+            start = time.perf_counter()
+            for key in keys:
+                backend.update("reservations", {"checked_in": True}, "room_number", key[1])
+            room_wide = (time.perf_counter() - start) / operations
+
+            start = time.perf_counter()
+            for i in range(operations):
+                start_date = date(2030, 1, 1) + timedelta(days=3 * (i // 1000))
+                mydb.book_reservation(f"Guest {i % 1000}", i % 1000 + 1, start_date, start_date + timedelta(days=2))
+            booking = (time.perf_counter() - start) / operations
+
+            print(f"{size:>7} reservations: keyed update {keyed * 1e6:.0f}us (1 row), "
+                  f"room-wide update {room_wide * 1e6:.0f}us (~{max(1, size // 1000)} rows), "
+                  f"book_reservation {booking * 1e6:.0f}us")
+            mydb.shutdown()
+
+
+# ============================================================
+# Read-through cache
+# ============================================================
+
+def bench_cache(rooms=10000, lookups=100000, cache_size=500):
+    """get_room through the read-through cache vs a database read per lookup, with skewed access."""
+    rng = random.Random(5)
+    # Most lookups go to a small set of busy rooms
+    numbers = [min(rooms, int(rng.paretovariate(0.6))) for _ in range(lookups)]
+    with tempfile.TemporaryDirectory() as directory:
+        saved = mydb.CACHE_SIZE
+        mydb.CACHE_SIZE = cache_size
+        try:
+            backend = _fresh_backend("sqlite", directory, "cache")
+        finally:
+            mydb.CACHE_SIZE = saved
+        mydb.add_records("rooms", _room_rows(rooms))
+
+        start = time.perf_counter()
+        for number in numbers:
+            mydb.room_from_row(backend.select_key("rooms", (number,)))
+        uncached = (time.perf_counter() - start) / lookups
+
+        start = time.perf_counter()
+        for i, number in enumerate(numbers):
+            mydb.get_room(number)
+            if i % 100 == 0:  # A write now and then invalidates its row
+                mydb.update_record("rooms", {"available": i % 200 == 0}, number)
+        cached = (time.perf_counter() - start) / lookups
+
+        stats = mydb.cache_stats()["rooms"]
+        print(f"{lookups} lookups over {rooms} rooms: database {uncached * 1e6:.1f}us, cached {cached * 1e6:.1f}us "
+              f"per lookup (1% writes)")
+        print(f"cache of {cache_size}: hit rate {stats['hit_rate']:.1%}, {stats['evictions']} evictions, "
+              f"{stats['invalidations']} invalidations, ~{stats['bytes'] / 1024:.0f} KiB")
+        mydb.shutdown()
+
+
+# ============================================================
+# Reservation memory footprint
+# ============================================================
+
+# The model as it was: plain __dict__ objects, and dicts embedding the room and customer
+class _DictRoom:
+    def __init__(self, room_number, room_type, price):
+        self.room_number, self.room_type, self.price, self.available = room_number, room_type, price, True
+
+
+class _DictReservation:
+    def __init__(self, customer, room, start_date, end_date):
+        self.customer, self.room, self.start_date, self.end_date = customer, room, start_date, end_date
+        self.checked_in = self.checked_out = False
+
+
+def _stays(reservations, rooms):
+    # Fresh date objects per stay, as rows decoded from the database give
+    first_day = date(2020, 1, 1).toordinal()
+    for i in range(reservations):
+        start = first_day + i // rooms * 3
+        yield f"Guest {i % 5000}", i % rooms + 1, date.fromordinal(start), date.fromordinal(start + 2)
+
+
+def bench_memory(reservations=1000000, rooms=1000):
+    """tracemalloc footprint of a reservation history in each in-memory representation."""
+    import functional
+    from imperative import Customer, Reservation, Room
+    from store import ReservationStore
+
+    def dict_objects():
+        room_objects = {n: _DictRoom(n, ROOM_TYPES[n % 3], 100.0) for n in range(1, rooms + 1)}
+        customers = {}
+        return [_DictReservation(customers.setdefault(name, Customer(name, "", "card")), room_objects[number], start, end)
+                for name, number, start, end in _stays(reservations, rooms)]
+
+    def embedded_dicts():
+        room_dicts = {n: {"room_number": n, "room_type": ROOM_TYPES[n % 3], "price": 100.0, "available": True}
+                      for n in range(1, rooms + 1)}
+        customers = {}
+        return [{"customer": customers.setdefault(name, {"name": name, "contact_info": "", "payment_method": "card"}),
+                 "room": room_dicts[number], "start_date": start, "end_date": end,
+                 "checked_in": False, "checked_out": False}
+                for name, number, start, end in _stays(reservations, rooms)]
+
+    def slotted_objects():
+        room_objects = {n: Room(n, ROOM_TYPES[n % 3], 100.0) for n in range(1, rooms + 1)}
+        customers = {}
+        return [Reservation(customers.setdefault(name, Customer(name, "", "card")), room_objects[number], start, end)
+                for name, number, start, end in _stays(reservations, rooms)]
+
+    def keyed_tuples():
+        return [functional.Reservation(name, number, start, end, False, False)
+                for name, number, start, end in _stays(reservations, rooms)]
+
+    def array_store():
+        store = ReservationStore()
+        for stay in _stays(reservations, rooms):
+            store.append(*stay)
+        return store
+
+    representations = [
+        ("imperative __dict__ objects (before)", dict_objects),
+        ("functional dicts embedding room/customer (before)", embedded_dicts),
+        ("imperative __slots__ objects", slotted_objects),
+        ("functional Reservation tuples keyed by id", keyed_tuples),
+        ("store.ReservationStore arrays", array_store),
+    ]
+    print(f"{reservations} reservations over {rooms} rooms")
+    for label, build in representations:
+        tracemalloc.start()
+        held = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f"{label:>50}: {size / 2 ** 20:7.1f} MiB ({size / reservations:.0f} bytes/stay)")
+        del held
+
+
+# ============================================================
+# Instrumentation overhead
+# ============================================================
+
+# Book, check in and check out one stay per guest, round-robin over the rooms
+def _desk_cycles(stays, rooms):
+    from imperative import HotelManagementSystem
+
+    hotel_system = HotelManagementSystem()
+    for n in range(1, rooms + 1):
+        hotel_system.add_room(n, ROOM_TYPES[n % 3], 100)
+        hotel_system.add_customer(f"Guest {n}", "", "card")
+    first_day = date(2030, 1, 1).toordinal()
+    start = time.perf_counter()
+    for i in range(stays):
+        n = i % rooms + 1
+        day = first_day + i // rooms * 3
+        reservation = hotel_system.make_reservation(hotel_system.find_customer(f"Guest {n}"), hotel_system.find_room(n),
+                                                    date.fromordinal(day), date.fromordinal(day + 2))
+        hotel_system.check_in(reservation)
+        hotel_system.check_out(reservation)
+    hotel_system.generate_report()
+    return (time.perf_counter() - start) / (3 * stays)
+
+
+def bench_instrumentation(stays=5000, rooms=100):
+    """Cost per desk operation with no span decorators, metrics off and metrics on (SQLite in memory)."""
+    import contextlib
+    import io
+    import metrics
+    from imperative import HotelManagementSystem
+
+    operations = ("make_reservation", "check_in", "check_out", "generate_report")
+    timed_methods = {name: getattr(HotelManagementSystem, name) for name in operations}
+    modes = (("undecorated", False, True), ("metrics off", False, False), ("metrics on", True, False))
+    results = {}
+    # Interleaved rounds, best of three, so warm-up and drift hit every mode alike
+    for _ in range(3):
+        for label, instrument, undecorated in modes:
+            if undecorated:
+                for name, method in timed_methods.items():
+                    setattr(HotelManagementSystem, name, method.__wrapped__)
+            mydb.configure("sqlite", path=":memory:", instrument=instrument)
+            metrics.reset()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    per_op = _desk_cycles(stays, rooms)
+            finally:
+                for name, method in timed_methods.items():
+                    setattr(HotelManagementSystem, name, method)
+            mydb.shutdown()
+            results[label] = min(per_op, results.get(label, per_op))
+
+    base = results["undecorated"]
+    for label, per_op in results.items():
+        print(f"{label:>12}: {per_op * 1e6:6.1f}us per operation ({per_op / base - 1:+.1%})")
+    for operation in operations:
+        histogram = metrics.histogram(metrics.OPERATION_SECONDS, operation=operation)
+        queries = metrics.counter(metrics.OPERATION_QUERIES, operation=operation) / histogram.count
+        print(f"{operation:>16}: {histogram.count} calls, p50 <= {histogram.quantile(0.5) * 1000:g} ms, "
+              f"p99 <= {histogram.quantile(0.99) * 1000:g} ms, {queries:.1f} queries each")
+    metrics.disable()
+
+
+# ============================================================
+# Sharded report
+# ============================================================
+
+def bench_sharded_report(rooms=1000, years=3, worker_counts=(2, 4, 8)):
+    """reports.generate over a multi-year history with 1..N worker processes, checked against generate_bill."""
+    import reports
+
+    stays_per_room = years * 365 // 3
+    first_day = date(2020, 1, 1)
+    window = (first_day, date(first_day.year + years, 1, 1))
+    with tempfile.TemporaryDirectory() as directory:
+        _fresh_backend("sqlite", directory, "report")
+        _seed_history(rooms, 10000, rooms * stays_per_room)
+        print(f"{rooms * stays_per_room} reservations over {years} years, {os.cpu_count()} cores")
+
+        start = time.perf_counter()
+        serial, _ = reports.generate(*window, workers=1)
+        baseline = time.perf_counter() - start
+        print(f"in-process shards: {baseline:.2f}s")
+        start = time.perf_counter()
+        mismatches = reports.check(serial, *window)
+        print(f"serial Billing.generate_bill pass: {time.perf_counter() - start:.2f}s, {len(mismatches)} mismatches")
+
+        for workers in worker_counts:
+            start = time.perf_counter()
+            totals, _ = reports.generate(*window, workers=workers)
+            elapsed = time.perf_counter() - start
+            print(f"{workers} worker process(es): {elapsed:.2f}s ({baseline / elapsed:.1f}x), "
+                  f"totals {'match' if totals == serial else 'DIFFER'}")
+        mydb.shutdown()
+
+
+# ============================================================
+# Decimal pricing
+# ============================================================
+
+def bench_pricing(stays=100000, rooms=1000):
+    """Bulk quotes under a seasonal plan: per-night Decimal loop vs the memoised calendar vs float days * price."""
+    import pricing
+    from decimal import Decimal
+
+    plan = pricing.RatePlan(
+        seasons=[pricing.Season("holidays", (12, 20), (1, 3), Decimal("1.50")),
+                 pricing.Season("summer", (6, 15), (9, 1), Decimal("1.25")),
+                 pricing.Season("low", (1, 3), (3, 1), Decimal("0.85"))],
+        weekend=Decimal("1.10"), long_stay=[(7, "0.05"), (28, "0.15")])
+    room_types = ("Single", "Double", "Suite")
+    prices = {"Single": 79.99, "Double": 119.5, "Suite": 249.0}
+    rng = random.Random(42)
+    first_day = date(2024, 1, 1).toordinal()
+    work = []
+    for _ in range(stays):
+        room_type = room_types[rng.randrange(rooms) % 3]
+        start = date.fromordinal(first_day + rng.randrange(3 * 365))
+        work.append((room_type, prices[room_type], start, start + timedelta(days=rng.randint(1, 30))))
+    nights = sum((end - start).days for _, _, start, end in work)
+    print(f"{stays} stays, {nights} nights, 3 room types under one plan")
+
+    engine = pricing.PricingEngine({room_type: plan for room_type in room_types})
+    start = time.perf_counter()
+    looped = []
+    for room_type, price, start_date, end_date in work:
+        subtotal = sum((rate for _, rate in engine.nightly_rates(room_type, price, start_date, end_date)), Decimal(0))
+        off = (subtotal * plan.discount((end_date - start_date).days)).quantize(pricing.CENT, pricing.ROUND_HALF_UP)
+        looped.append(subtotal - off)
+    loop_time = time.perf_counter() - start
+    print(f"per-night Decimal loop:  {loop_time:.2f}s ({loop_time / stays * 1e6:.1f} us/quote)")
+
+    engine = pricing.PricingEngine({room_type: plan for room_type in room_types})
+    start = time.perf_counter()
+    quoted = [engine.quote(*stay).total for stay in work]
+    quote_time = time.perf_counter() - start
+    print(f"calendar quote():        {quote_time:.2f}s ({quote_time / stays * 1e6:.1f} us/quote, "
+          f"{len(engine._calendars)} calendars built), {loop_time / quote_time:.0f}x faster")
+
+    start = time.perf_counter()
+    for _, price, start_date, end_date in work:
+        (end_date - start_date).days * price
+    float_time = time.perf_counter() - start
+    print(f"float days * price:      {float_time:.2f}s ({float_time / stays * 1e6:.1f} us/quote, no plan, inexact)")
+    mismatches = sum(a != b for a, b in zip(looped, quoted))
+    print(f"totals: ${sum(quoted):,.2f}, {mismatches} mismatches between the loop and quote()")
+
+
+# ============================================================
+# Event log recovery
+# ============================================================
+
+def bench_event_log(events=10000000, rooms=1000, customers=10000):
+    """Cold start from a long event log: latest snapshot plus tail vs replaying every event."""
+    import contextlib
+    import io
+    import eventlog
+    from imperative import HotelManagementSystem
+
+    with tempfile.TemporaryDirectory() as directory:
+        log = eventlog.EventLog(directory)
+        # Stamped as in step with the empty memory database the desk opens below
+        log.state.unlogged_writes = 0
+        start = time.perf_counter()
+        for n in range(1, rooms + 1):
+            log.append(eventlog.ROOM_ADDED, n, ("Single", "Double", "Suite")[n % 3], 100.0)
+        for i in range(customers):
+            log.append(eventlog.CUSTOMER_ADDED, f"Guest {i}", f"guest{i}@example.com", "card")
+        # Each room gets back-to-back stays; a stay is checked in one round
+        # after it is booked and checked out the round after that
+        first_day = date(2020, 1, 1).toordinal()
+        keys = []
+        i = 0
+        while log.seq < events:
+            key = (f"Guest {i % customers}", i % rooms + 1, date.fromordinal(first_day + i // rooms * 3).isoformat())
+            log.append(eventlog.RESERVATION_CREATED, *key, date.fromordinal(first_day + i // rooms * 3 + 2).isoformat())
+            keys.append(key)
+            if i >= rooms:
+                log.append(eventlog.CHECKED_IN, *keys[i - rooms])
+            if i >= 2 * rooms:
+                log.append(eventlog.CHECKED_OUT, *keys[i - 2 * rooms])
+                keys[i - 2 * rooms] = None
+            i += 1
+        log.close()
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        print(f"{log.seq} events ({i} stays) written in {elapsed:.1f}s ({elapsed / log.seq * 1e6:.1f} us/event), "
+              f"{size / 2**20:.0f} MiB, snapshot every {log.snapshot_every}")
+
+        start = time.perf_counter()
+        recovered = eventlog.EventLog(directory)
+        snapshot_time = time.perf_counter() - start
+        print(f"open (snapshot at {recovered.snapshot_seq} + {recovered.seq - recovered.snapshot_seq} events): "
+              f"{snapshot_time:.3f}s")
+
+        mydb.configure("memory")
+        saved, eventlog.EVENT_LOG = eventlog.EVENT_LOG, directory
+        try:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                hotel_system = HotelManagementSystem()
+            print(f"HotelManagementSystem() from the log: {time.perf_counter() - start:.3f}s, "
+                  f"{len(hotel_system.reservations)} open reservations")
+            hotel_system.events.close()
+        finally:
+            eventlog.EVENT_LOG = saved
+
+        start = time.perf_counter()
+        state, seq, _ = recovered.recover(use_snapshots=False)
+        replay_time = time.perf_counter() - start
+        same = (state.rooms, state.customers, state.reservations) == (
+            recovered.state.rooms, recovered.state.customers, recovered.state.reservations)
+        print(f"full replay of {seq} events: {replay_time:.1f}s ({replay_time / snapshot_time:.0f}x the snapshot start), "
+              f"state {'matches' if same else 'DIFFERS'}")
+
+
+# ============================================================
+# Occupancy calendar
+# ============================================================
+
+def bench_occupancy(rooms=1000, nights=730, repeat=5):
+    """Horizon queries on the bitset calendar against per-night checks on the availability index."""
+    from availability import AvailabilityIndex
+    from occupancy import OccupancyCalendar
+
+    first_day = date(2030, 1, 1)
+    calendar = OccupancyCalendar(first_day, nights)
+    index = AvailabilityIndex()
+    room_types = ("Single", "Double", "Suite")
+    rng = random.Random(7)
+    peak = (nights // 2, nights // 2 + 7)
+    stays = 0
+    for number in range(1, rooms + 1):
+        room_type = room_types[number % 3]
+        calendar.add_room(number, room_type)
+        index.add_room(number, room_type)
+        day = rng.randrange(4)
+        while day < nights:
+            length = rng.randint(1, 7)
+            start, end = first_day + timedelta(days=day), first_day + timedelta(days=day + length)
+            index.book(number, start, end)
+            calendar.book(number, start, end)
+            if day < 7:
+                calendar.check_in(number, start, end)
+            stays += 1
+            day += length
+            gap = rng.choice((0, 0, 0, 1, 2))
+            if not (day + gap <= peak[0] or day >= peak[1]):
+                gap = 0  # Every room is sold through the peak week
+            day += gap
+    print(f"{rooms} rooms x {nights} nights, {stays} stays")
+
+    def best(query):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = query()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    days = [first_day + timedelta(days=n) for n in range(nights)]
+    suites = [number for number in range(1, rooms + 1) if room_types[number % 3] == "Suite"]
+
+    def scan_free_nights():
+        return {number: sum(index.is_free(number, day, day + timedelta(days=1)) for day in days)
+                for number in range(1, rooms + 1)}
+
+    def scan_free_suites():
+        return [(day, sum(index.is_free(number, day, day + timedelta(days=1)) for number in suites)) for day in days]
+
+    def scan_sold_out():
+        return [day for day in days
+                if not any(index.is_free(number, day, day + timedelta(days=1)) for number in range(1, rooms + 1))]
+
+    for label, bitset_query, scan in (
+            ("free nights per room", calendar.free_nights, scan_free_nights),
+            ("free Suites per night", lambda: calendar.free_rooms_per_night(room_type="Suite"), scan_free_suites),
+            ("sold-out dates", calendar.sold_out_dates, scan_sold_out)):
+        bitset_time, answer = best(bitset_query)
+        scan_time, expected = best(scan)
+        print(f"{label:<22} bitsets {bitset_time * 1e3:>8.2f} ms   index scan {scan_time * 1e3:>9.1f} ms   "
+              f"{scan_time / bitset_time:>6.0f}x  {'match' if answer == expected else 'DIFFER'}")
+    print(f"sold out: {', '.join(f'{day:%m-%d}' for day in calendar.sold_out_dates())}")
+    chart_time, chart = best(lambda: calendar.tape_chart(first_day, 90))
+    print(f"90-night tape chart    {chart_time * 1e3:>8.2f} ms for {len(chart)} rows")
+
+
+# ============================================================
+# Room assignment
+# ============================================================
+
+def _booking_stream(rng, room_types, rooms_per_type, nights, first_day, demand, lengths, block_share):
+    """Requests [(room_type, start, end, count)] in booking order, totalling about `demand` x capacity in nights."""
+    requests, booked_nights = [], 0
+    capacity = len(room_types) * rooms_per_type * nights
+    while booked_nights < demand * capacity:
+        length = rng.choice(lengths)
+        start = first_day + timedelta(days=rng.randrange(nights - length + 1))
+        count = rng.randint(5, 20) if rng.random() < block_share else 1
+        requests.append((rng.choice(room_types), start, start + timedelta(days=length), count))
+        booked_nights += length * count
+    return requests
+
+
+def bench_assignment(rooms_per_type=100, nights=90, demand=1.1):
+    """Gap-minimising assignment against first fit on synthetic booking streams: fill rate, orphan gaps, throughput."""
+    from assignment import RoomAssigner, first_fit, fragmentation
+    from availability import AvailabilityIndex
+
+    first_day = date(2030, 1, 1)
+    last_day = first_day + timedelta(days=nights)
+    room_types = ("Single", "Double", "Suite")
+    streams = {
+        "short stays": ((1, 1, 2, 2, 3), 0.0),
+        "mixed stays": ((1, 2, 2, 3, 3, 4, 5, 7, 10, 14), 0.0),
+        "with groups": ((1, 2, 2, 3, 3, 4, 5, 7), 0.05),
+    }
+    print(f"{len(room_types) * rooms_per_type} rooms, {nights}-night window, requests for {demand:.0%} of capacity")
+    print(f"{'stream':<12} {'strategy':<10} {'booked':>7} {'sold':>6} {'orphan gaps':>12} {'orphan nights':>14} "
+          f"{'longest free':>13} {'assign/s':>9}")
+    for stream, (lengths, block_share) in streams.items():
+        requests = _booking_stream(random.Random(stream), room_types, rooms_per_type, nights, first_day,
+                                   demand, lengths, block_share)
+        for strategy in ("first fit", "assigner"):
+            index = AvailabilityIndex()
+            number = 0
+            for room_type in room_types:
+                for _ in range(rooms_per_type):
+                    number += 1
+                    index.add_room(number, room_type)
+            assigner = RoomAssigner(index, today=first_day)
+            booked = assignments = 0
+            start = time.perf_counter()
+            for room_type, start_date, end_date, count in requests:
+                assignments += count
+                if strategy == "assigner":
+                    rooms = (assigner.assign_block([(room_type, start_date, end_date)] * count) if count > 1
+                             else [assigner.choose(room_type, start_date, end_date)])
+                else:
+                    # Rooms one at a time, backing out if the block does not fit
+                    rooms = []
+                    for _ in range(count):
+                        room = first_fit(index, room_type, start_date, end_date)
+                        if room is None:
+                            break
+                        index.book(room, start_date, end_date)
+                        rooms.append(room)
+                    if len(rooms) < count:
+                        for room in rooms:
+                            index.release(room, start_date, end_date)
+                        rooms = None
+                    else:
+                        booked += count
+                        continue
+                if rooms is None or rooms[0] is None:
+                    continue
+                for room in rooms:
+                    index.book(room, start_date, end_date)
+                booked += count
+            elapsed = time.perf_counter() - start
+            stats = fragmentation(index, range(1, number + 1), first_day, last_day)
+            sold = 1 - stats["free_nights"] / (number * nights)
+            print(f"{stream:<12} {strategy:<10} {booked:>7} {sold:>6.1%} {stats['orphan_gaps']:>12} "
+                  f"{stats['orphan_nights']:>14} {stats['largest_gap']:>13} {assignments / elapsed:>9.0f}")
+
+
+# ============================================================
+# Customer search
+# ============================================================
+
+def _made_up_names(rng, count):
+    """Distinct pronounceable words, for synthetic first and last names."""
+    onsets = ("b", "br", "c", "ch", "d", "f", "g", "h", "j", "k", "l", "m", "n", "p", "r", "s", "sh", "st", "t", "v", "w")
+    vowels = ("a", "e", "i", "o", "u", "ai", "ea", "ie", "ou")
+    codas = ("", "", "n", "r", "s", "l", "th", "ck", "nd", "rt", "m")
+    found = set()
+    while len(found) < count:
+        syllables = rng.randint(1, 3)
+        found.add("".join(rng.choice(onsets) + rng.choice(vowels) + rng.choice(codas) for _ in range(syllables)))
+    return sorted(found)
+
+
+def _typo(rng, word):
+    """One random edit: a swap, a deletion, a substitution or an insertion."""
+    i = rng.randrange(1, len(word)) if len(word) > 1 else 0
+    kind = rng.randrange(4)
+    if kind == 0 and i < len(word) - 1:
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    if kind == 1 and len(word) > 3:
+        return word[:i] + word[i + 1:]
+    letter = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    return word[:i] + letter + word[i + (kind == 2):]
+
+
+def bench_search(customers=1000000, queries=1000, k=10):
+    """Exact, prefix and fuzzy customer lookups at scale, with recall for typo'd names."""
+    from search import CustomerIndex
+
+    rng = random.Random(5)
+    first_names, last_names = _made_up_names(rng, 2000), _made_up_names(rng, 20000)
+    domains = ("example.com", "mail.test", "inbox.test", "post.example")
+    people, seen = [], set()
+    while len(people) < customers:
+        first, last = rng.choice(first_names), rng.choice(last_names)
+        name = f"{first.title()} {last.title()}"
+        if name not in seen:
+            seen.add(name)
+            people.append((name, f"{first}.{last}@{rng.choice(domains)}"))
+    del seen
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = CustomerIndex.from_customers(people)
+    build = time.perf_counter() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{customers} customers, {len(index._words)} distinct words: built in {build:.1f}s, "
+          f"{memory / 2**20:.0f} MiB")
+
+    sample = [people[rng.randrange(customers)] for _ in range(queries)]
+    workloads = {
+        "exact (any case)": [(name.upper(), name) for name, _ in sample],
+        "name prefix": [(name[:rng.randint(3, 6)], None) for name, _ in sample],
+        "email prefix": [(contact[:rng.randint(4, 8)], None) for _, contact in sample],
+        "fuzzy, 1 typo/word": [(" ".join(_typo(rng, part) for part in name.split()), name) for name, _ in sample],
+        "fuzzy, surname only": [(_typo(rng, name.split()[1]), name) for name, _ in sample],
+    }
+    lookups = {
+        "exact (any case)": lambda text: [index.exact(text)],
+        "name prefix": lambda text: index.prefix(text, k),
+        "email prefix": lambda text: index.prefix(text, k, "contact_info"),
+        "fuzzy, 1 typo/word": lambda text: [name for _, name in index.fuzzy(text, k)],
+        "fuzzy, surname only": lambda text: [name for _, name in index.fuzzy(text, k)],
+    }
+    print(f"{'lookup':<22} {'p50 us':>8} {'p99 us':>8} {'max us':>8}  hits")
+    for label, work in workloads.items():
+        lookup, times, hits = lookups[label], [], 0
+        for text, expected in work:
+            start = time.perf_counter()
+            found = lookup(text)
+            times.append(time.perf_counter() - start)
+            hits += expected in found if expected else bool(found)
+        times.sort()
+        print(f"{label:<22} {times[len(times) // 2] * 1e6:>8.0f} {times[len(times) * 99 // 100] * 1e6:>8.0f} "
+              f"{times[-1] * 1e6:>8.0f}  {hits}/{len(work)} {'in top ' + str(k) if 'fuzzy' in label else ''}")
+
+    # The lookup it replaces: a scan comparing every name
+    names = [name for name, _ in people]
+    start = time.perf_counter()
+    for name, _ in sample[:20]:
+        next(candidate for candidate in names if candidate.lower() == name.lower())
+    print(f"linear scan, exact (any case): {(time.perf_counter() - start) / 20 * 1e3:.0f} ms per lookup")
+
+
+# ============================================================
+# Binary archive
+# ============================================================
+
+# Run in a fresh interpreter: loads the records one way and prints the seconds taken
+_COLD_LOAD = """
+import sys, time
+start = time.perf_counter()
+if sys.argv[1] == "archive":
+    import archive
+    records = archive.load_records(sys.argv[2])
+else:
+    import mydb
+    mydb.configure("sqlite", path=sys.argv[2])
+    records = mydb.get_records()
+print(time.perf_counter() - start, len(records[2]))
+"""
+
+
+def bench_archive(reservations=1000000, rooms=1000, customers=100000):
+    """Cold loads from SQLite (get_records) vs a mapped archive, in this process and in fresh ones."""
+    import subprocess
+    import archive
+
+    with tempfile.TemporaryDirectory() as directory:
+        database, path = os.path.join(directory, "history.db"), os.path.join(directory, "history.arc")
+        backend = mydb.configure("sqlite", path=database)
+        _seed_history(rooms, customers, reservations)
+
+        start = time.perf_counter()
+        counts = archive.export(path)
+        print(f"export of {counts['reservations']} reservations: {time.perf_counter() - start:.2f}s, "
+              f"{os.path.getsize(path) / 2**20:.1f} MiB (SQLite file {os.path.getsize(database) / 2**20:.1f} MiB)")
+
+        start = time.perf_counter()
+        expected = mydb.get_records()
+        from_database = time.perf_counter() - start
+        start = time.perf_counter()
+        snapshot = archive.Archive(path)
+        opened = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = snapshot.records()
+        from_archive = time.perf_counter() - start
+        same = expected[:2] == loaded[:2] and sorted(expected[2], key=mydb.reservation_key) == sorted(loaded[2], key=mydb.reservation_key)
+        print(f"get_records():           {from_database:>7.2f}s")
+        print(f"Archive() open:          {opened * 1e6:>7.0f}us")
+        print(f"Archive.records():       {from_archive:>7.2f}s ({from_database / from_archive:.1f}x), "
+              f"records {'match' if same else 'DIFFER'}")
+        del expected, loaded
+
+        # One report shard's read: ten rooms' stays overlapping a month
+        window = (date(2021, 3, 1), date(2021, 4, 1))
+        filters = [("room_number", ">=", 100), ("room_number", "<", 110),
+                   ("start_date", "<", window[1]), ("end_date", ">", window[0])]
+        start = time.perf_counter()
+        rows = list(mydb.iter_rows("reservations", filters))
+        query = time.perf_counter() - start
+        start = time.perf_counter()
+        mapped = list(snapshot.reservation_rows(100, 110, *window))
+        ranged = time.perf_counter() - start
+        print(f"shard read, {len(rows)} stays: SQLite {query * 1e3:.1f}ms, archive {ranged * 1e3:.2f}ms "
+              f"({len(mapped)} stays)")
+        snapshot.close()
+        backend.close()
+
+        # What every new process pays, interpreter start excluded
+        for label, source in (("get_records()", database), ("archive.load_records()", path)):
+            output = subprocess.run([sys.executable, "-c", _COLD_LOAD, label.split(".")[0].rstrip("()"), source],
+                                    capture_output=True, text=True, check=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+            print(f"fresh process, {label:<24}{float(output[0]):>7.2f}s ({output[1]} reservations)")
+
+
+# ============================================================
+# Desk startup
+# ============================================================
+
+def bench_startup(reservations=200000):
+    """Time to the menu and to a loaded system for both desks (--profile-startup) over a SQLite history."""
+    import subprocess
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "desk.db")
+        backend = mydb.configure("sqlite", path=path)
+        _seed_history(1000, 10000, reservations)
+        backend.close()
+        env = {**os.environ, "HOTEL_DB_BACKEND": "sqlite", "HOTEL_DB_PATH": path, "HOTEL_EVENT_LOG": ""}
+        here = os.path.dirname(os.path.abspath(__file__))
+        print(f"{reservations} open reservations; milliseconds after the client's first import")
+        print(f"{'client':<12} {'imports':>8} {'menu':>8} {'loaded':>8}")
+        for client in ("imperative", "functional"):
+            output = subprocess.run([sys.executable, os.path.join(here, f"{client}.py"), "--profile-startup"],
+                                    capture_output=True, text=True, env=env, check=True).stdout
+            marks = {}
+            for line in output.split("Startup profile")[1].splitlines()[1:]:
+                label, _, value = line.strip().rpartition(" ")
+                if not label.strip() or "(" in label:
+                    break
+                marks[label.strip()] = float(value)
+            # Before, the menu printed only once the system had loaded
+            print(f"{client:<12} {marks['imports']:>8.1f} {marks['menu shown']:>8.1f} {marks['system loaded']:>8.1f}")
+
+
+# ============================================================
+# Night audit
+# ============================================================
+
+# A property on the evening of `day`: each room has a checked-out history and,
+# by room number, a stay in house, an overdue departure, a no-show or a future arrival
+def _audit_property(rooms, history, day):
+    first = day.toordinal()
+    mydb.add_records("rooms", _room_rows(rooms))
+    mydb.add_records("customers", ((f"Guest {i}", f"guest{i}@example.com", "card") for i in range(rooms)))
+    stays = []
+    for number in range(1, rooms + 1):
+        guest = f"Guest {number - 1}"
+        stays += [(guest, number, date.fromordinal(first - 3 * k - 6), date.fromordinal(first - 3 * k - 3))
+                  for k in range(history)]
+        kind = number % 10
+        if kind <= 6:    # In house tonight
+            stays.append((guest, number, date.fromordinal(first - 2), date.fromordinal(first + 2)))
+        elif kind == 7:  # Due out today, still checked in
+            stays.append((guest, number, date.fromordinal(first - 3), day))
+        elif kind == 8:  # Due in today, never arrived
+            stays.append((guest, number, day, date.fromordinal(first + 2)))
+        else:
+            stays.append((guest, number, date.fromordinal(first + 1), date.fromordinal(first + 3)))
+    mydb.add_records("reservations", stays)
+    backend = mydb.get_backend()
+    backend.execute("UPDATE reservations SET checked_in = 1, checked_out = 1 WHERE end_date <= ?",
+                    (date.fromordinal(first - 3),))
+    backend.execute("UPDATE reservations SET checked_in = 1 WHERE start_date >= ? AND start_date < ?",
+                    (date.fromordinal(first - 3), day))
+    return len(stays)
+
+
+def _charges(path):
+    import contextlib
+    import sqlite3
+    with contextlib.closing(sqlite3.connect(path)) as conn:
+        return conn.execute("SELECT COUNT(*), SUM(amount) FROM room_charges").fetchone()
+
+
+def bench_night_audit(rooms=5000, history=40, worker_counts=(1, 4), chunk_rooms=100):
+    """night_audit.run over a SQLite property: throughput per worker count, and a run killed mid-way then resumed."""
+    import contextlib
+    import shutil
+    import signal
+    import sqlite3
+    import subprocess
+    import night_audit
+
+    day = date(2026, 6, 1)
+    with tempfile.TemporaryDirectory() as directory:
+        seed = os.path.join(directory, "seed.db")
+        mydb.configure("sqlite", path=seed)
+        reservations = _audit_property(rooms, history, day)
+        mydb.shutdown()
+        print(f"{rooms} rooms, {reservations} reservations, {chunk_rooms} rooms per transaction, "
+              f"{os.cpu_count()} cores")
+
+        baseline = None
+        for workers in worker_counts:
+            path = os.path.join(directory, f"audit-{workers}.db")
+            shutil.copy(seed, path)
+            mydb.configure("sqlite", path=path)
+            start = time.perf_counter()
+            totals, finished, _ = night_audit.run(day, workers=workers, chunk_rooms=chunk_rooms)
+            elapsed = time.perf_counter() - start
+            mydb.shutdown()
+            result = (vars(finished), _charges(path))
+            baseline = baseline or result
+            print(f"{workers} worker(s): {elapsed:.2f}s, {totals.stays / elapsed:,.0f} stays/s, "
+                  f"{totals.chunks} transactions; {finished.charges} charges (${finished.revenue_cents / 100:,.2f}), "
+                  f"{finished.overdue} overdue, {finished.no_shows} no-shows"
+                  + ("" if result == baseline else "  DIFFERS"))
+
+        # Kill a run once some chunks have committed, then resume it
+        path = os.path.join(directory, "crash.db")
+        shutil.copy(seed, path)
+        env = {**os.environ, "HOTEL_DB_BACKEND": "sqlite", "HOTEL_DB_PATH": path}
+        here = os.path.dirname(os.path.abspath(__file__))
+        child = subprocess.Popen([sys.executable, os.path.join(here, "night_audit.py"), day.isoformat(),
+                                  "--workers", "1", "--chunk-rooms", str(chunk_rooms // 10)],
+                                 env=env, stdout=subprocess.DEVNULL)
+        progress = 0
+        with contextlib.closing(sqlite3.connect(path, timeout=30)) as conn:
+            while progress < rooms // 4 and child.poll() is None:
+                time.sleep(0.005)
+                try:
+                    progress = conn.execute("SELECT COALESCE(SUM(charges + overdue + no_shows), 0) "
+                                            "FROM audit_checkpoints").fetchone()[0]
+                except sqlite3.OperationalError:
+                    pass  # Not migrated yet
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+        killed_at = _charges(path)[0]
+        mydb.configure("sqlite", path=path)
+        totals, finished, resumed = night_audit.run(day, workers=1, chunk_rooms=chunk_rooms // 10)
+        mydb.shutdown()
+        result = (vars(finished), _charges(path))
+        print(f"killed after {killed_at} charges; resume: {resumed} shard(s) from checkpoints, "
+              f"{totals.chunks} more transactions; totals and room_charges "
+              f"{'match' if result == baseline else 'DIFFER from'} an uninterrupted run")
+
+
+BENCHMARKS = {
+    "round_trips": bench_round_trips,
+    "bulk_insert": bench_bulk_insert,
+    "load": bench_load,
+    "availability": bench_availability,
+    "cold_start": bench_cold_start,
+    "report": bench_report,
+    "analytics": bench_analytics,
+    "functional_session": bench_functional_session,
+    "contention": bench_contention,
+    "checkin_storm": bench_checkin_storm,
+    "history_growth": bench_history_growth,
+    "cache": bench_cache,
+    "memory": bench_memory,
+    "instrumentation": bench_instrumentation,
+    "sharded_report": bench_sharded_report,
+    "pricing": bench_pricing,
+    "event_log": bench_event_log,
+    "occupancy": bench_occupancy,
+    "assignment": bench_assignment,
+    "search": bench_search,
+    "archive": bench_archive,
+    "startup": bench_startup,
+    "night_audit": bench_night_audit,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        print(f"\n== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,254 @@
+"""Regression suite: scripted hotel workloads through both front ends, with JSON results.
+
+Usage: python benchsuite.py [--scales 1k,100k] [--frontends imperative,functional]
+                            [--repeat N] [--json FILE] [--compare BASELINE] [--threshold 0.2]
+
+Each scale is a number of reservations. For every front end the suite runs the
+same script on a fresh in-process memory database:
+
+  rooms      add one room and one guest per 100 reservations (at least 100 of each)
+  bookings   book every reservation, round-robin over the rooms, two nights each
+  cycles     check in and check out the first tenth of the bookings
+  report     generate the occupancy and revenue report
+
+Results are keyed "scale/frontend/phase" and hold the operation count, the best
+wall time over --repeat runs and the cost per operation. Save a run with --json
+and pass it to --compare on the next version: phases that got slower by more
+than --threshold (or ran a different number of operations) are listed and the
+exit status is 1.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import date
+
+import mydb
+
+SCALES = {"1k": 1000, "100k": 100000, "1M": 1000000}
+ROOM_TYPES = ("Single", "Double", "Suite")
+PHASES = ("rooms", "bookings", "cycles", "report")
+
+
+# ============================================================
+# Workload script
+# ============================================================
+
+class Workload:
+    """The scripted stays for one scale; both front ends replay the same list."""
+
+    def __init__(self, reservations):
+        self.reservations = reservations
+        self.rooms = max(100, reservations // 100)
+        self.customers = self.rooms
+        self.cycles = reservations // 10
+        first_day = date(2030, 1, 1).toordinal()
+        # Each room gets back-to-back two-night stays; the guest rotates with
+        # every pass over the rooms.
+        self.stays = [
+            (f"Guest {(i // self.rooms + i) % self.customers}", i % self.rooms + 1,
+             date.fromordinal(first_day + i // self.rooms * 3), date.fromordinal(first_day + i // self.rooms * 3 + 2))
+            for i in range(reservations)
+        ]
+
+    def room(self, n):
+        return n, ROOM_TYPES[n % 3], 100.0
+
+
+# ============================================================
+# Front ends
+# ============================================================
+
+def run_imperative(workload, timer):
+    from imperative import HotelManagementSystem
+
+    hotel_system = HotelManagementSystem()
+
+    with timer("rooms", workload.rooms + workload.customers):
+        for n in range(1, workload.rooms + 1):
+            hotel_system.add_room(*workload.room(n))
+        for n in range(workload.customers):
+            hotel_system.add_customer(f"Guest {n}", "", "card")
+
+    booked = []
+    with timer("bookings", len(workload.stays)):
+        for name, room_number, start_date, end_date in workload.stays:
+            customer, room = hotel_system.find_customer(name), hotel_system.find_room(room_number)
+            booked.append(hotel_system.make_reservation(customer, room, start_date, end_date))
+
+    with timer("cycles", 2 * workload.cycles):
+        for reservation in booked[:workload.cycles]:
+            hotel_system.check_in(reservation)
+            hotel_system.check_out(reservation)
+
+    with timer("report", 1):
+        hotel_system.generate_report()
+
+    return sum(reservation is not None for reservation in booked)
+
+
+def run_functional(workload, timer):
+    import functional
+
+    state = functional.load_state([], [], [])
+
+    with timer("rooms", workload.rooms + workload.customers):
+        for n in range(1, workload.rooms + 1):
+            state = functional.add_room(state, functional.create_room(*workload.room(n)))
+        for n in range(workload.customers):
+            state = functional.add_customer(state, functional.create_customer(f"Guest {n}", "", "card"))
+
+    with timer("bookings", len(workload.stays)):
+        for name, room_number, start_date, end_date in workload.stays:
+            reservation, availability = functional.create_reservation(
+                state.customers[name], state.rooms[room_number], start_date, end_date, state.availability)
+            if reservation:
+                state = functional.add_reservation(state, reservation, availability)
+
+    with timer("cycles", 2 * workload.cycles):
+        for name, room_number, _, _ in workload.stays[:workload.cycles]:
+            state = functional.check_in_reservation(state, name, room_number)
+            state, _ = functional.check_out_reservation(state, name, room_number)
+
+    with timer("report", 1):
+        state = functional.generate_report(state)
+
+    return len(state.reservations)
+
+
+FRONTENDS = {
+    "imperative": run_imperative,
+    "functional": run_functional,
+}
+
+
+# ============================================================
+# Runner
+# ============================================================
+
+class PhaseTimer:
+    """Context-manager factory that records the best time per phase across runs."""
+
+    def __init__(self):
+        self.results = {}  # phase -> {"ops", "seconds"}
+
+    @contextlib.contextmanager
+    def __call__(self, phase, ops):
+        gc.collect()
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        best = self.results.get(phase)
+        if best is None or elapsed < best["seconds"]:
+            self.results[phase] = {"ops": ops, "seconds": elapsed}
+
+
+def run_suite(scales, frontends, repeat=1):
+    """Runs each front end at each scale; returns the results keyed "scale/frontend/phase"."""
+    results = {}
+    for scale in scales:
+        workload = Workload(SCALES[scale])
+        for frontend in frontends:
+            timer = PhaseTimer()
+            for _ in range(repeat):
+                mydb.configure("memory")
+                # The front ends print a line per action; keep the terminal for the results
+                with contextlib.redirect_stdout(io.StringIO()):
+                    booked = FRONTENDS[frontend](workload, timer)
+                if booked != workload.reservations:
+                    raise RuntimeError(f"{frontend} booked {booked} of {workload.reservations} reservations at {scale}")
+            for phase in PHASES:
+                result = timer.results[phase]
+                results[f"{scale}/{frontend}/{phase}"] = {
+                    **result, "us_per_op": result["seconds"] / result["ops"] * 1e6,
+                }
+            print(f"{scale} {frontend}: " + ", ".join(
+                f"{phase} {timer.results[phase]['seconds']:.2f}s" for phase in PHASES), file=sys.stderr)
+    mydb.shutdown()
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"{'workload':<28} {'ops':>9} {'seconds':>9} {'us/op':>10}")
+    for key, result in results.items():
+        print(f"{key:<28} {result['ops']:>9} {result['seconds']:>9.3f} {result['us_per_op']:>10.2f}")
+
+
+def compare(baseline, results, threshold):
+    """Prints each workload against the baseline; returns the keys that regressed."""
+    regressions = []
+    print(f"\n{'workload':<28} {'base us/op':>11} {'us/op':>10} {'change':>8}")
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            print(f"{key:<28} {'-':>11} {result['us_per_op']:>10.2f} {'new':>8}")
+            continue
+        change = result["us_per_op"] / before["us_per_op"] - 1
+        flag = ""
+        if before["ops"] != result["ops"]:
+            flag = f"  ops changed ({before['ops']} -> {result['ops']})"
+        elif change > threshold:
+            flag = "  SLOWER"
+        if flag:
+            regressions.append(key)
+        print(f"{key:<28} {before['us_per_op']:>11.2f} {result['us_per_op']:>10.2f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the hotel workload suite and record JSON results.")
+    parser.add_argument("--scales", default="1k,100k",
+                        help=f"comma-separated, from {', '.join(SCALES)} (1M takes several minutes)")
+    parser.add_argument("--frontends", default=",".join(FRONTENDS), help="comma-separated front ends")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per front end; the best time per phase is kept")
+    parser.add_argument("--json", help="write the results to this file ('-' for stdout)")
+    parser.add_argument("--compare", help="results file from an earlier run to check against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown per operation that counts as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    scales, frontends = args.scales.split(","), args.frontends.split(",")
+    unknown = [name for name in scales if name not in SCALES] + [name for name in frontends if name not in FRONTENDS]
+    if unknown:
+        parser.error(f"unknown scale or front end: {', '.join(unknown)}")
+
+    results = run_suite(scales, frontends, args.repeat)
+    report = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_results(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f)["results"], results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regressions over {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
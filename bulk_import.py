@@ -0,0 +1,94 @@
+"""Bulk import of rooms, customers or reservations from CSV or JSONL files.
+
+Usage: python bulk_import.py TABLE FILE [--batch-size N]
+
+CSV files need a header row naming the columns; JSONL files hold one object per
+line keyed by column name. Columns are the ones add_record takes for the table:
+  rooms:        number, type, price, available (optional, defaults to true)
+  customers:    name, contact_info, payment_method
+  reservations: customer_name, room_number, start_date, end_date
+"""
+import argparse
+import csv
+import json
+import time
+from datetime import date
+
+from backends import DEFAULTS, INSERT_COLUMNS
+from mydb import BATCH_SIZE, add_records
+
+# Tables a file can be imported into; the night audit's tables are written by night_audit.py only
+TABLES = ("rooms", "customers", "reservations")
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _parse_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+# Converts raw CSV/JSON values into the types add_record expects
+CONVERTERS = {
+    "number": int,
+    "price": float,
+    "available": _parse_bool,
+    "room_number": int,
+    "start_date": _parse_date,
+    "end_date": _parse_date,
+}
+
+
+def _to_row(table, record):
+    """Orders a {column: value} record as an add_record tuple."""
+    row = []
+    for column in INSERT_COLUMNS[table]:
+        value = record.get(column)
+        if value in (None, ""):
+            if column not in DEFAULTS[table]:
+                raise ValueError(f"Missing value for {column} in {record}")
+            value = DEFAULTS[table][column]
+        row.append(CONVERTERS.get(column, str)(value))
+    return tuple(row)
+
+
+def read_records(path):
+    """Yields {column: value} dicts from a .csv or .jsonl file."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def import_file(table, path, batch_size=BATCH_SIZE):
+    """Streams a file into the table; returns (rows committed, seconds taken)."""
+    start = time.perf_counter()
+    rows = (_to_row(table, record) for record in read_records(path))
+    committed = add_records(table, rows, batch_size)
+    return committed, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import hotel records from CSV or JSONL.")
+    parser.add_argument("table", choices=TABLES)
+    parser.add_argument("file", help="a .csv file with a header row, or a .jsonl file")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per transaction")
+    args = parser.parse_args()
+
+    try:
+        committed, elapsed = import_file(args.table, args.file, args.batch_size)
+    except ValueError as err:
+        print(f"Error importing {args.file}: {err}")
+        return
+    rate = committed / elapsed if elapsed else 0
+    print(f"Imported {committed} {args.table} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    main()
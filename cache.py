@@ -0,0 +1,99 @@
+"""Bounded LRU cache with per-entry TTL, used by mydb's read-through lookups."""
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def approximate_size(value):
+    """Rough bytes held by a row tuple and its fields."""
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """Thread-safe LRU map capped by entry count and approximate bytes; entries expire after ttl seconds.
+
+    Loaders should read `generation` before fetching and pass it to put(): if
+    anything was invalidated meanwhile, the possibly stale value is dropped.
+    """
+
+    def __init__(self, max_entries=10000, max_bytes=None, ttl=None, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (value, size, expires at); oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.generation = 0  # Bumped by every invalidation
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0      # Dropped to stay under the caps
+        self.expirations = 0    # Dropped after their TTL
+        self.invalidations = 0  # Dropped because the underlying row changed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= self._clock():
+                self._drop(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            size = approximate_size(value)
+            expires = self._clock() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, size, expires)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or (self.max_bytes is not None and self._bytes > self.max_bytes)):
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self.generation += 1
+            if key in self._entries:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,258 @@
+"""Append-only event log of hotel changes, with snapshots for fast recovery.
+
+Every change made through imperative.HotelManagementSystem is appended as one
+JSON line to a segment file in the log directory (HOTEL_EVENT_LOG):
+
+  [seq, unix time, "RoomAdded", room_number, room_type, price]
+  [seq, unix time, "CustomerAdded", name, contact_info, payment_method]
+  [seq, unix time, "ReservationCreated", customer_name, room_number, start_date, end_date]
+  [seq, unix time, "CheckedIn", customer_name, room_number, start_date]
+  [seq, unix time, "CheckedOut", customer_name, room_number, start_date]
+
+The lines are an audit trail of who stayed where and when; the database keeps
+its boolean columns as before. HotelState folds the events into the state a
+desk needs at startup (rooms, customers, reservations not yet checked out).
+Every HOTEL_SNAPSHOT_EVERY events that state is written to a snapshot file and
+a new segment is started, so opening the log loads the latest snapshot and
+replays only the segment after it. Old segments are kept; old snapshots are
+pruned to the last KEEP_SNAPSHOTS.
+
+Other writers (the functional front end, bulk_import.py, night_audit.py, a
+desk without a log) keep no log; mydb counts their writes in the database's
+change_counters. The state records the count it was loaded at, and a desk
+whose log is behind that count starts from the database and reseeds the log.
+
+A process that dies mid-write leaves a torn last line, which is cut off when
+the log is next opened. One process writes a log directory at a time, and
+only one desk with a log should write to a database.
+"""
+import json
+import os
+import time
+from datetime import date
+
+EVENT_LOG = os.environ.get('HOTEL_EVENT_LOG', '')                    # log directory; empty turns the log off
+SNAPSHOT_EVERY = int(os.environ.get('HOTEL_SNAPSHOT_EVERY', 100000))  # events between snapshots
+FSYNC = os.environ.get('HOTEL_EVENT_LOG_FSYNC', '0') == '1'          # fsync every event, not just flush
+KEEP_SNAPSHOTS = 2
+
+ROOM_ADDED = "RoomAdded"
+CUSTOMER_ADDED = "CustomerAdded"
+RESERVATION_CREATED = "ReservationCreated"
+CHECKED_IN = "CheckedIn"
+CHECKED_OUT = "CheckedOut"
+
+_encode = json.JSONEncoder(separators=(",", ":")).encode  # json.dumps builds an encoder per call for these
+
+_SEGMENT = "segment-{:012d}.jsonl"    # numbered by the seq of its first event
+_SNAPSHOT = "snapshot-{:012d}.json"   # numbered by the seq of the last event it includes
+
+
+class HotelState:
+    """Rooms, customers and open reservations, folded from events; dates stay ISO strings."""
+
+    def __init__(self):
+        self.rooms = {}          # room_number -> [room_type, price, available]
+        self.customers = {}      # name -> [contact_info, payment_method]
+        self.reservations = {}   # (customer_name, room_number, start_date) -> [end_date, checked_in]
+        self.unlogged_writes = None  # mydb.unlogged_writes() when seeded from the database
+        self._handlers = {
+            ROOM_ADDED: self.room_added,
+            CUSTOMER_ADDED: self.customer_added,
+            RESERVATION_CREATED: self.reservation_created,
+            CHECKED_IN: self.checked_in,
+            CHECKED_OUT: self.checked_out,
+        }
+
+    def apply(self, event_type, fields):
+        self._handlers[event_type](*fields)
+
+    def room_added(self, room_number, room_type, price):
+        self.rooms[room_number] = [room_type, price, True]
+
+    def customer_added(self, name, contact_info, payment_method):
+        self.customers[name] = [contact_info, payment_method]
+
+    def reservation_created(self, customer_name, room_number, start_date, end_date):
+        self.reservations[customer_name, room_number, start_date] = [end_date, False]
+
+    def checked_in(self, customer_name, room_number, start_date):
+        reservation = self.reservations.get((customer_name, room_number, start_date))
+        if reservation is not None:
+            reservation[1] = True
+        if room_number in self.rooms:
+            self.rooms[room_number][2] = False
+
+    def checked_out(self, customer_name, room_number, start_date):
+        # Checked-out stays leave the startup state; they remain in the log and the database
+        self.reservations.pop((customer_name, room_number, start_date), None)
+        if room_number in self.rooms:
+            self.rooms[room_number][2] = True
+
+    # ---------------- snapshots ----------------
+
+    def to_json(self):
+        return {
+            "rooms": [[number, *room] for number, room in self.rooms.items()],
+            "customers": [[name, *customer] for name, customer in self.customers.items()],
+            "reservations": [[*key, *reservation] for key, reservation in self.reservations.items()],
+            "unlogged_writes": self.unlogged_writes,
+        }
+
+    @classmethod
+    def from_json(cls, data):
+        state = cls()
+        state.rooms = {room[0]: room[1:] for room in data["rooms"]}
+        state.customers = {customer[0]: customer[1:] for customer in data["customers"]}
+        state.reservations = {tuple(res[:3]): res[3:] for res in data["reservations"]}
+        state.unlogged_writes = data.get("unlogged_writes")
+        return state
+
+    @classmethod
+    def from_records(cls, rooms, customers, reservations):
+        """State from the dicts get_records returns, to seed a new log from the database."""
+        state = cls()
+        for room in rooms:
+            state.rooms[room["room_number"]] = [room["room_type"], room["price"], room["available"]]
+        for customer in customers:
+            state.customers[customer["name"]] = [customer["contact_info"], customer["payment_method"]]
+        for res in reservations:
+            if not res["checked_out"]:
+                key = (res["customer"]["name"], res["room"]["room_number"], res["start_date"].isoformat())
+                state.reservations[key] = [res["end_date"].isoformat(), res["checked_in"]]
+        return state
+
+    def records(self):
+        """(rooms, customers, reservations) as dicts in the shape of get_records(active_only=True)."""
+        rooms = {number: {"room_number": number, "room_type": room_type, "price": price, "available": available}
+                 for number, (room_type, price, available) in self.rooms.items()}
+        customers = {name: {"name": name, "contact_info": contact_info, "payment_method": payment_method}
+                     for name, (contact_info, payment_method) in self.customers.items()}
+        reservations = [
+            {"customer": customers.get(name), "room": rooms.get(room_number),
+             "start_date": date.fromisoformat(start_date), "end_date": date.fromisoformat(end_date),
+             "checked_in": checked_in, "checked_out": False}
+            for (name, room_number, start_date), (end_date, checked_in) in self.reservations.items()
+            if name in customers and room_number in rooms
+        ]
+        return list(rooms.values()), list(customers.values()), reservations
+
+
+class EventLog:
+    """A log directory: recovers its state on open, then appends events and snapshots as it goes."""
+
+    def __init__(self, directory, snapshot_every=SNAPSHOT_EVERY, fsync=FSYNC):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.state, self.seq, self.snapshot_seq = self.recover()
+        self._file = None
+
+    def _path(self, pattern, seq):
+        return os.path.join(self.directory, pattern.format(seq))
+
+    def _numbered(self, pattern):
+        """Sorted (seq, path) for the files named by one of the patterns above."""
+        prefix, suffix = pattern.split("{")[0], pattern.split("}")[1]
+        found = []
+        for name in os.listdir(self.directory):
+            number = name[len(prefix):-len(suffix)]
+            if name.startswith(prefix) and name.endswith(suffix) and number.isdigit():
+                found.append((int(number), os.path.join(self.directory, name)))
+        return sorted(found)
+
+    # ---------------- recovery ----------------
+
+    def recover(self, use_snapshots=True):
+        """(state, last seq, snapshot seq): the latest readable snapshot plus the events after it."""
+        state, seq, snapshot_seq = HotelState(), 0, 0
+        if use_snapshots:
+            for number, path in reversed(self._numbered(_SNAPSHOT)):
+                try:
+                    with open(path) as f:
+                        state = HotelState.from_json(json.load(f))
+                    seq = snapshot_seq = number
+                    break
+                except (OSError, ValueError, KeyError):
+                    continue  # Unreadable snapshot: fall back to the one before it
+        segments = self._numbered(_SEGMENT)
+        if segments:
+            _cut_torn_line(segments[-1][1])
+        apply = state.apply
+        for i, (first, path) in enumerate(segments):
+            if i + 1 < len(segments) and segments[i + 1][0] <= seq + 1:
+                continue  # Every event in this segment is in the snapshot
+            with open(path) as f:
+                for line in f:
+                    event = json.loads(line)
+                    if event[0] > seq:
+                        apply(event[2], event[3:])
+                        seq = event[0]
+        return state, seq, snapshot_seq
+
+    # ---------------- writing ----------------
+
+    def _open_segment(self):
+        self._file = open(self._path(_SEGMENT, self.seq + 1), "a")
+
+    def append(self, event_type, *fields):
+        """Applies the event to the state and writes it; returns its seq."""
+        self.state.apply(event_type, fields)
+        if self._file is None:
+            self._open_segment()
+        self.seq += 1
+        self._file.write(_encode([self.seq, round(time.time(), 3), event_type, *fields]) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        if self.seq - self.snapshot_seq >= self.snapshot_every:
+            self.snapshot()
+        return self.seq
+
+    def snapshot(self):
+        """Writes the state as of the last event and starts a new segment after it."""
+        path = self._path(_SNAPSHOT, self.seq)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.state.to_json(), f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+        self.snapshot_seq = self.seq
+        if self._file is not None:
+            self._file.close()
+            self._file = None  # The next event opens segment-<seq + 1>
+        for _, old in self._numbered(_SNAPSHOT)[:-KEEP_SNAPSHOTS]:
+            os.remove(old)
+
+    def seed(self, rooms, customers, reservations, unlogged_writes=None):
+        """Starts the log over from records read from the database, as a snapshot at the current seq."""
+        self.state = HotelState.from_records(rooms, customers, reservations)
+        self.state.unlogged_writes = unlogged_writes
+        self.snapshot()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _cut_torn_line(path):
+    """Truncates a segment after its last complete line."""
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(max(0, size - 65536))
+        tail = f.read()
+        if tail.endswith(b"\n"):
+            return
+        cut = tail.rfind(b"\n")
+        f.truncate(size - len(tail) + cut + 1 if cut >= 0 else max(0, size - len(tail)))
+
+
+def open_log(directory=None):
+    """The EventLog in `directory` (default HOTEL_EVENT_LOG), or None when the log is off."""
+    directory = directory or EVENT_LOG
+    return EventLog(directory) if directory else None
@@ -1,6 +1,35 @@
+import startup  # First, so the startup profile's clock covers the imports below
+import sys
+from collections import namedtuple
 from datetime import date
 from functools import reduce
+from itertools import chain
 from mydb import *
+from availability import AvailabilityIndex
+from aggregates import CHECKED_IN, CHECKED_OUT, HotelAggregates, check_consistency, status_of
+from metrics import timed
+import pricing
+from pmap import PMap
+
+startup.mark("imports")
+
+# A reservation refers to its customer and room by key, so the session keeps
+# one small tuple per stay instead of a dict embedding both records
+Reservation = namedtuple("Reservation", [
+    "customer_name", "room_number", "start_date", "end_date", "checked_in", "checked_out",
+])
+
+
+def reservation_from_record(record):
+    """Converts a reservation dict from mydb into a Reservation."""
+    return Reservation(record["customer"]["name"], record["room"]["room_number"], record["start_date"],
+                       record["end_date"], record["checked_in"], record["checked_out"])
+
+
+# Primary key: (customer_name, room_number, start_date)
+def key_of(reservation):
+    return reservation[:3]
+
 
 # ============================================================
 # Helper Functions for CRUD and Business Logic
@@ -21,182 +50,364 @@ def create_customer(name, contact_info, payment_method):
 
 
 # Handle the creation of a reservation
-def create_reservation(customer, room, start_date, end_date):
-    """Creates a reservation and ensures the room is unavailable."""
-    add_record("reservations", (customer["name"], room["room_number"], start_date, end_date))
-    return {
-        "customer": customer,
-        "room": room,
-        "start_date": start_date,
-        "end_date": end_date,
-        "checked_in": False,
-        "checked_out": False,
-    }
-
-
-# Mark a room as available/unavailable
-def update_room_availability(rooms, room_number, available):
-    update_record("rooms", f"available = {available}", room_number)
-    """Updates room availability recursively without mutation."""
-    if not rooms:
-        return []
-    head, tail = rooms[0], rooms[1:]
-    if head["room_number"] == room_number:
-        head = {**head, "available": available}
-    return [head] + update_room_availability(tail, room_number, available)
+@timed("make_reservation")
+def create_reservation(customer, room, start_date, end_date, availability):
+    """Creates a reservation if the room is free for the dates.
 
+    Returns the reservation and the updated availability index, or None and the
+    unchanged index when the dates overlap an existing stay (in this session or
+    in the database).
+    """
+    updated_availability = availability.with_booking(room["room_number"], start_date, end_date)
+    # The database re-checks inside a transaction in case another desk got there first
+    if updated_availability is None or not book_reservation(customer["name"], room["room_number"], start_date, end_date):
+        return None, availability
+    return Reservation(customer["name"], room["room_number"], start_date, end_date, False, False), updated_availability
 
-# Handle Check-In logic safely without side-effects
-def check_in_reservation(reservations, rooms, customer_name, room_number):
-    update_record("reservations", f"checked_in = 1", room_number)
-    """Check in a reservation only if not already checked in."""
-    updated_reservations = [
-        {**res, "checked_in": True} if res["customer"]["name"] == customer_name and res["room"]["room_number"] == room_number and not res["checked_in"] else res
-        for res in reservations
-    ]
-    updated_rooms = update_room_availability(rooms, room_number, False)
-    return updated_reservations, updated_rooms
 
+# Mark a room as available/unavailable, without mutation; O(log n) on the persistent map
+def with_room_availability(rooms, room_number, available):
+    room = rooms.get(room_number)
+    if room is None:
+        return rooms
+    return rooms.set(room_number, {**room, "available": available})
 
-# Handle Check-Out logic only if already checked in
-def check_out_reservation(reservations, rooms, customer_name, room_number):
-    """Checks out only if a reservation has been checked in."""
-    reservation_to_checkout = next(
-        (res for res in reservations if res["customer"]["name"] == customer_name and res["room"]["room_number"] == room_number and res["checked_in"]),
-        None
+
+# Handle Check-In logic safely without side-effects
+@timed("check_in")
+def check_in_reservation(state, customer_name, room_number):
+    """Checks in the earliest stay of the guest in the room that is neither checked in nor out."""
+    open_stays = [res for res in reservations_for(state, customer_name, room_number)
+                  if not res.checked_in and not res.checked_out]
+    if not open_stays:
+        print("No reservation to check in for that customer and room.")
+        return state
+    reservation = min(open_stays, key=lambda res: res.start_date)
+    changes = [(reservation, reservation._replace(checked_in=True))]
+    update_records([
+        ("reservations", {"checked_in": True}, key_of(reservation)),
+        ("rooms", {"available": False}, room_number),
+    ])
+    return state._replace(
+        rooms=with_room_availability(state.rooms, room_number, False),
+        reservations=with_changes(state.reservations, changes),
+        aggregates=track_changes(state.aggregates, state.rooms.get(room_number), False, changes),
     )
 
-    if reservation_to_checkout:
-        updated_reservations = [
-            {**res, "checked_out": True} if res["customer"]["name"] == customer_name and res["room"]["room_number"] == room_number and res["checked_in"] else res
-            for res in reservations
-        ]
-        updated_rooms = update_room_availability(rooms, room_number, True)
-        bill = calculate_bill(reservation_to_checkout)
-        update_record("reservations", "checked_out = 1", room_number)
-        return updated_reservations, updated_rooms, bill
+
+# Handle Check-Out logic only if already checked in
+@timed("check_out")
+def check_out_reservation(state, customer_name, room_number):
+    """Checks out the earliest stay of the guest in the room that is in house; returns the new state and its bill."""
+    in_house = [res for res in reservations_for(state, customer_name, room_number)
+                if res.checked_in and not res.checked_out]
+
+    if in_house:
+        reservation = min(in_house, key=lambda res: res.start_date)
+        changes = [(reservation, reservation._replace(checked_out=True))]
+        bill = calculate_bill(reservation, state.rooms[room_number])
+        update_records([
+            ("reservations", {"checked_out": True}, key_of(reservation)),
+            ("rooms", {"available": True}, room_number),
+        ])
+        return state._replace(
+            rooms=with_room_availability(state.rooms, room_number, True),
+            reservations=with_changes(state.reservations, changes),
+            # A checked-out stay holds no nights, so a guest leaving early frees the rest of the stay
+            availability=state.availability.without_booking(room_number, reservation.start_date, reservation.end_date),
+            aggregates=track_changes(state.aggregates, state.rooms.get(room_number), True, changes),
+        ), bill
     else:
         print("Customer has not checked in or invalid reservation.")
-        return reservations, rooms, 0
+        return state, 0
+
+
+# Calculate a bill from the nightly rates of the stay
+def calculate_bill(reservation, room):
+    """Prices the stay under the room type's rate plan; returns a Decimal."""
+    return pricing.quote(room["room_type"], room["price"], reservation.start_date, reservation.end_date).total
 
 
-# Calculate a bill based on stay duration
-def calculate_bill(reservation):
-    """Calculates the total cost based on days of stay."""
-    duration = (reservation["end_date"] - reservation["start_date"]).days
-    return duration * reservation["room"]["price"]
+# ============================================================
+# Session State
+# ============================================================
+
+# Everything the menu works on. Each field is immutable or copy-on-write, so
+# an action returns a new state that shares all untouched data with the old one.
+HotelState = namedtuple("HotelState", [
+    "rooms",         # PMap: room_number -> room
+    "customers",     # PMap: name -> customer
+    "reservations",  # PMap: (customer_name, room_number, start_date) -> Reservation
+    "pairs",         # PMap: (customer_name, room_number) -> tuple of reservation keys
+    "availability",  # AvailabilityIndex
+    "aggregates",    # HotelAggregates
+])
+
+
+# Build the session state from the lists returned by get_records
+def load_state(rooms, customers, records):
+    """Indexes the loaded records into persistent maps."""
+    reservations = [reservation_from_record(record) for record in records]
+    pairs = {}
+    for res in reservations:
+        key = key_of(res)
+        pairs.setdefault(key[:2], []).append(key)
+    room_map = PMap((room["room_number"], room) for room in rooms)
+    return HotelState(
+        rooms=room_map,
+        customers=PMap((customer["name"], customer) for customer in customers),
+        reservations=PMap((key_of(res), res) for res in reservations),
+        pairs=PMap((pair, tuple(keys)) for pair, keys in pairs.items()),
+        availability=AvailabilityIndex.from_records(rooms, records),
+        aggregates=build_aggregates(room_map, reservations),
+    )
+
+
+def add_room(state, room):
+    return state._replace(
+        rooms=state.rooms.set(room["room_number"], room),
+        availability=state.availability.with_room(room["room_number"], room["room_type"]),
+        aggregates=with_room(state.aggregates, room),
+    )
+
+
+def add_customer(state, customer):
+    return state._replace(customers=state.customers.set(customer["name"], customer))
+
+
+def add_reservation(state, reservation, availability):
+    key = key_of(reservation)
+    return state._replace(
+        reservations=state.reservations.set(key, reservation),
+        pairs=state.pairs.set(key[:2], state.pairs.get(key[:2], ()) + (key,)),
+        availability=availability,
+        aggregates=with_reservation(state.aggregates, state.rooms[reservation.room_number], reservation),
+    )
+
+
+# Reservations held for a customer and room, in booking order
+def reservations_for(state, customer_name, room_number):
+    return [state.reservations[key] for key in state.pairs.get((customer_name, room_number), ())]
+
+
+# Apply (old, new) reservation replacements to the reservation map
+def with_changes(reservations, changes):
+    return reduce(lambda acc, change: acc.set(key_of(change[0]), change[1]), changes, reservations)
+
+
+# ============================================================
+# Report Aggregates
+# ============================================================
+
+# Reservation facts in the form aggregates.recompute expects
+def reservation_facts(room, reservation):
+    return (room["room_type"], room["price"], reservation.start_date, reservation.end_date,
+            status_of(reservation.checked_in, reservation.checked_out))
+
+
+# Build aggregates for the records loaded at startup
+def build_aggregates(rooms, reservations):
+    """Returns fresh aggregates for a room map and the Reservations in it."""
+    aggregates = HotelAggregates()
+    for room in rooms.values():
+        aggregates.add_room(room["available"])
+    for res in reservations:
+        aggregates.add_reservation(*reservation_facts(rooms[res.room_number], res))
+    return aggregates
+
+
+# Return a copy of the aggregates with one more event applied
+def with_room(aggregates, room):
+    updated = aggregates.copy()
+    updated.add_room(room["available"])
+    return updated
+
+
+def with_reservation(aggregates, room, reservation):
+    updated = aggregates.copy()
+    updated.add_reservation(*reservation_facts(room, reservation))
+    return updated
+
+
+def track_changes(aggregates, room, available, changes):
+    """Returns aggregates updated for a room availability flip and (old, new) reservation changes."""
+    updated = aggregates.copy()
+    if room:
+        updated.set_occupied(room["available"], available)
+    for old, new in changes:
+        room_type, price, start_date, end_date, old_status = reservation_facts(room, old)
+        updated.change_status(room_type, price, start_date, end_date, old_status, reservation_facts(room, new)[4])
+    return updated
+
+
+# Checked-out stays that were left in the database at startup
+def history(state):
+    records = iter_history(list(state.rooms.values()), list(state.customers.values()), state.reservations)
+    return (reservation_from_record(record) for record in records)
+
+
+# Fold checked-out history into the aggregates the first time a report needs it
+def with_history(state):
+    if state.aggregates.history_loaded:
+        return state
+    updated = state.aggregates.copy()
+    for res in history(state):
+        updated.add_reservation(*reservation_facts(state.rooms[res.room_number], res))
+    updated.history_loaded = True
+    return state._replace(aggregates=updated)
+
+
+# Compare maintained aggregates with a full recompute
+def check_aggregates(state):
+    """Returns the list of mismatches between the aggregates and the records."""
+    return check_consistency(
+        with_history(state).aggregates,
+        [room["available"] for room in state.rooms.values()],
+        [reservation_facts(state.rooms[res.room_number], res)
+         for res in chain(state.reservations.values(), history(state))]
+    )
 
 
 # Report Generation
-def generate_report(rooms, reservations, customers):
+@timed("generate_report")
+def generate_report(state):
     """Generates a report showing occupancy, revenue, and statuses."""
-    occupied_rooms = reduce(lambda acc, r: acc + (0 if r["available"] else 1), rooms, 0)
-    total_revenue = reduce(
-        lambda acc, res: acc + calculate_bill(res) if res["checked_in"] or res["checked_out"] else acc,
-        reservations,
-        0
-    )
+    # Checked-out stays not loaded at startup are folded in on the first report
+    state = with_history(state)
+    aggregates = state.aggregates
+    total_revenue = aggregates.revenue((CHECKED_IN, CHECKED_OUT))
 
-    print(f"Total Rooms: {len(rooms)}")
-    print(f"Occupied Rooms: {occupied_rooms}")
+    print(f"Total Rooms: {aggregates.total_rooms}")
+    print(f"Occupied Rooms: {aggregates.occupied_rooms}")
     print(f"Total Revenue: ${total_revenue:.2f}")
 
-    for room_status in rooms:
+    for room_status in state.rooms.values():
         print(
             f"Room {room_status['room_number']} - Status: {'Available' if room_status['available'] else 'Occupied'}"
         )
-    return rooms, reservations, customers
+    return state
 
 
 # ============================================================
-# Menu Logic with Recursion
+# Menu Logic as an Event Loop
 # ============================================================
 
-def menu_system(rooms, customers, reservations):
-    """Main menu system using recursion and functional programming principles."""
-    print("\nWelcome to the Functional Hotel Management System")
-    print("1. Add Room")
-    print("2. Add Customer")
-    print("3. Make Reservation")
-    print("4. Check In")
-    print("5. Check Out")
-    print("6. Generate Report")
-    print("7. Exit")
-    choice = input("Choose an option: ")
-
-    # Handle user choice immutably and recursively
-    if choice == '1':  # Add Room
-        print("\nAdd Room")
-        room_number = int(input("Enter room number: "))
-        room_type = input("Enter room type (Single/Double/Suite): ")
-        price = float(input("Enter room price: "))
-        new_room = create_room(room_number, room_type, price)
-        # Recursively call menu with the new room added
-        return menu_system(rooms + [new_room], customers, reservations)
-
-    elif choice == '2':  # Add Customer
-        print("\nAdd Customer")
-        name = input("Enter customer name: ")
-        contact_info = input("Enter contact information: ")
-        payment_method = input("Enter payment method: ")
-        new_customer = create_customer(name, contact_info, payment_method)
-        # Recursively call menu with the new customer added
-        return menu_system(rooms, customers + [new_customer], reservations)
-
-    elif choice == '3':  # Make Reservation
-        print("\nMake Reservation")
-        customer_name = input("Enter customer name for reservation: ")
-        room_number = int(input("Enter room number for reservation: "))
-        start_date = date.fromisoformat(input("Enter start date (YYYY-MM-DD): "))
-        end_date = date.fromisoformat(input("Enter end date (YYYY-MM-DD): "))
-
-        # Locate customer and room
-        customer = next((c for c in customers if c["name"] == customer_name), None)
-        room = next((r for r in rooms if r["room_number"] == room_number and r["available"]), None)
-
-        if customer and room:
-            new_reservation = create_reservation(customer, room, start_date, end_date)
-            updated_rooms = update_room_availability(rooms, room_number, False)
-            # Recursively call menu with updated rooms and new reservation
-            return menu_system(updated_rooms, customers, reservations + [new_reservation])
-        else:
-            print("Invalid customer or room.")
-            # Return to menu without changes if invalid
-            return menu_system(rooms, customers, reservations)
-
-    elif choice == '4':  # Check-In
-        print("\nCheck-In")
-        customer_name = input("Enter customer name for check-in: ")
-        room_number = int(input("Enter room number to check in to: "))
-        updated_reservations, updated_rooms = check_in_reservation(
-            reservations, rooms, customer_name, room_number
-        )
-        return menu_system(updated_rooms, customers, updated_reservations)
-
-    elif choice == '5':  # Check-Out
-        print("\nCheck-Out")
-        customer_name = input("Enter customer name for check-out: ")
-        room_number = int(input("Enter room number to check out from: "))
-        updated_reservations, updated_rooms, bill = check_out_reservation(
-            reservations, rooms, customer_name, room_number
+# Each action reads its inputs and maps the current state to the next one
+
+def add_room_action(state, read):
+    print("\nAdd Room")
+    room_number = int(read("Enter room number: "))
+    room_type = read("Enter room type (Single/Double/Suite): ")
+    price = float(read("Enter room price: "))
+    if room_number in state.rooms:
+        print(f"Room {room_number} already exists.")
+        return state
+    return add_room(state, create_room(room_number, room_type, price))
+
+
+def add_customer_action(state, read):
+    print("\nAdd Customer")
+    name = read("Enter customer name: ")
+    contact_info = read("Enter contact information: ")
+    payment_method = read("Enter payment method: ")
+    if name in state.customers:
+        print(f"Customer {name} already exists.")
+        return state
+    return add_customer(state, create_customer(name, contact_info, payment_method))
+
+
+def make_reservation_action(state, read):
+    print("\nMake Reservation")
+    customer_name = read("Enter customer name for reservation: ")
+    room_number = int(read("Enter room number for reservation: "))
+    start_date = date.fromisoformat(read("Enter start date (YYYY-MM-DD): "))
+    end_date = date.fromisoformat(read("Enter end date (YYYY-MM-DD): "))
+
+    # Locate customer and room; ones added at another desk are read through mydb's cache
+    customer = state.customers.get(customer_name)
+    if customer is None:
+        customer = get_customer(customer_name)
+        if customer:
+            state = add_customer(state, customer)
+    room = state.rooms.get(room_number)
+    if room is None:
+        room = get_room(room_number)
+        if room:
+            state = add_room(state, room)
+
+    if customer and room and end_date > start_date:
+        new_reservation, updated_availability = create_reservation(
+            customer, room, start_date, end_date, state.availability
         )
-        if bill > 0:
-            print(f"Bill for stay: ${bill:.2f}")
-        return menu_system(updated_rooms, customers, updated_reservations)
-
-    elif choice == '6':  # Generate Report
-        print("\nGenerating report...")
-        rooms, reservations, customers = generate_report(rooms, reservations, customers)
-        return menu_system(rooms, customers, reservations)
-
-    elif choice == '7':  # Exit the program
-        print("Exiting system. Goodbye!")
-        return
-
+        if new_reservation:
+            return add_reservation(state, new_reservation, updated_availability)
+        print(f"Room {room_number} is not available from {start_date} to {end_date}.")
     else:
-        print("\nInvalid choice, please try again.")
-        # Call the menu system recursively to retry invalid input
-        return menu_system(rooms, customers, reservations)
+        print("Invalid customer, room or dates.")
+    # Unchanged state if the reservation could not be made
+    return state
+
+
+def check_in_action(state, read):
+    print("\nCheck-In")
+    customer_name = read("Enter customer name for check-in: ")
+    room_number = int(read("Enter room number to check in to: "))
+    return check_in_reservation(state, customer_name, room_number)
+
+
+def check_out_action(state, read):
+    print("\nCheck-Out")
+    customer_name = read("Enter customer name for check-out: ")
+    room_number = int(read("Enter room number to check out from: "))
+    state, bill = check_out_reservation(state, customer_name, room_number)
+    if bill > 0:
+        print(f"Bill for stay: ${bill:.2f}")
+    return state
+
+
+def report_action(state, read):
+    print("\nGenerating report...")
+    return generate_report(state)
+
+
+ACTIONS = {
+    '1': add_room_action,
+    '2': add_customer_action,
+    '3': make_reservation_action,
+    '4': check_in_action,
+    '5': check_out_action,
+    '6': report_action,
+}
+
+
+def menu_system(state, read=input):
+    """Main menu loop; runs for any number of actions and returns the final state.
+
+    state may be a startup.Background still loading it; the first action
+    (or exit) waits for it.
+    """
+    while True:
+        print("\nWelcome to the Functional Hotel Management System")
+        print("1. Add Room")
+        print("2. Add Customer")
+        print("3. Make Reservation")
+        print("4. Check In")
+        print("5. Check Out")
+        print("6. Generate Report")
+        print("7. Exit")
+        startup.mark("menu shown")
+        choice = read("Choose an option: ")
+        if isinstance(state, startup.Background) and (choice in ACTIONS or choice == '7'):
+            state = state.result()
+
+        if choice == '7':  # Exit the program
+            print("Exiting system. Goodbye!")
+            return state
+        action = ACTIONS.get(choice)
+        if action is None:
+            print("\nInvalid choice, please try again.")
+            continue
+        state = action(state, read)
 
 
 
@@ -204,9 +415,22 @@ def menu_system(rooms, customers, reservations):
 # Entry Point
 # ============================================================
 
+def _startup_state():
+    rooms, customers, reservations = get_records(active_only=True)
+    startup.mark("records read")
+    state = load_state(rooms, customers, reservations)
+    startup.mark("system loaded")
+    return state
+
+
 def main():
-    rooms, customers, reservations = get_records()
-    menu_system(rooms, customers, reservations)
+    # Load the records on a background thread while the menu is shown
+    loading = startup.in_background(_startup_state)
+    if "--profile-startup" in sys.argv[1:]:
+        menu_system(loading, read=lambda prompt: '7')
+        startup.report("functional")
+    else:
+        menu_system(loading)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,31 @@
+import startup  # First, so the startup profile's clock covers the imports below
+import sys
 from datetime import date
+from itertools import chain
 from mydb import *
+from repository import HotelRepository, reservation_status
+from aggregates import HotelAggregates, check_consistency
+from assignment import RoomAssigner
+from availability import AvailabilityIndex
+import eventlog
+from metrics import timed
+from occupancy import OccupancyCalendar
+import pricing
+from search import CustomerIndex
+import store
+
+startup.mark("imports")
 
 # Class to represent a room in the hotel
 class Room:
+    # No per-instance __dict__: a long history holds many of these objects
+    __slots__ = ("room_number", "room_type", "price", "available")
+
     def __init__(self, room_number, room_type, price):
         self.room_number = room_number  # Room number
         self.room_type = room_type      # Room type (e.g., Single, Double, Suite)
         self.price = price              # Price per night
-        self.available = True           # Availability status
+        self.available = True           # False while a guest is checked in
 
     # Mark room as booked
     def book(self):
@@ -24,6 +42,8 @@ class Room:
 
 # Class to represent a customer in the hotel
 class Customer:
+    __slots__ = ("name", "contact_info", "payment_method")
+
     def __init__(self, name, contact_info, payment_method):
         self.name = name                      # Customer's name
         self.contact_info = contact_info      # Contact information
@@ -36,21 +56,27 @@ class Customer:
 
 # Class to represent a reservation in the hotel
 class Reservation:
+    # The customer and room are shared references to the repository's objects
+    __slots__ = ("customer", "room", "start_date", "end_date", "checked_in", "checked_out")
+
     def __init__(self, customer, room, start_date, end_date):
         self.customer = customer      # Customer who made the reservation
         self.room = room              # Room assigned to the reservation
         self.start_date = start_date  # Start date of the reservation
         self.end_date = end_date      # End date of the reservation
         self.checked_in = False       # Check-in status
+        self.checked_out = False      # Check-out status
 
     # Method to check-in the customer and mark room as booked
     def check_in(self):
         self.checked_in = True
+        self.checked_out = False
         self.room.book()
 
     # Method to check-out the customer and release the room
     def check_out(self):
         self.checked_in = False
+        self.checked_out = True
         self.room.release()
 
     # String representation for the Reservation object
@@ -62,21 +88,39 @@ class Reservation:
 class Billing:
     @staticmethod
     def generate_bill(reservation):
-        # Calculate total cost based on duration of stay
-        duration = (reservation.end_date - reservation.start_date).days
-        total = duration * reservation.room.price
-        return total
+        # Price each night of the stay under the room type's rate plan, in exact Decimal
+        room = reservation.room
+        return pricing.quote(room.room_type, room.price, reservation.start_date, reservation.end_date).total
 
 
 # Main system class for hotel management
 class HotelManagementSystem:
-    def __init__(self):
-        self.rooms = []           # List of all rooms in the hotel
-        self.customers = []       # List of all customers
-        self.reservations = []    # List of all reservations
-
-        # Fetch existing records from the database
-        rooms, customers, reservations = get_records()
+    def __init__(self, keep_history=None):
+        # Rooms, customers and reservations, indexed by their keys; checked-out
+        # stays too, as array rows, with keep_history (default HOTEL_KEEP_HISTORY)
+        self.repository = HotelRepository(store.KEEP_HISTORY if keep_history is None else keep_history)
+        # Booked date ranges per room, for overlap checks and free-room search
+        self.availability = AvailabilityIndex()
+        # Picks rooms for stays requested by room type, keeping gaps sellable
+        self.assigner = RoomAssigner(self.availability)
+        # Occupancy and revenue totals, maintained on every change
+        self.aggregates = HotelAggregates()
+        # Nights sold per room as bitsets over a rolling horizon (tape chart),
+        # rolled forward to today by each booking, check-in and check-out
+        self.occupancy = OccupancyCalendar()
+        # Append-only log of every change, when HOTEL_EVENT_LOG names a directory
+        self.events = eventlog.open_log()
+        if self.events is not None:
+            startup.mark("event log recovered")
+        # Customer search index, built by the customer_index property on first use
+        self._customer_index = None
+
+        # Fetch existing records; checked-out stays are left in the database
+        # and streamed by history() when a report needs them, unless kept in memory
+        rooms, customers, reservations = self._startup_records()
+        if self.repository.history is not None:
+            self.repository.history.extend(iter_rows("reservations", HISTORY))
+        startup.mark("records read")
 
         # Initialize Room objects
         for room in rooms:
@@ -87,11 +131,13 @@ class HotelManagementSystem:
             )
             if room.get("available") == False:
                 newRoom.book()
-            self.rooms.append(newRoom)
+            self.repository.add_room(newRoom)
+            self.availability.add_room(newRoom.room_number, newRoom.room_type)
+            self.occupancy.add_room(newRoom.room_number, newRoom.room_type)
 
         # Initialize Customer objects
         for customer in customers:
-            self.customers.append(
+            self.repository.add_customer(
                 Customer(
                     customer.get("name"),
                     customer.get("contact_info"),
@@ -99,19 +145,10 @@ class HotelManagementSystem:
                 )
             )
 
-        # Initialize Reservation objects
+        # Initialize Reservation objects, linking them by key
         for reservation in reservations:
-            reservation_customer = None
-            for customer in self.customers:
-                if customer.name == reservation.get("customer").get("name"):
-                    reservation_customer = customer
-                    break
-
-            reservation_room = None
-            for room in self.rooms:
-                if room.room_number == reservation.get("room").get("room_number"):
-                    reservation_room = room
-                    break
+            reservation_customer = self.repository.get_customer(reservation.get("customer").get("name"))
+            reservation_room = self.repository.get_room(reservation.get("room").get("room_number"))
 
             # Create reservation
             newReservation = Reservation(reservation_customer, reservation_room, reservation.get(
@@ -121,62 +158,302 @@ class HotelManagementSystem:
             if reservation.get("checked_out"):
                 newReservation.check_out()
 
-            self.reservations.append(newReservation)
+            self.repository.add_reservation(newReservation)
+            self.availability.book(reservation_room.room_number, newReservation.start_date, newReservation.end_date)
+            self.occupancy.book(reservation_room.room_number, newReservation.start_date, newReservation.end_date)
+            if newReservation.checked_in:
+                self.occupancy.check_in(reservation_room.room_number, newReservation.start_date, newReservation.end_date)
+            self._track_reservation(newReservation)
+
+        # Count rooms once check-ins above have settled their availability
+        for room in self.repository.rooms.values():
+            self.aggregates.add_room(room.available)
+        startup.mark("system loaded")
+
+    # Startup records from the event log (latest snapshot plus the events
+    # after it) when it has any and no unlogged writes have reached the
+    # database since it was seeded, else from the database. The log is then
+    # (re)seeded with the database's records so it can stand in for them next time.
+    def _startup_records(self):
+        if self.events is None:
+            return get_records(active_only=True)
+        log_writes()
+        # Read before the records, so a write made while they load forces a reload next time
+        unlogged = unlogged_writes()
+        if self.events.seq > 0 and unlogged is not None and unlogged == self.events.state.unlogged_writes:
+            return self.events.state.records()
+        records = get_records(active_only=True)
+        self.events.seed(*records, unlogged_writes=unlogged)
+        return records
+
+    # Append an event to the log, if there is one
+    def _record(self, event_type, *fields):
+        if self.events is not None:
+            self.events.append(event_type, *fields)
+
+    # Customer names and contact info for exact, typeahead and fuzzy search.
+    # Built from the loaded customers the first time a lookup needs it, so
+    # startup does not pay for indexing every customer
+    @property
+    def customer_index(self):
+        if self._customer_index is None:
+            self._customer_index = CustomerIndex.from_customers(
+                (customer.name, customer.contact_info) for customer in self.repository.customers.values()
+            )
+        return self._customer_index
+
+    # Adds a customer to the search index, if it has been built
+    def _index_customer(self, customer):
+        if self._customer_index is not None:
+            self._customer_index.add(customer.name, customer.contact_info)
+
+    # All rooms in the hotel
+    @property
+    def rooms(self):
+        return list(self.repository.rooms.values())
+
+    # All customers
+    @property
+    def customers(self):
+        return list(self.repository.customers.values())
+
+    # All reservations
+    @property
+    def reservations(self):
+        return list(self.repository.reservations.values())
+
+    # Stream checked-out reservations that were not loaded at startup
+    def history(self):
+        kept = self.repository.history
+        for row in (iter_rows("reservations", HISTORY) if kept is None else kept):
+            loaded = reservation_from_row(row, self.repository.rooms, self.repository.customers)
+            if self.repository.get_reservation(loaded["customer"].name, loaded["room"].room_number, loaded["start_date"]):
+                continue  # Checked out during this session; already in memory
+            reservation = Reservation(loaded["customer"], loaded["room"], loaded["start_date"], loaded["end_date"])
+            reservation.checked_in = loaded["checked_in"]
+            reservation.checked_out = loaded["checked_out"]
+            yield reservation
+
+    # Reservation facts in the form aggregates.recompute expects
+    @staticmethod
+    def _reservation_facts(reservation):
+        room = reservation.room
+        return (room.room_type, room.price, reservation.start_date, reservation.end_date, reservation_status(reservation))
+
+    def _track_reservation(self, reservation):
+        self.aggregates.add_reservation(*self._reservation_facts(reservation))
+
+    # Fold checked-out history into the aggregates the first time a report needs it
+    def _load_history(self):
+        if not self.aggregates.history_loaded:
+            for reservation in self.history():
+                self._track_reservation(reservation)
+            self.aggregates.history_loaded = True
+
+    # Compare the maintained aggregates with a full recompute; returns the mismatches
+    def check_aggregates(self):
+        self._load_history()
+        return check_consistency(
+            self.aggregates,
+            [room.available for room in self.repository.rooms.values()],
+            [self._reservation_facts(res) for res in chain(self.repository.reservations.values(), self.history())]
+        )
 
     # Add a new room to the system
     def add_room(self, room_number, room_type, price):
         add_record("rooms", (room_number, room_type, price, True))
         room = Room(room_number, room_type, price)
-        self.rooms.append(room)
+        self.repository.add_room(room)
+        self.availability.add_room(room_number, room_type)
+        self.occupancy.add_room(room_number, room_type)
+        self.aggregates.add_room(room.available)
+        self._record(eventlog.ROOM_ADDED, room_number, room_type, price)
         print(f"Room {room_number} added.")
 
     # Add a new customer to the system
     def add_customer(self, name, contact_info, payment_method):
         add_record("customers", (name, contact_info, payment_method))
         customer = Customer(name, contact_info, payment_method)
-        self.customers.append(customer)
+        self.repository.add_customer(customer)
+        self._index_customer(customer)
+        self._record(eventlog.CUSTOMER_ADDED, name, contact_info, payment_method)
         print(f"Customer {name} added.")
         return customer
 
-    # Create a new reservation for a customer
+    # Look up a room, falling back to the database (through mydb's cache) for
+    # rooms added by another desk since this one started
+    def find_room(self, room_number):
+        room = self.repository.get_room(room_number)
+        if room is None:
+            record = get_room(room_number)
+            if record is not None:
+                room = Room(record["room_number"], record["room_type"], record["price"])
+                if not record["available"]:
+                    room.book()
+                self.repository.add_room(room)
+                self.availability.add_room(room.room_number, room.room_type)
+                self.occupancy.add_room(room.room_number, room.room_type)
+                self.aggregates.add_room(room.available)
+                # Log it too, so stays booked here are not orphaned on recovery
+                self._record(eventlog.ROOM_ADDED, room.room_number, room.room_type, room.price)
+        return room
+
+    # Look up a customer, ignoring case and punctuation ("ann-marie o'neil"
+    # finds "Ann-Marie O'Neil"), falling back to the database like find_room
+    def find_customer(self, name):
+        customer = self.repository.get_customer(name)
+        if customer is None:
+            known = self.customer_index.exact(name)
+            if known is not None:
+                return self.repository.get_customer(known)
+            record = get_customer(name)
+            if record is not None:
+                customer = Customer(record["name"], record["contact_info"], record["payment_method"])
+                self.repository.add_customer(customer)
+                self._index_customer(customer)
+                self._record(eventlog.CUSTOMER_ADDED, customer.name, customer.contact_info, customer.payment_method)
+        return customer
+
+    # Customers for a search box: exact match, then name or contact info
+    # prefix matches, then names close to the text despite typos
+    def search_customers(self, text, limit=10):
+        found = (self.repository.get_customer(name) for name in self.customer_index.search(text, limit))
+        return [customer for customer in found if customer is not None]
+
+    # Prints near matches for a customer name that was not found
+    def suggest_customers(self, name):
+        matches = self.search_customers(name, 5)
+        if matches:
+            print("Did you mean: " + ", ".join(customer.name for customer in matches) + "?")
+
+    # Create a new reservation for a customer if the room is free for those dates
+    @timed("make_reservation")
     def make_reservation(self, customer, room, start_date, end_date):
-        if room.available:  # Check room availability
-            room.available = False
-            add_record("reservations", (customer.name, room.room_number, start_date, end_date))
-            update_record("rooms", f"available = {False}", room.room_number)
-            reservation = Reservation(customer, room, start_date, end_date)
-            self.reservations.append(reservation)
-            room.book()
-            print(f"Reservation made for {customer.name} in room {room.room_number}.")
-            return reservation
-        else:
-            print(f"Room {room.room_number} is not available.")
+        if end_date <= start_date:
+            print("End date must be after start date.")
             return None
+        # The local index turns away known clashes without a round trip; the
+        # database has the final say, since another desk may have booked the room
+        if self.availability.book(room.room_number, start_date, end_date):
+            booked = book_reservation(customer.name, room.room_number, start_date, end_date)
+            if booked:
+                return self._add_booked(customer, room, start_date, end_date)
+            self.availability.release(room.room_number, start_date, end_date)
+            if booked is None:
+                return None
+        print(f"Room {room.room_number} is not available from {start_date} to {end_date}.")
+        return None
+
+    # Add a stay the database has booked (and availability holds) to the in-memory state
+    def _add_booked(self, customer, room, start_date, end_date):
+        reservation = Reservation(customer, room, start_date, end_date)
+        self.repository.add_reservation(reservation)
+        self.occupancy.advance()
+        self.occupancy.book(room.room_number, start_date, end_date)
+        self._track_reservation(reservation)
+        self._record(eventlog.RESERVATION_CREATED, customer.name, room.room_number,
+                     start_date.isoformat(), end_date.isoformat())
+        print(f"Reservation made for {customer.name} in room {room.room_number}.")
+        return reservation
+
+    # Book a stay in the room of the type that leaves the fewest unsellable gaps
+    def assign_room(self, customer, room_type, start_date, end_date):
+        room_number = self.assigner.choose(room_type, start_date, end_date)
+        if room_number is None:
+            print(f"No {room_type} room is free from {start_date} to {end_date}.")
+            return None
+        return self.make_reservation(customer, self.repository.get_room(room_number), start_date, end_date)
+
+    # Book a group block of (room_type, start_date, end_date) stays for one
+    # customer; rooms are planned together and the block is booked in one
+    # transaction, so nothing is booked unless every stay fits
+    def assign_block(self, customer, stays):
+        room_numbers = self.assigner.assign_block(stays)
+        if room_numbers is None:
+            print(f"Not enough free rooms for the block of {len(stays)} stays.")
+            return None
+        planned = [(number, start_date, end_date) for number, (_, start_date, end_date) in zip(room_numbers, stays)]
+        for number, start_date, end_date in planned:
+            self.availability.book(number, start_date, end_date)
+        booked = book_reservations((customer.name, number, start_date, end_date)
+                                   for number, start_date, end_date in planned)
+        if not booked:
+            for number, start_date, end_date in planned:
+                self.availability.release(number, start_date, end_date)
+            if booked is False:
+                print(f"The block of {len(stays)} stays clashes with a booking made elsewhere; nothing was booked.")
+            return None
+        return [self._add_booked(customer, self.repository.get_room(number), start_date, end_date)
+                for number, start_date, end_date in planned]
+
+    # Rooms of a type that are free for the whole date range
+    def find_available(self, room_type, start_date, end_date):
+        return [self.repository.get_room(number)
+                for number in self.availability.find_available(room_type, start_date, end_date)]
+
+    # Reservation key as logged: (customer name, room number, ISO start date)
+    @staticmethod
+    def _event_key(reservation):
+        return reservation.customer.name, reservation.room.room_number, reservation.start_date.isoformat()
+
+    # Update the aggregates after a check-in or check-out
+    def _track_change(self, reservation, old_status, was_available):
+        self.aggregates.set_occupied(was_available, reservation.room.available)
+        room = reservation.room
+        self.aggregates.change_status(room.room_type, room.price, reservation.start_date, reservation.end_date,
+                                      old_status, reservation_status(reservation))
 
     # Check-in a customer for an existing reservation
+    @timed("check_in")
     def check_in(self, reservation):
-        update_record("reservations", f"checked_in = 1", reservation.room.room_number)
-        update_record("reservations", f"checked_out = 0", reservation.room.room_number)
+        # One transaction (or one queued unit, with write-behind) for the whole check-in
+        update_records([
+            ("reservations", {"checked_in": True, "checked_out": False}, self.repository.key(reservation)),
+            ("rooms", {"available": False}, reservation.room.room_number),
+        ])
+        old_status, was_available = reservation_status(reservation), reservation.room.available
         reservation.check_in()
+        self.repository.refresh_status(reservation)
+        self.occupancy.advance()
+        self.occupancy.check_in(reservation.room.room_number, reservation.start_date, reservation.end_date)
+        self._track_change(reservation, old_status, was_available)
+        self._record(eventlog.CHECKED_IN, *self._event_key(reservation))
         print(f"{reservation.customer.name} checked in to room {reservation.room.room_number}.")
 
     # Check-out a customer for an existing reservation
+    @timed("check_out")
     def check_out(self, reservation):
-        update_record("reservations", "checked_out = 1", reservation.room.room_number)
-        update_record("rooms", "available = True", reservation.room.room_number)
+        update_records([
+            ("reservations", {"checked_out": True}, self.repository.key(reservation)),
+            ("rooms", {"available": True}, reservation.room.room_number),
+        ])
+        old_status, was_available = reservation_status(reservation), reservation.room.available
         reservation.check_out()
+        self.repository.refresh_status(reservation)
+        # A checked-out stay holds no nights, so a guest leaving early frees the rest of the stay
+        self.availability.release(reservation.room.room_number, reservation.start_date, reservation.end_date)
+        self.occupancy.advance()
+        self.occupancy.check_out(reservation.room.room_number, reservation.start_date, reservation.end_date)
+        self.occupancy.release(reservation.room.room_number, max(reservation.start_date, date.today()),
+                               reservation.end_date)
+        self._track_change(reservation, old_status, was_available)
+        self._record(eventlog.CHECKED_OUT, *self._event_key(reservation))
         print(f"{reservation.customer.name} checked out of room {reservation.room.room_number}.")
 
     # Generate a report for occupancy and total revenue
+    @timed("generate_report")
     def generate_report(self):
-        occupancy = sum(1 for r in self.rooms if not r.available)  # Count occupied rooms
-        total_revenue = sum(Billing.generate_bill(res) for res in self.reservations)  # Calculate total revenue
-        print(f"Total Rooms: {len(self.rooms)}, Occupied Rooms: {occupancy}, Total Revenue: ${total_revenue:.2f}")
+        self._load_history()
+        aggregates = self.aggregates
+        print(f"Total Rooms: {aggregates.total_rooms}, Occupied Rooms: {aggregates.occupied_rooms}, "
+              f"Total Revenue: ${aggregates.revenue():.2f}")
 
 
 def main():
-    # Initialize the hotel management system
-    hotel_system = HotelManagementSystem()
+    # Initialize the hotel management system on a background thread, so the
+    # menu shows while the records load
+    loading = startup.in_background(HotelManagementSystem)
+    hotel_system = None
 
     # Menu-driven interface for user interaction
     while True:
@@ -188,8 +465,17 @@ def main():
         print("5. Check Out")
         print("6. Generate Report")
         print("7. Exit")
+        startup.mark("menu shown")
+
+        if "--profile-startup" in sys.argv[1:]:
+            loading.result()
+            startup.report("imperative")
+            break
 
         choice = input("Choose an option: ")
+        if hotel_system is None and choice != '7':
+            # Wait for the load, if the clerk was quicker
+            hotel_system = loading.result()
 
         if choice == '1':
             # Add a new room
@@ -208,44 +494,59 @@ def main():
         elif choice == '3':
             # Make a reservation
             customer_name = input("Enter customer name for reservation: ")
-            room_number = int(input("Enter room number for reservation: "))
+            room_number_str = input("Enter room number for reservation (blank to assign by type): ")
             start_date_str = input("Enter start date (YYYY-MM-DD): ")
             end_date_str = input("Enter end date (YYYY-MM-DD): ")
             start_date = date.fromisoformat(start_date_str)
             end_date = date.fromisoformat(end_date_str)
 
-            customer = next((c for c in hotel_system.customers if c.name == customer_name), None)
-            room = next((r for r in hotel_system.rooms if r.room_number == room_number), None)
+            customer = hotel_system.find_customer(customer_name)
+
+            if not room_number_str.strip():
+                # Let the assigner pick the room(s); several rooms book as one group block
+                room_type = input("Enter room type (Single/Double/Suite): ")
+                count = int(input("Enter number of rooms: ") or 1)
+                if not customer:
+                    print("Invalid customer.")
+                    hotel_system.suggest_customers(customer_name)
+                elif count == 1:
+                    hotel_system.assign_room(customer, room_type, start_date, end_date)
+                else:
+                    hotel_system.assign_block(customer, [(room_type, start_date, end_date)] * count)
+                continue
+
+            room = hotel_system.find_room(int(room_number_str))
 
             if customer and room:
                 hotel_system.make_reservation(customer, room, start_date, end_date)
             else:
                 print("Invalid customer or room.")
+                if not customer:
+                    hotel_system.suggest_customers(customer_name)
 
         elif choice == '4':
             # Check-in a customer
             customer_name = input("Enter customer name for check-in: ")
             room_number = int(input("Enter room number for check-in: "))
+            customer_name = hotel_system.customer_index.exact(customer_name) or customer_name
 
-            reservation = next((res for res in hotel_system.reservations
-                                if res.customer.name == customer_name and
-                                res.room.room_number == room_number and
-                                not res.checked_in), None)
+            reservation = hotel_system.repository.find_reservation(customer_name, room_number,
+                                                                   checked_in=False, checked_out=False)
 
             if reservation:
                 hotel_system.check_in(reservation)
             else:
                 print("No valid reservation found for this customer and room.")
+                if hotel_system.customer_index.exact(customer_name) is None:
+                    hotel_system.suggest_customers(customer_name)
 
         elif choice == '5':
             # Check-out a customer
             customer_name = input("Enter customer name for check-out: ")
             room_number = int(input("Enter room number for check-out: "))
+            customer_name = hotel_system.customer_index.exact(customer_name) or customer_name
 
-            reservation = next((res for res in hotel_system.reservations
-                                if res.customer.name == customer_name and
-                                res.room.room_number == room_number and
-                                res.checked_in), None)
+            reservation = hotel_system.repository.find_reservation(customer_name, room_number, checked_in=True)
 
             if reservation:
                 hotel_system.check_out(reservation)
@@ -253,6 +554,8 @@ def main():
                 print(f"Bill for {customer_name} for room {room_number}: ${bill:.2f}")
             else:
                 print("No valid check-in found for this customer and room.")
+                if hotel_system.customer_index.exact(customer_name) is None:
+                    hotel_system.suggest_customers(customer_name)
 
         elif choice == '6':
             # Generate occupancy and revenue report
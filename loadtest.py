@@ -0,0 +1,159 @@
+"""Load test for server.py: many concurrent keep-alive clients, p50/p99 latency per endpoint.
+
+Usage: python loadtest.py [--clients N] [--iterations N] [--backend memory|sqlite] [--url URL]
+
+Without --url the server is started in this process on a fresh memory or SQLite
+(temporary file) database. Each client gets its own customer and room, then
+repeats: search free rooms, book, check in, check out, look up the room, and
+every tenth pass pulls the report.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+import mydb
+
+ROOM_TYPES = ("Single", "Double", "Suite")
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection that records request latencies."""
+
+    def __init__(self, host, port, latencies):
+        self.host, self.port = host, port
+        self.latencies = latencies  # endpoint -> [seconds]
+        self.reader = self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        self.writer.close()
+
+    async def request(self, method, path, payload=None, endpoint=None):
+        """Sends one request; returns (status, decoded JSON body)."""
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n\r\n"
+        start = time.perf_counter()
+        self.writer.write(head.encode() + body)
+        await self.writer.drain()
+        response = await self.reader.readuntil(b"\r\n\r\n")
+        lines = response.decode("latin-1").split("\r\n")
+        status = int(lines[0].split(" ")[1])
+        length = next(int(line.split(":")[1]) for line in lines if line.lower().startswith("content-length:"))
+        data = json.loads(await self.reader.readexactly(length))
+        self.latencies.setdefault(endpoint or f"{method} {path}", []).append(time.perf_counter() - start)
+        return status, data
+
+
+async def _seed(client, clients):
+    for n in range(1, clients + 1):
+        await client.request("POST", "/rooms", {"room_number": n, "room_type": ROOM_TYPES[n % 3], "price": 100},
+                             "POST /rooms")
+        await client.request("POST", "/customers", {"name": f"Load {n}", "contact_info": "", "payment_method": "card"},
+                             "POST /customers")
+
+
+async def _session(host, port, n, iterations, latencies, errors):
+    client = Client(host, port, latencies)
+    await client.connect()
+    name, room_type = f"Load {n}", ROOM_TYPES[n % 3]
+    try:
+        for i in range(iterations):
+            start_date = date(2030, 1, 1) + timedelta(days=3 * i)
+            end_date = start_date + timedelta(days=2)
+            stay = {"customer_name": name, "room_number": n}
+            calls = [
+                ("GET", f"/rooms?type={room_type}&start={start_date}&end={end_date}", None, "GET /rooms?type"),
+                ("POST", "/reservations", {**stay, "start_date": start_date.isoformat(),
+                                           "end_date": end_date.isoformat()}, None),
+                ("POST", "/check-in", stay, None),
+                ("POST", "/check-out", stay, None),
+                ("GET", f"/rooms/{n}", None, "GET /rooms/N"),
+            ]
+            if i % 10 == 0:
+                calls.append(("GET", "/report", None, None))
+            for method, path, payload, endpoint in calls:
+                status, data = await client.request(method, path, payload, endpoint)
+                if status >= 400:
+                    errors.append((method, path, status, data.get("error")))
+    finally:
+        client.close()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def print_latencies(latencies, elapsed):
+    total = sum(len(samples) for samples in latencies.values())
+    print(f"{total} requests in {elapsed:.2f}s ({total / elapsed:,.0f} req/s)")
+    print(f"{'endpoint':<20} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    everything = sorted(sample for samples in latencies.values() for sample in samples)
+    rows = [(endpoint, sorted(samples)) for endpoint, samples in sorted(latencies.items())]
+    for endpoint, ordered in rows + [("all", everything)]:
+        print(f"{endpoint:<20} {len(ordered):>7} {_percentile(ordered, 0.50) * 1000:>8.2f} "
+              f"{_percentile(ordered, 0.99) * 1000:>8.2f} {ordered[-1] * 1000:>8.2f}")
+
+
+async def run(host, port, clients, iterations):
+    """Seeds one room and customer per client, then runs every client at once; returns (latencies, errors, seconds)."""
+    seed = Client(host, port, {})
+    await seed.connect()
+    await _seed(seed, clients)
+    seed.close()
+
+    latencies, errors = {}, []
+    start = time.perf_counter()
+    await asyncio.gather(*(_session(host, port, n, iterations, latencies, errors) for n in range(1, clients + 1)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run_local(clients, iterations):
+    """Same as run(), against a server started in this process on an ephemeral port."""
+    import server
+
+    http_server, service = await server.start_server("127.0.0.1", 0)
+    try:
+        return await run("127.0.0.1", http_server.sockets[0].getsockname()[1], clients, iterations)
+    finally:
+        http_server.close()
+        await http_server.wait_closed()
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the hotel HTTP API.")
+    parser.add_argument("--clients", type=int, default=200, help="concurrent connections")
+    parser.add_argument("--iterations", type=int, default=20, help="booking cycles per client")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory",
+                        help="database for the in-process server")
+    parser.add_argument("--url", help="test a running server instead, e.g. http://127.0.0.1:8080 "
+                                      "(it must not already hold rooms 1..N)")
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        latencies, errors, elapsed = asyncio.run(run(url.hostname, url.port or 80, args.clients, args.iterations))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            if args.backend == "sqlite":
+                mydb.configure("sqlite", path=os.path.join(directory, "loadtest.db"))
+            else:
+                mydb.configure("memory")
+            latencies, errors, elapsed = asyncio.run(run_local(args.clients, args.iterations))
+            mydb.get_backend().close()
+
+    print(f"{args.clients} clients x {args.iterations} iterations")
+    print_latencies(latencies, elapsed)
+    if errors:
+        print(f"{len(errors)} error responses, first: {errors[0]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+"""Latency histograms, operation spans and a slow-query log, exported as Prometheus text.
+
+Nothing is recorded until enable() is called (mydb does so when HOTEL_METRICS=1):
+the backend is only wrapped in an InstrumentedBackend once metrics are on, and a
+disabled span costs one flag check. Once enabled:
+
+- every storage call is timed per (operation, table), with rows returned and errors;
+- SQL backends report how long each statement waited for a connection;
+- timed() business operations (make_reservation, check_in, ...) record their
+  duration and how many queries and how much database time they spent;
+- queries and operations slower than slow_query_ms are written to the slow log;
+- render() gives the Prometheus text exposition, which write_textfile() saves
+  atomically (for node_exporter's textfile collector) and server.py serves on
+  GET /metrics.
+"""
+import atexit
+import functools
+import os
+import reprlib
+import sys
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+# Upper bounds in seconds, from a cached lookup to a report over a long history
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+QUERY_SECONDS = 'hotel_db_query_seconds'
+QUERY_ROWS = 'hotel_db_rows_returned_total'
+QUERY_ERRORS = 'hotel_db_errors_total'
+ACQUIRE_SECONDS = 'hotel_db_connection_acquire_seconds'
+SLOW_QUERIES = 'hotel_db_slow_queries_total'
+OPERATION_SECONDS = 'hotel_operation_seconds'
+OPERATION_QUERIES = 'hotel_operation_queries_total'
+OPERATION_DB_SECONDS = 'hotel_operation_db_seconds_total'
+
+HELP = {
+    QUERY_SECONDS: 'Storage backend call latency',
+    QUERY_ROWS: 'Rows returned by storage backend reads',
+    QUERY_ERRORS: 'Storage backend calls that raised',
+    ACQUIRE_SECONDS: 'Time spent waiting for a database connection',
+    SLOW_QUERIES: 'Storage backend calls over the slow-query threshold',
+    OPERATION_SECONDS: 'Business operation latency',
+    OPERATION_QUERIES: 'Storage backend calls made inside business operations',
+    OPERATION_DB_SECONDS: 'Storage backend time spent inside business operations',
+}
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram, as Prometheus exposes them."""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile (inf if past the last bound)."""
+        rank, seen = fraction * self.count, 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank and seen:
+                return bound
+        return 0.0
+
+
+_enabled = False
+_lock = threading.Lock()
+_histograms = {}  # (name, labels) -> Histogram; labels is a tuple of (label, value) pairs
+_counters = {}    # (name, labels) -> number
+_collectors = []  # callables yielding (name, kind, labels, value) samples at render time
+_local = threading.local()
+
+_slow_seconds = 0.1
+_slow_log = None     # file path; None writes to stderr
+_exporter = None
+
+
+def enabled():
+    return _enabled
+
+
+def enable(slow_query_ms=100, slow_log=None, textfile=None, interval=15.0):
+    """Starts recording; with textfile, render() is also written there every interval seconds and at exit."""
+    global _enabled, _slow_seconds, _slow_log, _exporter
+    _slow_seconds = slow_query_ms / 1000
+    _slow_log = slow_log or None
+    _enabled = True
+    if textfile and _exporter is None:
+        _exporter = threading.Thread(target=_export, args=(textfile, interval), name="metrics-export", daemon=True)
+        _exporter.start()
+        atexit.register(write_textfile, textfile)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Forgets everything recorded so far."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def register_collector(collect):
+    """Adds a callable whose (name, kind, labels dict, value) samples are rendered with the rest."""
+    _collectors.append(collect)
+
+
+# ---------------- recording ----------------
+
+# Callers hold _lock
+def _histogram(name, labels):
+    histogram = _histograms.get((name, labels))
+    if histogram is None:
+        histogram = _histograms[(name, labels)] = Histogram()
+    return histogram
+
+
+def _add(name, labels, amount):
+    _counters[(name, labels)] = _counters.get((name, labels), 0) + amount
+
+
+def observe(name, labels, seconds):
+    with _lock:
+        _histogram(name, labels).observe(seconds)
+
+
+def increment(name, labels, amount=1):
+    with _lock:
+        _add(name, labels, amount)
+
+
+def histogram(name, **labels):
+    """The histogram recorded for a series, or None."""
+    return _histograms.get((name, tuple(sorted(labels.items()))))
+
+
+def counter(name, **labels):
+    return _counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def slow_log(message):
+    line = f"{datetime.now().isoformat(timespec='milliseconds')} {message}"
+    if _slow_log is None:
+        print(line, file=sys.stderr)
+    else:
+        with open(_slow_log, 'a') as f:
+            f.write(line + '\n')
+
+
+def _open_spans():
+    spans = getattr(_local, 'spans', None)
+    if spans is None:
+        spans = _local.spans = []
+    return spans
+
+
+def record_query(operation, table, seconds, rows=None, error=False, args=()):
+    """Records one storage call, charging it to the business operations open on this thread."""
+    labels = (('operation', operation), ('table', table))
+    slow = seconds >= _slow_seconds
+    with _lock:
+        _histogram(QUERY_SECONDS, labels).observe(seconds)
+        if rows is not None:
+            _add(QUERY_ROWS, labels, rows)
+        if error:
+            _add(QUERY_ERRORS, labels, 1)
+        if slow:
+            _add(SLOW_QUERIES, labels, 1)
+    for span in _open_spans():
+        span.queries += 1
+        span.db_seconds += seconds
+    if slow:
+        slow_log(f"slow query {seconds * 1000:.1f} ms: {operation} {table} {reprlib.repr(args)}")
+
+
+class Span:
+    """Times a business operation and the storage calls made inside it; does nothing while metrics are off."""
+
+    __slots__ = ('operation', 'queries', 'db_seconds', '_start')
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.queries = 0
+        self.db_seconds = 0.0
+        self._start = None
+
+    def __enter__(self):
+        if _enabled:
+            _open_spans().append(self)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._start is None:
+            return
+        elapsed = time.perf_counter() - self._start
+        _open_spans().remove(self)
+        labels = (('operation', self.operation),)
+        with _lock:
+            _histogram(OPERATION_SECONDS, labels).observe(elapsed)
+            _add(OPERATION_QUERIES, labels, self.queries)
+            _add(OPERATION_DB_SECONDS, labels, self.db_seconds)
+        if elapsed >= _slow_seconds:
+            slow_log(f"slow operation {elapsed * 1000:.1f} ms: {self.operation} "
+                     f"({self.queries} queries, {self.db_seconds * 1000:.1f} ms in the database)")
+
+
+span = Span
+
+
+def timed(operation):
+    """Decorator form of span(); a plain call while metrics are off."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(operation):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# ---------------- instrumented backend ----------------
+
+class InstrumentedBackend:
+    """Proxy that times every call into a storage backend; other attributes pass through."""
+
+    def __init__(self, backend):
+        self._backend = backend
+        backend.on_acquire = self._acquired
+
+    def __getattr__(self, name):
+        return getattr(self._backend, name)
+
+    @staticmethod
+    def _acquired(seconds):
+        observe(ACQUIRE_SECONDS, (), seconds)
+
+    def _call(self, operation, table, rows, method, *args):
+        start = time.perf_counter()
+        try:
+            result = method(*args)
+        except Exception:
+            record_query(operation, table, time.perf_counter() - start, error=True, args=args)
+            raise
+        record_query(operation, table, time.perf_counter() - start, rows(result) if rows else None, args=args)
+        return result
+
+    def insert(self, table, data):
+        return self._call('insert', table, None, self._backend.insert, table, data)
+
+    def insert_many(self, table, rows):
+        return self._call('insert_many', table, None, self._backend.insert_many, table, rows)
+
+    def delete(self, table, column, value):
+        return self._call('delete', table, None, self._backend.delete, table, column, value)
+
+    def update(self, table, updates, column, value):
+        return self._call('update', table, None, self._backend.update, table, updates, column, value)
+
+    def update_many(self, changes):
+        tables = ','.join(sorted({change[0] for change in changes}))
+        return self._call('update_many', tables, None, self._backend.update_many, changes)
+
+    def write_batch(self, inserts=(), changes=(), deletes=()):
+        tables = ','.join(sorted({insert[0] for insert in inserts} | {change[0] for change in changes}
+                                 | {delete[0] for delete in deletes}))
+        return self._call('write_batch', tables, None, self._backend.write_batch, inserts, changes, deletes)
+
+    def book(self, customer_name, room_number, start_date, end_date):
+        return self._call('book', 'reservations', None, self._backend.book,
+                          customer_name, room_number, start_date, end_date)
+
+    def book_many(self, stays):
+        return self._call('book_many', 'reservations', None, self._backend.book_many, stays)
+
+    def select_all(self, table):
+        return self._call('select_all', table, len, self._backend.select_all, table)
+
+    def select_key(self, table, key):
+        return self._call('select_key', table, lambda row: int(row is not None), self._backend.select_key, table, key)
+
+    def change_counters(self):
+        return self._call('change_counters', 'change_counters', len, self._backend.change_counters)
+
+    def iter_pages(self, table, page_size, filters=()):
+        # Each page fetch is one timed call; time the caller spends between pages is not counted
+        pages = self._backend.iter_pages(table, page_size, filters)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    page = next(pages)
+                except StopIteration:
+                    record_query('iter_pages', table, time.perf_counter() - start, 0, args=(filters,))
+                    return
+                except Exception:
+                    record_query('iter_pages', table, time.perf_counter() - start, error=True, args=(filters,))
+                    raise
+                record_query('iter_pages', table, time.perf_counter() - start, len(page), args=(filters,))
+                yield page
+        finally:
+            pages.close()
+
+    def close(self):
+        self._backend.close()
+
+
+# ---------------- export ----------------
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def render():
+    """Everything recorded so far in the Prometheus text exposition format."""
+    with _lock:
+        histograms = {key: (list(h.counts), h.sum, h.count, h.bounds) for key, h in _histograms.items()}
+        counters = dict(_counters)
+    lines, described = [], set()
+
+    def describe(name, kind):
+        if name not in described:
+            described.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), (counts, total, count, bounds) in sorted(histograms.items()):
+        describe(name, 'histogram')
+        cumulative = 0
+        for bound, bucket in zip(bounds + (float('inf'),), counts):
+            cumulative += bucket
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    for (name, labels), value in sorted(counters.items()):
+        describe(name, 'counter')
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    # A metric's samples must be contiguous, whatever order the collectors yield them in
+    families = {}
+    for collect in _collectors:
+        for name, kind, labels, value in collect():
+            families.setdefault((name, kind), []).append(f"{name}{_format_labels(sorted(labels.items()))} {value}")
+    for (name, kind), samples in families.items():
+        describe(name, kind)
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+def write_textfile(path):
+    """Writes render() to path through a temporary file, so readers never see half a file."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, 'w') as f:
+        f.write(render())
+    os.replace(temporary, path)
+
+
+def _export(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_textfile(path)
+        except OSError as err:
+            print(f"Error writing metrics to {path}: {err}", file=sys.stderr)
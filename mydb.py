@@ -1,184 +1,442 @@
+import atexit
+import os
+import time
 from datetime import date
-import mysql.connector
+from itertools import islice
+from backends import COUNTED_TABLES, INSERT_COLUMNS, PRIMARY_KEYS, UNLOGGED, create_backend
+from cache import LRUCache
+import metrics
+from writebehind import WriteBehindQueue
 
+# MySQL connection settings
+DB_CONFIG = {
+    'user': 'root',
+    'password': 'admin',  # Replace with your actual password
+    'host': 'localhost',
+    'port': 3306  # Default MySQL port
+}
+DB_NAME = 'hotelSystem'
+POOL_SIZE = int(os.environ.get('HOTEL_DB_POOL_SIZE', 5))
 
-def connect_to_mysql():
-    try:
-        conn = mysql.connector.connect(
-    user='root',
-    password='admin',  # Replace with your actual password
-    host='localhost',
-    port=3306  # Default MySQL port
-)
-        return conn
-    except mysql.connector.Error as err:
-        print(f"Error: {err}")
+# Storage engine: 'mysql', 'sqlite' (a file path or ':memory:') or 'memory'
+BACKEND = os.environ.get('HOTEL_DB_BACKEND', 'mysql')
+SQLITE_PATH = os.environ.get('HOTEL_DB_PATH', 'hotel.db')
+
+# Rows per transaction for add_records
+BATCH_SIZE = int(os.environ.get('HOTEL_DB_BATCH_SIZE', 1000))
+
+# Rows fetched per round trip by the streaming readers
+PAGE_SIZE = int(os.environ.get('HOTEL_DB_PAGE_SIZE', 500))
+
+# Write-behind for status updates: update_record(s) queue their changes and a
+# background thread group-commits them (set HOTEL_DB_WRITE_BEHIND=1 to enable)
+WRITE_BEHIND = os.environ.get('HOTEL_DB_WRITE_BEHIND', '0') == '1'
+FLUSH_INTERVAL = float(os.environ.get('HOTEL_DB_FLUSH_INTERVAL', 0.01))  # seconds to wait for more changes
+FLUSH_SIZE = int(os.environ.get('HOTEL_DB_FLUSH_SIZE', 500))             # changes per transaction, at most
+QUEUE_SIZE = int(os.environ.get('HOTEL_DB_QUEUE_SIZE', 10000))           # queued operations before submit blocks
+
+# Read-through cache behind get_room / get_customer, one per table
+CACHE_SIZE = int(os.environ.get('HOTEL_CACHE_SIZE', 10000))               # entries
+CACHE_BYTES = int(os.environ.get('HOTEL_CACHE_BYTES', 16 * 1024 * 1024))  # approximate bytes
+CACHE_TTL = float(os.environ.get('HOTEL_CACHE_TTL', 300))                 # seconds an entry is trusted
+# Seconds between checks of the change counters for writes by other
+# processes; 0 trusts the cache until TTL (only this process's writes invalidate)
+CACHE_POLL = float(os.environ.get('HOTEL_CACHE_POLL', 1.0))
+
+# Instrumentation (set HOTEL_METRICS=1 to enable): per-query latency
+# histograms, operation spans and a slow-query log; see metrics.py
+METRICS = os.environ.get('HOTEL_METRICS', '0') == '1'
+SLOW_QUERY_MS = float(os.environ.get('HOTEL_SLOW_QUERY_MS', 100))          # slow-log threshold
+SLOW_LOG = os.environ.get('HOTEL_SLOW_LOG', '')                            # file; empty logs to stderr
+METRICS_FILE = os.environ.get('HOTEL_METRICS_FILE', '')                    # Prometheus textfile to keep updated
+METRICS_INTERVAL = float(os.environ.get('HOTEL_METRICS_INTERVAL', 15))     # seconds between textfile writes
+
+# Reservation filters for the streaming readers
+ACTIVE = [("checked_out", "=", False)]
+HISTORY = [("checked_out", "=", True)]
+
+# Column matched by remove_record / update_record for each table. Reservations
+# are updated by their full key, (customer_name, room_number, start_date), so a
+# status change touches exactly one row
+REMOVE_KEYS = {'rooms': 'number', 'customers': 'name', 'reservations': 'customer_name'}
+UPDATE_KEYS = {'rooms': 'number', 'reservations': ('customer_name', 'room_number', 'start_date'),
+               'audit_checkpoints': ('audit_date', 'shard_low')}
+
+_backend = None
+_settings = None    # (name, options) the backend was created with
+_write_behind = None
+_caches = {}        # table -> LRUCache of rows by primary key
+_counters = {}      # table -> change counter when the cache last checked
+_last_poll = 0.0
+_logged = False     # True once this process records its writes in an event log
+
+
+def configure(name=None, write_behind=None, instrument=None, **options):
+    """Selects the storage backend; keyword options override the settings above."""
+    global _backend, _settings, _write_behind, _caches, _counters
+    name = name or BACKEND
+    write_behind = WRITE_BEHIND if write_behind is None else write_behind
+    instrument = METRICS if instrument is None else instrument
+    if name == 'mysql':
+        options = {'config': DB_CONFIG, 'database': DB_NAME, 'pool_size': POOL_SIZE, **options}
+    elif name == 'sqlite':
+        options = {'path': SQLITE_PATH, **options}
+    shutdown()
+    _backend = create_backend(name, **options)
+    _settings = (name, options)
+    if instrument:
+        metrics.enable(SLOW_QUERY_MS, SLOW_LOG, METRICS_FILE, METRICS_INTERVAL)
+        _backend = metrics.InstrumentedBackend(_backend)
+    else:
+        metrics.disable()
+    if write_behind:
+        _write_behind = WriteBehindQueue(_group_commit(_backend), QUEUE_SIZE, FLUSH_INTERVAL, FLUSH_SIZE)
+    _caches = {table: LRUCache(CACHE_SIZE, CACHE_BYTES, CACHE_TTL) for table in COUNTED_TABLES}
+    _counters = {}
+    return _backend
+
+def _group_commit(backend):
+    """The write-behind queue's commit: one counted write per group of queued changes."""
+    def commit(changes):
+        backend.update_many(changes)
+        _count_write(backend)
+    return commit
+
+def get_backend():
+    if _backend is None:
+        configure()
+    return _backend
+
+def backend_settings():
+    """(name, options) that open the same database from another process, or None if it lives in this one."""
+    get_backend()
+    name, options = _settings
+    if name == 'memory' or (name == 'sqlite' and options.get('path') == ':memory:'):
         return None
+    return name, options
 
-def create_database(cursor):
+def get_write_behind():
+    """The write-behind queue, or None when updates are written straight through."""
+    return _write_behind
+
+def flush():
+    """Waits until every queued update is committed."""
+    if _write_behind is not None:
+        _write_behind.flush()
+
+@atexit.register
+def shutdown():
+    """Commits queued updates and closes the backend; runs at exit."""
+    global _backend, _write_behind
+    if _write_behind is not None:
+        _write_behind.close()
+        _write_behind = None
+    if _backend is not None:
+        _backend.close()
+        _backend = None
+
+# Everything except update_record(s) goes straight to the backend, so queued
+# updates are flushed first to keep all writes and reads in submission order
+def _synced_backend():
+    flush()
+    return get_backend()
+
+# ---------------- read-through cache ----------------
+
+def _invalidate(table, column, value):
+    """Drops cached rows a write to table WHERE column = value may have changed."""
+    cache = _caches.get(table)
+    if cache is None:
+        return
+    if (column,) == PRIMARY_KEYS[table]:
+        cache.invalidate((value,))
+    else:
+        cache.clear()
+
+def _poll_changes(backend):
+    """Clears a table's cache when its change counter moved, i.e. another process wrote to it."""
+    global _last_poll
+    if CACHE_POLL <= 0 or time.monotonic() - _last_poll < CACHE_POLL:
+        return
+    _last_poll = time.monotonic()
     try:
-        cursor.execute("CREATE DATABASE IF NOT EXISTS hotelSystem")
-        cursor.execute("USE hotelSystem")
-    except mysql.connector.Error as err:
-        print(f"Error creating database: {err}")
-
-def create_tables(cursor):
-    rooms_table = '''
-    CREATE TABLE IF NOT EXISTS rooms (
-        number INT PRIMARY KEY,
-        type VARCHAR(50),
-        price DECIMAL(10, 2),
-        available BOOLEAN DEFAULT TRUE
-    );
-    '''
-    
-    customers_table = '''
-    CREATE TABLE IF NOT EXISTS customers (
-        name VARCHAR(100) PRIMARY KEY,
-        contact_info VARCHAR(255),
-        payment_method VARCHAR(50)
-    );
-    '''
-    
-    reservations_table = '''
-    CREATE TABLE IF NOT EXISTS reservations (
-        customer_name VARCHAR(100),
-        room_number INT,
-        start_date DATE,
-        end_date DATE,
-        checked_in BOOLEAN DEFAULT FALSE,
-        checked_out BOOLEAN DEFAULT FALSE,
-        PRIMARY KEY (customer_name, room_number, start_date),
-        FOREIGN KEY (customer_name) REFERENCES customers(name) ON DELETE CASCADE,
-        FOREIGN KEY (room_number) REFERENCES rooms(number) ON DELETE CASCADE
-    );
-    '''
-    
+        counters = backend.change_counters()
+    except backend.Error as err:
+        print(f"Error reading change counters: {err}")
+        return
+    for table, counter in counters.items():
+        if table in _caches and table in _counters and _counters[table] != counter:
+            _caches[table].clear()
+        _counters[table] = counter
+
+def _cached_row(table, key):
+    backend = get_backend()
+    cache = _caches[table]
+    _poll_changes(backend)
+    row = cache.get(key)
+    if row is None:
+        generation = cache.generation
+        backend = _synced_backend()
+        try:
+            row = backend.select_key(table, key)
+        except backend.Error as err:
+            print(f"Error reading {table}: {err}")
+            return None
+        if row is not None:
+            cache.put(key, tuple(row), generation)
+    return row
+
+def get_room(room_number):
+    """One room as a dict (None if there is no such room), read through the cache."""
+    row = _cached_row('rooms', (room_number,))
+    return room_from_row(row) if row is not None else None
+
+def get_customer(name):
+    """One customer as a dict (None if there is no such customer), read through the cache."""
+    row = _cached_row('customers', (name,))
+    return customer_from_row(row) if row is not None else None
+
+def cache_stats():
+    """Hit, miss, eviction and size counters for each table's cache."""
+    get_backend()
+    return {table: cache.stats() for table, cache in _caches.items()}
+
+# Cache and write-behind counters, rendered with the metrics
+def _metric_samples():
+    for table, cache in _caches.items():
+        stats = cache.stats()
+        for name in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+            yield f'hotel_cache_{name}_total', 'counter', {'table': table}, stats[name]
+        yield 'hotel_cache_entries', 'gauge', {'table': table}, stats['entries']
+        yield 'hotel_cache_bytes', 'gauge', {'table': table}, stats['bytes']
+    if _write_behind is not None:
+        for name in ('units', 'changes', 'commits'):
+            yield f'hotel_write_behind_{name}_total', 'counter', {}, getattr(_write_behind, name)
+
+metrics.register_collector(_metric_samples)
+
+# ---------------- writes ----------------
+
+# Every write from a process that keeps no event log is counted once it has
+# committed, so a desk starting from its log sees the database changed and
+# reloads from it. Writes that fail or book nothing are not counted. The count
+# is its own short transaction rather than part of the write's, which would
+# hold the counter row locked for the whole write and serialise the writers
+def log_writes():
+    """Declares that this process records its writes in an event log (eventlog.py)."""
+    global _logged
+    _logged = True
+
+def _count_write(backend):
+    if not _logged:
+        try:
+            backend.count_unlogged_write()
+        except backend.Error as err:
+            # The write itself has committed; only the count is lost
+            print(f"Error counting write: {err}")
+
+def unlogged_writes():
+    """How many writes processes without an event log have made, or None on a database error."""
+    backend = _synced_backend()
     try:
-        cursor.execute(rooms_table)
-        cursor.execute(customers_table)
-        cursor.execute(reservations_table)
-    except mysql.connector.Error as err:
-        print(f"Error creating tables: {err}")
+        return backend.change_counters().get(UNLOGGED)
+    except backend.Error as err:
+        print(f"Error reading change counters: {err}")
+        return None
 
 def add_record(table, data):
-    conn = connect_to_mysql()
-    cursor = conn.cursor()
-    create_database(cursor)
-    create_tables(cursor)
-    if table == 'rooms':
-        query = "INSERT INTO rooms (number, type, price, available) VALUES (%s, %s, %s, %s)"
-    elif table == 'customers':
-        query = "INSERT INTO customers (name, contact_info, payment_method) VALUES (%s, %s, %s)"
-    elif table == 'reservations':
-        query = "INSERT INTO reservations (customer_name, room_number, start_date, end_date) VALUES (%s, %s, %s, %s)"
+    backend = _synced_backend()
     try:
-        cursor.execute(query, data)
-        conn.commit()
-        cursor.close()
-        conn.close()
-    except mysql.connector.Error as err:
+        backend.insert(table, data)
+        _count_write(backend)
+    except backend.Error as err:
         print(f"Error adding record to {table}: {err}")
+    finally:
+        key_column = PRIMARY_KEYS[table][0]
+        _invalidate(table, key_column, data[INSERT_COLUMNS[table].index(key_column)])
+
+def add_records(table, rows, batch_size=BATCH_SIZE):
+    """Inserts rows in batches, one transaction per batch; returns the number committed."""
+    backend = _synced_backend()
+    rows = iter(rows)
+    committed = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return committed
+        try:
+            backend.insert_many(table, batch)
+            _count_write(backend)
+        except backend.Error as err:
+            print(f"Error adding records to {table} (batch starting at row {committed + 1}): {err}")
+            return committed
+        finally:
+            _invalidate(table, None, None)
+        committed += len(batch)
+
+def book_reservation(customer_name, room_number, start_date, end_date):
+    """Books a stay in one transaction with the room locked.
+
+    Returns True if booked, False if another reservation already holds any of
+    the nights, and None if the database reported an error.
+    """
+    backend = _synced_backend()
+    try:
+        booked = backend.book(customer_name, room_number, start_date, end_date)
+    except backend.Error as err:
+        print(f"Error adding record to reservations: {err}")
+        return None
+    if booked:
+        _count_write(backend)
+    return booked
+
+def book_reservations(stays):
+    """Books (customer_name, room_number, start_date, end_date) stays in one transaction.
+
+    Returns True if all were booked, False (nothing booked) if any night is
+    already held, and None if the database reported an error.
+    """
+    backend = _synced_backend()
+    try:
+        booked = backend.book_many(list(stays))
+    except backend.Error as err:
+        print(f"Error adding records to reservations: {err}")
+        return None
+    if booked:
+        _count_write(backend)
+    return booked
 
 def remove_record(table, condition):
-    conn = connect_to_mysql()
-    cursor = conn.cursor()
-    create_database(cursor)
-    create_tables(cursor)
+    backend = _synced_backend()
     try:
-        if table == 'rooms':
-            query = f"DELETE FROM rooms WHERE number = {condition}"
-        elif table == 'customers':
-            query = f"DELETE FROM customers WHERE name = '{condition}'"
-        elif table == 'reservations':
-            query = f"DELETE FROM reservations WHERE customer_name = '{condition}'"
-        cursor.execute(query)
-        conn.commit()
-        cursor.close()
-        conn.close()
-    except mysql.connector.Error as err:
+        backend.delete(table, REMOVE_KEYS[table], condition)
+        _count_write(backend)
+    except backend.Error as err:
         print(f"Error removing record from {table}: {err}")
+    finally:
+        _invalidate(table, REMOVE_KEYS[table], condition)
 
 def update_record(table, updates, condition):
-    conn = connect_to_mysql()
-    cursor = conn.cursor()
-    create_database(cursor)
-    create_tables(cursor)
+    """Applies a {column: value} dict of updates to the matching rows."""
+    update_records([(table, updates, condition)])
+
+def update_records(changes):
+    """Applies (table, updates, condition) changes from one operation in a single transaction.
+
+    With write-behind enabled the changes are queued and committed later,
+    together with whatever other operations queued meanwhile.
+    """
+    changes = [(table, updates, UPDATE_KEYS[table], condition) for table, updates, condition in changes]
+    if _write_behind is not None:
+        # Cached rows are dropped now; the next read flushes the queue before reloading them
+        _write_behind.submit(changes)
+    else:
+        backend = get_backend()
+        try:
+            backend.update_many(changes)
+            _count_write(backend)
+        except backend.Error as err:
+            print(f"Error updating records: {err}")
+    for table, _, column, condition in changes:
+        _invalidate(table, column, condition)
+
+def write_batch(inserts=(), changes=(), deletes=()):
+    """Commits (table, row) inserts, (table, updates, condition) changes and (table, key) deletes together.
+
+    Returns True once committed, False (nothing written) if the database reported an error.
+    """
+    changes = [(table, updates, UPDATE_KEYS[table], condition) for table, updates, condition in changes]
+    deletes = [(table, PRIMARY_KEYS[table], key) for table, key in deletes]
+    backend = _synced_backend()
     try:
-        if table == 'rooms':
-            query = f"UPDATE rooms SET {updates} WHERE number = {condition}"
-        elif table == 'reservations':
-            query = f"UPDATE reservations SET {updates} WHERE room_number = '{condition}'"
-        cursor.execute(query)
-        conn.commit()
-        cursor.close()
-        conn.close()
-    except mysql.connector.Error as err:
-        print(f"Error updating record in {table}: {err}")
-
-def get_records():
-    conn = connect_to_mysql()
-    cursor = conn.cursor()
-    create_database(cursor)
-    create_tables(cursor)
+        backend.write_batch(inserts, changes, deletes)
+        _count_write(backend)
+        return True
+    except backend.Error as err:
+        print(f"Error writing batch: {err}")
+        return False
+    finally:
+        for table, _, column, condition in changes:
+            _invalidate(table, column, condition)
+        for table, row in inserts:
+            if table in _caches:
+                _invalidate(table, None, None)
+
+# Row -> dict converters shared by get_records and the streaming readers
+def room_from_row(row):
+    return {
+        "room_number": int(row[0]),
+        "room_type": str(row[1]),
+        "price": float(row[2]),
+        "available": bool(row[3])
+    }
+
+def customer_from_row(row):
+    return {
+        "name": str(row[0]),
+        "contact_info": str(row[1]),
+        "payment_method": str(row[2])
+    }
+
+def reservation_from_row(row, rooms_by_number, customers_by_name):
+    return {
+        "customer": customers_by_name.get(str(row[0])),
+        "room": rooms_by_number.get(int(row[1])),
+        "start_date": date.fromisoformat(str(row[2])),
+        "end_date": date.fromisoformat(str(row[3])),
+        "checked_in": bool(row[4]),
+        "checked_out": bool(row[5])
+    }
+
+def reservation_key(reservation):
+    """Primary key of a reservation dict: (customer name, room number, start date)."""
+    return (reservation["customer"]["name"], reservation["room"]["room_number"], reservation["start_date"])
+
+def iter_rows(table, filters=(), page_size=PAGE_SIZE):
+    """Streams raw rows, fetching page_size at a time; filters are (column, op, value) tuples."""
+    backend = _synced_backend()
+    try:
+        for page in backend.iter_pages(table, page_size, filters):
+            yield from page
+    except backend.Error as err:
+        print(f"Error reading {table}: {err}")
+
+def iter_reservations(rooms, customers, filters=(), page_size=PAGE_SIZE):
+    """Streams reservation dicts linked to the given room and customer dicts."""
+    rooms_by_number = {room["room_number"]: room for room in rooms}
+    customers_by_name = {customer["name"]: customer for customer in customers}
+    for row in iter_rows("reservations", filters, page_size):
+        yield reservation_from_row(row, rooms_by_number, customers_by_name)
+
+def get_active_reservations(rooms, customers):
+    """Reservations that have not been checked out yet."""
+    return list(iter_reservations(rooms, customers, ACTIVE))
+
+def get_reservations_between(rooms, customers, start_date, end_date):
+    """Reservations whose stay overlaps [start_date, end_date)."""
+    return list(iter_reservations(rooms, customers, [("start_date", "<", end_date), ("end_date", ">", start_date)]))
+
+def iter_history(rooms, customers, exclude=()):
+    """Streams checked-out reservations, skipping keys already held in memory."""
+    for reservation in iter_reservations(rooms, customers, HISTORY):
+        if reservation_key(reservation) not in exclude:
+            yield reservation
+
+def get_records(active_only=False):
+    """Loads rooms, customers and reservations; active_only leaves checked-out stays in the database."""
+    backend = _synced_backend()
     try:
-        cursor.execute("SELECT * FROM rooms")
-        rooms_db = cursor.fetchall()
-        cursor.execute("SELECT * FROM customers")
-        customers_db = cursor.fetchall()
-        cursor.execute("SELECT * FROM reservations")
-        reservations_db = cursor.fetchall()
-
-        rooms = []
-        customers = []
-        reservations = []
-
-        for room_db in rooms_db:
-            rooms.append(
-                {
-                    "room_number": int(room_db[0]),
-                    "room_type": str(room_db[1]),
-                    "price": float(room_db[2]),
-                    "available": bool(room_db[3])
-                }
-            )
-        for customer_db in customers_db:
-            customers.append(
-                {
-                    "name": str(customer_db[0]),
-                    "contact_info": str(customer_db[1]),
-                    "payment_method": str(customer_db[2])
-                }
-            )
-        for reservation_db in reservations_db:
-            customer_name = str(reservation_db[0])
-            room_number = int(reservation_db[1])
-            start_date = date.fromisoformat(str(reservation_db[2]))
-            end_date = date.fromisoformat(str(reservation_db[3]))
-            checked_in = bool(reservation_db[4])
-            checked_out = bool(reservation_db[5])
-            reservation_room = None
-            reservation_customer = None
-            for room in rooms:
-                if room.get("room_number") == room_number:
-                    reservation_room = room
-                    break
-            for customer in customers:
-                if customer.get("name") == customer_name:
-                    reservation_customer = customer
-                    break
-            reservations.append(
-                {
-                    "customer": reservation_customer,
-                    "room": reservation_room,
-                    "start_date": start_date,
-                    "end_date": end_date,
-                    "checked_in": checked_in,
-                    "checked_out": checked_out
-                }
-            )
-        cursor.close()
-        conn.close()
+        rooms = [room_from_row(row) for row in backend.select_all("rooms")]
+        customers = [customer_from_row(row) for row in backend.select_all("customers")]
+        if active_only:
+            reservations = get_active_reservations(rooms, customers)
+        else:
+            rooms_by_number = {room["room_number"]: room for room in rooms}
+            customers_by_name = {customer["name"]: customer for customer in customers}
+            reservations = [
+                reservation_from_row(row, rooms_by_number, customers_by_name)
+                for row in backend.select_all("reservations")
+            ]
         return rooms, customers, reservations
-    except mysql.connector.Error as err:
+    except backend.Error as err:
         print(f"Error getting records: {err}")
@@ -0,0 +1,224 @@
+"""Night audit: end-of-day processing for one business date, in checkpointed chunks.
+
+Usage: python night_audit.py [DATE] [--workers N] [--room-shards N] [--chunk-rooms N]
+       (DATE as YYYY-MM-DD, default today)
+
+Auditing DATE closes that business day:
+- every checked-in stay that covers the night of DATE is charged that night's
+  rate (pricing.py), one row in room_charges;
+- checked-in stays due out on or before DATE are overdue: the audit checks
+  them out and frees their rooms;
+- stays due to arrive on DATE that were never checked in are no-shows: the
+  audit cancels them, which frees their nights for sale.
+Every status change is also written to audit_log with the stay's dates.
+
+The rooms are cut into ranges of room numbers, one shard each, run by worker
+processes as in reports.py. A shard streams its stays a chunk of rooms at a
+time and commits each chunk's charges and status changes in one transaction
+together with the shard's checkpoint (the next room to audit and running
+totals) in audit_checkpoints. A run that dies resumes each shard after its
+last committed chunk, so nothing is posted twice or skipped; auditing a date
+that is already finished only prints its totals.
+
+Run the audit for every business date, in order: a date's arrivals and
+departures are only looked at when that date is audited. Desks that are
+running keep their in-memory state, so restart them after the audit to see
+its checkouts and cancellations; a desk with an event log notices the audit's
+writes and starts from the database.
+"""
+import argparse
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import mydb
+import pricing
+from reports import cents, load_rooms, room_ranges
+
+CHUNK_ROOMS = 100   # rooms per transaction
+
+# Bounds for the first and last shards, so rooms added after a run started still belong to one
+LOWEST_ROOM = -2**31
+HIGHEST_ROOM = 2**31 - 1
+
+NO_SHOW = "no_show"
+OVERDUE_CHECKOUT = "overdue_checkout"
+
+
+def _date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+class AuditTotals:
+    """What an audit posted: counts, and room revenue in cents."""
+
+    FIELDS = ("charges", "revenue_cents", "overdue", "no_shows")
+
+    def __init__(self, charges=0, revenue_cents=0, overdue=0, no_shows=0, chunks=0, stays=0):
+        self.charges = charges
+        self.revenue_cents = revenue_cents
+        self.overdue = overdue
+        self.no_shows = no_shows
+        self.chunks = chunks    # transactions committed by this run
+        self.stays = stays      # stays examined by this run
+
+    def merge(self, other):
+        for field in self.FIELDS + ("chunks", "stays"):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        return self
+
+
+def audit_chunk(rows, rooms, audit_date):
+    """(inserts, changes, deletes, totals) for mydb.write_batch from one chunk's reservation rows."""
+    engine = pricing.get_engine()
+    inserts, changes, deletes = [], [], []
+    totals = AuditTotals()
+    for row in rows:
+        customer_name, room_number, start_date, end_date = row[0], int(row[1]), _date(row[2]), _date(row[3])
+        checked_in, checked_out = bool(row[4]), bool(row[5])
+        room = rooms.get(room_number)
+        if checked_out or room is None:
+            continue
+        totals.stays += 1
+        key = (customer_name, room_number, start_date)
+        if checked_in and end_date <= audit_date:
+            changes.append(("reservations", {"checked_out": True}, key))
+            changes.append(("rooms", {"available": True}, room_number))
+            inserts.append(("audit_log", (audit_date, OVERDUE_CHECKOUT, *key, end_date)))
+            totals.overdue += 1
+        elif checked_in and start_date <= audit_date:
+            amount = engine.nightly_rate(room[0], room[1], audit_date)
+            inserts.append(("room_charges", (*key, audit_date, amount)))
+            totals.charges += 1
+            totals.revenue_cents += cents(amount)
+        elif not checked_in and start_date == audit_date:
+            deletes.append(("reservations", key))
+            inserts.append(("audit_log", (audit_date, NO_SHOW, *key, end_date)))
+            totals.no_shows += 1
+    return inserts, changes, deletes, totals
+
+
+# ============================================================
+# Shards
+# ============================================================
+
+_rooms = {}  # room number -> (room_type, rack rate); set per worker process
+
+
+def _init_worker(settings, rooms, plans=None):
+    global _rooms
+    _rooms = rooms
+    if plans is not None:
+        pricing.configure(plans)
+    if settings is not None:
+        name, options = settings
+        mydb.configure(name, write_behind=False, instrument=False, **options)
+
+
+def audit_shard(shard):
+    """Audits rooms [next_room, high) of a shard, chunk by chunk; returns this run's AuditTotals.
+
+    shard is (audit_date, low, high, next_room, chunk_rooms, totals so far as a tuple of FIELDS).
+    """
+    audit_date, low, high, next_room, chunk_rooms, done = shard
+    numbers = sorted(number for number in _rooms if next_room <= number < high)
+    posted = AuditTotals(*done)     # the shard's totals, as checkpointed
+    committed = AuditTotals()       # this run's share
+    for i in range(0, len(numbers), chunk_rooms):
+        first = numbers[i]
+        following = numbers[i + chunk_rooms] if i + chunk_rooms < len(numbers) else high
+        filters = [("room_number", ">=", first), ("room_number", "<", following),
+                   ("checked_out", "=", False), ("start_date", "<=", audit_date)]
+        inserts, changes, deletes, totals = audit_chunk(mydb.iter_rows("reservations", filters), _rooms, audit_date)
+        posted.merge(totals)
+        checkpoint = {"next_room": following, **{field: getattr(posted, field) for field in AuditTotals.FIELDS}}
+        changes.append(("audit_checkpoints", checkpoint, (audit_date, low)))
+        if not mydb.write_batch(inserts, changes, deletes):
+            raise RuntimeError(f"Night audit of rooms {first}..{following - 1} failed; run it again to resume")
+        committed.merge(totals)
+        committed.chunks += 1
+    return committed
+
+
+def checkpoints(audit_date):
+    """{shard_low: checkpoint row} recorded for the date."""
+    return {int(row[1]): row for row in mydb.iter_rows("audit_checkpoints", [("audit_date", "=", audit_date)])}
+
+
+def plan(audit_date, rooms, room_shards):
+    """The date's checkpoints, creating them (one per room range) if the audit has not started."""
+    existing = checkpoints(audit_date)
+    if not existing:
+        ranges = room_ranges(rooms, room_shards)
+        if ranges:
+            ranges[0] = (LOWEST_ROOM, ranges[0][1])
+            ranges[-1] = (ranges[-1][0], HIGHEST_ROOM)
+        started = [("audit_checkpoints", (audit_date, low, high, low)) for low, high in ranges]
+        if started and not mydb.write_batch(started):
+            raise RuntimeError(f"Could not start the night audit of {audit_date}")
+        existing = checkpoints(audit_date)
+    return existing
+
+
+def run(audit_date, workers=None, room_shards=None, chunk_rooms=CHUNK_ROOMS):
+    """Audits the date, resuming where an earlier run stopped.
+
+    Returns (this run's AuditTotals, the date's AuditTotals, number of shards resumed part-way).
+    """
+    rooms = load_rooms()
+    workers = workers or multiprocessing.cpu_count()
+    shards = plan(audit_date, rooms, room_shards or 4 * workers)
+    work = []
+    resumed = 0
+    for low, row in sorted(shards.items()):
+        high, next_room = int(row[2]), int(row[3])
+        if next_room < high:
+            resumed += next_room > low
+            work.append((audit_date, low, high, next_room, chunk_rooms, tuple(int(value) for value in row[4:8])))
+    totals = AuditTotals()
+    settings = mydb.backend_settings()
+    if workers == 1 or settings is None or len(work) <= 1:
+        _init_worker(None, rooms)
+        for shard in work:
+            totals.merge(audit_shard(shard))
+    else:
+        # spawn, not fork: workers must not inherit the parent's connections or writer threads
+        mydb.flush()
+        with ProcessPoolExecutor(min(workers, len(work)), mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker,
+                                 initargs=(settings, rooms, pricing.get_engine().plans)) as pool:
+            for partial in pool.map(audit_shard, work):
+                totals.merge(partial)
+    finished = AuditTotals()
+    for row in checkpoints(audit_date).values():
+        finished.merge(AuditTotals(*(int(value) for value in row[4:8])))
+    return totals, finished, resumed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Night audit: post room charges, check out overdue stays, "
+                                                 "cancel no-shows.")
+    parser.add_argument("date", nargs="?", type=date.fromisoformat, default=date.today(),
+                        help="business date to close (default today)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core; 1 runs in-process)")
+    parser.add_argument("--room-shards", type=int, help="room ranges to split the work into (default: 4 per worker)")
+    parser.add_argument("--chunk-rooms", type=int, default=CHUNK_ROOMS, help="rooms per transaction")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    totals, finished, resumed = run(args.date, args.workers, args.room_shards, args.chunk_rooms)
+    elapsed = time.perf_counter() - start
+    if totals.chunks == 0:
+        print(f"Night audit of {args.date} was already complete.")
+    else:
+        print(f"Night audit of {args.date}: {totals.stays} stays in {totals.chunks} transactions, "
+              f"{elapsed:.2f}s ({totals.stays / elapsed:,.0f} stays/s)"
+              + (f", resumed {resumed} shard(s) from their checkpoints" if resumed else ""))
+    print(f"Room charges posted: {finished.charges}, ${finished.revenue_cents / 100:,.2f}")
+    print(f"Overdue stays checked out: {finished.overdue}")
+    print(f"No-shows cancelled: {finished.no_shows}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from datetime import date, timedelta
+
+HORIZON = 730  # nights covered by default, starting today
+
+
+def _popcount(bits):
+    return bin(bits).count("1")
+
+
+# Occupancy calendar (tape chart): which rooms are sold on which nights.
+#
+# Each room is a Python int used as a bitset over day ordinals counted from the
+# calendar's origin: bit i is the night starting origin + i. One bitset marks
+# the nights sold (reserved or in house), another the nights of checked-in
+# stays. Questions about the whole property are then bitwise operations on a
+# few hundred bits per room instead of a scan over the reservations per cell.
+# Stays past the horizon keep their high bits, so advance() only shifts.
+class OccupancyCalendar:
+    def __init__(self, start=None, nights=HORIZON):
+        self.origin = (start or date.today()).toordinal()
+        self.nights = nights
+        self._sold = {}            # room_number -> bitset of nights sold
+        self._in_house = {}        # room_number -> bitset of nights of checked-in stays
+        self._room_types = {}      # room_number -> room_type
+        self._rooms_by_type = {}   # room_type -> [room_number]
+
+    @property
+    def start(self):
+        return date.fromordinal(self.origin)
+
+    def add_room(self, room_number, room_type):
+        if room_number not in self._room_types:
+            self._sold[room_number] = 0
+            self._in_house[room_number] = 0
+            self._room_types[room_number] = room_type
+            self._rooms_by_type.setdefault(room_type, []).append(room_number)
+
+    def _stay_bits(self, start_date, end_date):
+        # Nights before the origin are dropped; nights past the horizon are kept
+        first = max(start_date.toordinal() - self.origin, 0)
+        last = end_date.toordinal() - self.origin
+        return ((1 << (last - first)) - 1) << first if last > first else 0
+
+    # ---------------- updates ----------------
+
+    def book(self, room_number, start_date, end_date):
+        """Marks the nights of a new reservation as sold."""
+        self._sold[room_number] |= self._stay_bits(start_date, end_date)
+
+    def release(self, room_number, start_date, end_date):
+        bits = ~self._stay_bits(start_date, end_date)
+        self._sold[room_number] &= bits
+        self._in_house[room_number] &= bits
+
+    def check_in(self, room_number, start_date, end_date):
+        self._in_house[room_number] |= self._stay_bits(start_date, end_date)
+
+    def check_out(self, room_number, start_date, end_date):
+        # The nights stay sold; the desk releases those an early departure leaves unused
+        self._in_house[room_number] &= ~self._stay_bits(start_date, end_date)
+
+    def advance(self, day=None):
+        """Rolls the horizon forward to start on `day` (default today), dropping the nights before it."""
+        shift = (day or date.today()).toordinal() - self.origin
+        if shift > 0:
+            self.origin += shift
+            for bitsets in (self._sold, self._in_house):
+                for room_number, bits in bitsets.items():
+                    bitsets[room_number] = bits >> shift
+
+    # ---------------- queries ----------------
+
+    def _window(self, start_date=None, end_date=None):
+        """(first bit, mask) for [start_date, end_date), clipped to the horizon."""
+        first = 0 if start_date is None else max(start_date.toordinal() - self.origin, 0)
+        last = self.nights if end_date is None else min(end_date.toordinal() - self.origin, self.nights)
+        if last <= first:
+            return first, 0
+        return first, ((1 << (last - first)) - 1) << first
+
+    def _rooms(self, room_type=None):
+        return self._rooms_by_type.get(room_type, ()) if room_type is not None else self._room_types
+
+    def free_nights(self, start_date=None, end_date=None, room_type=None):
+        """{room_number: nights not sold} over the window (default: the whole horizon)."""
+        _, mask = self._window(start_date, end_date)
+        return {number: _popcount(mask & ~self._sold[number]) for number in self._rooms(room_type)}
+
+    def sold_out_dates(self, start_date=None, end_date=None, room_type=None):
+        """Nights in the window on which every room (of the type) is sold."""
+        first, mask = self._window(start_date, end_date)
+        rooms = self._rooms(room_type)
+        if not rooms:
+            return []
+        sold_out = mask
+        for number in rooms:
+            sold_out &= self._sold[number]
+            if not sold_out:
+                return []
+        return [date.fromordinal(self.origin + i) for i in _set_bits(sold_out)]
+
+    def free_rooms_per_night(self, start_date=None, end_date=None, room_type=None):
+        """[(night, rooms free)] for each night of the window, e.g. free Suites per night.
+
+        The free bitsets are summed column-wise with a bit-sliced counter: plane k
+        holds bit k of every night's count, and adding a room is a ripple of
+        XOR/AND over the planes, so the cost is per room, not per room-night.
+        """
+        first, mask = self._window(start_date, end_date)
+        planes = []
+        for number in self._rooms(room_type):
+            carry = mask & ~self._sold[number]
+            for k, plane in enumerate(planes):
+                if not carry:
+                    break
+                planes[k], carry = plane ^ carry, plane & carry
+            if carry:
+                planes.append(carry)
+        width = _popcount(mask)
+        counts = [0] * width
+        for k, plane in enumerate(planes):
+            for i in _set_bits(plane >> first):
+                counts[i] += 1 << k
+        day = self.origin + first
+        return [(date.fromordinal(day + i), count) for i, count in enumerate(counts)]
+
+    def tape_chart(self, start_date=None, nights=90, room_numbers=None):
+        """{room_number: row} with one character per night: '.' free, 'R' reserved, 'I' in house."""
+        start_date = start_date or self.start
+        first, mask = self._window(start_date, start_date + timedelta(days=nights))
+        width = _popcount(mask)
+        chart = {}
+        for number in (self._room_types if room_numbers is None else room_numbers):
+            sold = (self._sold[number] & mask) >> first
+            in_house = (self._in_house[number] & mask) >> first
+            row = ["."] * width
+            for i in _set_bits(sold):
+                row[i] = "R"
+            for i in _set_bits(in_house):
+                row[i] = "I"
+            chart[number] = "".join(row)
+        return chart
+
+
+def _set_bits(bits):
+    """Positions of the set bits, lowest first."""
+    text = bin(bits)[:1:-1]  # Least significant bit first, without the '0b'
+    return [i for i, bit in enumerate(text) if bit == "1"]
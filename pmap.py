@@ -0,0 +1,197 @@
+"""Persistent (immutable) hash map with structural sharing.
+
+PMap is a hash array mapped trie: set() and remove() return a new map that
+shares every untouched branch with the old one, so an update costs
+O(log32 n) time and memory instead of copying the whole collection.
+"""
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASH_MASK = (1 << 64) - 1
+
+
+def _hash(key):
+    return hash(key) & _HASH_MASK
+
+
+def _position(bitmap, bit):
+    return bin(bitmap & (bit - 1)).count("1")
+
+
+class _Leaf:
+    __slots__ = ("hash", "key", "value")
+
+    def __init__(self, key_hash, key, value):
+        self.hash = key_hash
+        self.key = key
+        self.value = value
+
+
+class _Collision:
+    """Several keys whose 64-bit hashes are identical."""
+    __slots__ = ("hash", "items")
+
+    def __init__(self, key_hash, items):
+        self.hash = key_hash
+        self.items = items  # tuple of (key, value)
+
+
+class _Branch:
+    __slots__ = ("bitmap", "children")
+
+    def __init__(self, bitmap, children):
+        self.bitmap = bitmap
+        self.children = children
+
+
+def _wrap(node, shift):
+    """A branch at `shift` holding a single leaf or collision node."""
+    return _Branch(1 << ((node.hash >> shift) & _MASK), (node,))
+
+
+def _set(node, shift, key_hash, key, value):
+    """Returns (new node, True if the key was added rather than replaced)."""
+    if node is None:
+        return _Leaf(key_hash, key, value), True
+
+    if isinstance(node, _Leaf):
+        if node.hash == key_hash:
+            if node.key == key:
+                return _Leaf(key_hash, key, value), False
+            return _Collision(key_hash, ((node.key, node.value), (key, value))), True
+        return _set(_wrap(node, shift), shift, key_hash, key, value)
+
+    if isinstance(node, _Collision):
+        if node.hash == key_hash:
+            for i, (existing, _) in enumerate(node.items):
+                if existing == key:
+                    return _Collision(key_hash, node.items[:i] + ((key, value),) + node.items[i + 1:]), False
+            return _Collision(key_hash, node.items + ((key, value),)), True
+        return _set(_wrap(node, shift), shift, key_hash, key, value)
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    i = _position(node.bitmap, bit)
+    if node.bitmap & bit:
+        child, added = _set(node.children[i], shift + _BITS, key_hash, key, value)
+        return _Branch(node.bitmap, node.children[:i] + (child,) + node.children[i + 1:]), added
+    leaf = _Leaf(key_hash, key, value)
+    return _Branch(node.bitmap | bit, node.children[:i] + (leaf,) + node.children[i:]), True
+
+
+def _remove(node, shift, key_hash, key):
+    """Returns the node without the key (None if it became empty); the same node if the key is absent."""
+    if isinstance(node, _Leaf):
+        return None if node.hash == key_hash and node.key == key else node
+
+    if isinstance(node, _Collision):
+        if node.hash != key_hash:
+            return node
+        items = tuple(item for item in node.items if item[0] != key)
+        if len(items) == len(node.items):
+            return node
+        if len(items) == 1:
+            return _Leaf(key_hash, *items[0])
+        return _Collision(key_hash, items)
+
+    bit = 1 << ((key_hash >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return node
+    i = _position(node.bitmap, bit)
+    child = _remove(node.children[i], shift + _BITS, key_hash, key)
+    if child is node.children[i]:
+        return node
+    if child is None:
+        if node.bitmap == bit:
+            return None
+        return _Branch(node.bitmap & ~bit, node.children[:i] + node.children[i + 1:])
+    return _Branch(node.bitmap, node.children[:i] + (child,) + node.children[i + 1:])
+
+
+def _items(node):
+    if node is None:
+        return
+    if isinstance(node, _Leaf):
+        yield node.key, node.value
+    elif isinstance(node, _Collision):
+        yield from node.items
+    else:
+        for child in node.children:
+            yield from _items(child)
+
+
+_MISSING = object()
+
+
+class PMap:
+    """Immutable mapping; set() and remove() return updated copies."""
+    __slots__ = ("_root", "_size")
+
+    def __init__(self, items=()):
+        self._root = None
+        self._size = 0
+        for key, value in (items.items() if hasattr(items, "items") else items):
+            self._root, added = _set(self._root, 0, _hash(key), key, value)
+            self._size += added
+
+    @classmethod
+    def _make(cls, root, size):
+        pmap = cls.__new__(cls)
+        pmap._root = root
+        pmap._size = size
+        return pmap
+
+    def get(self, key, default=None):
+        key_hash = _hash(key)
+        node, shift = self._root, 0
+        while node is not None:
+            if isinstance(node, _Leaf):
+                return node.value if node.hash == key_hash and node.key == key else default
+            if isinstance(node, _Collision):
+                if node.hash == key_hash:
+                    for existing, value in node.items:
+                        if existing == key:
+                            return value
+                return default
+            bit = 1 << ((key_hash >> shift) & _MASK)
+            if not node.bitmap & bit:
+                return default
+            node = node.children[_position(node.bitmap, bit)]
+            shift += _BITS
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return (key for key, _ in _items(self._root))
+
+    def keys(self):
+        return iter(self)
+
+    def values(self):
+        return (value for _, value in _items(self._root))
+
+    def items(self):
+        return _items(self._root)
+
+    def set(self, key, value):
+        root, added = _set(self._root, 0, _hash(key), key, value)
+        return PMap._make(root, self._size + added)
+
+    def remove(self, key):
+        root = _remove(self._root, 0, _hash(key), key) if self._root is not None else None
+        if root is self._root:
+            return self
+        return PMap._make(root, self._size - 1)
+
+    def __repr__(self):
+        return f"PMap({dict(self.items())!r})"
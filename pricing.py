@@ -0,0 +1,177 @@
+"""Exact room pricing: rate plans resolved night by night, in Decimal.
+
+A room's rack rate is rooms.price. A RatePlan adjusts it for each night:
+- a seasonal multiplier over recurring calendar ranges (the first matching
+  season wins);
+- a weekend multiplier;
+- a long-stay discount off the whole stay.
+
+Each nightly rate is rounded to the cent. A bill is the sum of its nightly
+rates less the discount, so quotes, folios and reports agree to the cent.
+
+Nightly rates are memoised per (room type, rack rate, year) as a running total
+over the year. Any stay then costs two lookups per calendar year it touches,
+however many nights it has. Room types without a plan are charged the rack
+rate every night and skip the calendar.
+
+Plans per room type are read from the JSON file named by HOTEL_RATE_PLANS:
+  {"Suite": {"weekend": "1.20",
+             "seasons": [{"name": "summer", "start": "06-15", "end": "09-01", "multiplier": "1.25"}],
+             "long_stay": [[7, "0.05"], [28, "0.15"]]}}
+Season ranges are month-day pairs with the end exclusive, and may wrap past
+New Year. long_stay lists [minimum nights, fraction off].
+"""
+import json
+import os
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+RATE_PLANS = os.environ.get('HOTEL_RATE_PLANS', '')
+
+CENT = Decimal('0.01')
+ONE = Decimal(1)
+
+
+def money(value):
+    """A price as Decimal to the cent; floats go through str so 99.99 stays 99.99."""
+    return Decimal(str(value)).quantize(CENT, ROUND_HALF_UP)
+
+
+# Recurring calendar range; start and end are (month, day), end exclusive
+Season = namedtuple("Season", ["name", "start", "end", "multiplier"])
+
+# A priced stay: nights, sum of nightly rates, long-stay discount, amount due
+Quote = namedtuple("Quote", ["nights", "subtotal", "discount", "total"])
+
+
+def _month_day(text):
+    month, day = text.split("-")
+    return int(month), int(day)
+
+
+class RatePlan:
+    """Seasonal and weekend multipliers on the rack rate, plus long-stay discounts."""
+
+    def __init__(self, seasons=(), weekend=ONE, weekend_days=(4, 5), long_stay=()):
+        self.seasons = tuple(seasons)
+        self.weekend = Decimal(weekend)
+        self.weekend_days = frozenset(weekend_days)  # date.weekday() values; Friday and Saturday nights
+        self.long_stay = tuple(sorted((int(nights), Decimal(off)) for nights, off in long_stay))
+
+    @classmethod
+    def from_json(cls, spec):
+        seasons = [Season(season.get("name", ""), _month_day(season["start"]), _month_day(season["end"]),
+                          Decimal(str(season["multiplier"])))
+                   for season in spec.get("seasons", ())]
+        return cls(seasons, Decimal(str(spec.get("weekend", 1))), spec.get("weekend_days", (4, 5)),
+                   [(nights, str(off)) for nights, off in spec.get("long_stay", ())])
+
+    def multiplier(self, day):
+        """Factor applied to the rack rate for the night starting on `day`."""
+        factor = ONE
+        month_day = (day.month, day.day)
+        for season in self.seasons:
+            if season.start <= season.end:
+                in_season = season.start <= month_day < season.end
+            else:  # Wraps past New Year
+                in_season = month_day >= season.start or month_day < season.end
+            if in_season:
+                factor = season.multiplier
+                break
+        if day.weekday() in self.weekend_days:
+            factor *= self.weekend
+        return factor
+
+    def discount(self, nights):
+        """Fraction off for a stay of this many nights: the largest threshold it reaches."""
+        off = Decimal(0)
+        for minimum, fraction in self.long_stay:
+            if nights >= minimum:
+                off = fraction
+        return off
+
+
+class PricingEngine:
+    """Quotes stays from per-room-type rate plans, memoising each year's nightly rates."""
+
+    def __init__(self, plans=None):
+        self.plans = dict(plans or {})  # room type -> RatePlan
+        self._calendars = {}            # (room type, rate, year) -> running totals of nightly rates
+
+    def nightly_rate(self, room_type, price, day):
+        rate = money(price)
+        plan = self.plans.get(room_type)
+        return rate if plan is None else (rate * plan.multiplier(day)).quantize(CENT, ROUND_HALF_UP)
+
+    def nightly_rates(self, room_type, price, start_date, end_date):
+        """[(night, rate)] for a folio; quote() gives the same subtotal without the loop."""
+        return [(start_date + timedelta(days=n), self.nightly_rate(room_type, price, start_date + timedelta(days=n)))
+                for n in range((end_date - start_date).days)]
+
+    def _calendar(self, room_type, rate, year):
+        key = (room_type, rate, year)
+        calendar = self._calendars.get(key)
+        if calendar is None:
+            plan = self.plans[room_type]
+            first = date(year, 1, 1).toordinal()
+            total = Decimal(0)
+            calendar = [total]
+            for ordinal in range(first, date(year + 1, 1, 1).toordinal()):
+                total += (rate * plan.multiplier(date.fromordinal(ordinal))).quantize(CENT, ROUND_HALF_UP)
+                calendar.append(total)
+            self._calendars[key] = calendar
+        return calendar
+
+    def nights_total(self, room_type, price, start_date, end_date):
+        """Sum of the nightly rates for the nights in [start_date, end_date), before discounts."""
+        rate = money(price)
+        if start_date >= end_date:
+            return Decimal(0)
+        if room_type not in self.plans:
+            return rate * (end_date - start_date).days
+        total = Decimal(0)
+        for year in range(start_date.year, end_date.year + 1):
+            first, following = date(year, 1, 1).toordinal(), date(year + 1, 1, 1).toordinal()
+            start = max(start_date.toordinal(), first) - first
+            end = min(end_date.toordinal(), following) - first
+            if start < end:
+                calendar = self._calendar(room_type, rate, year)
+                total += calendar[end] - calendar[start]
+        return total
+
+    def quote(self, room_type, price, start_date, end_date):
+        nights = max(0, (end_date - start_date).days)
+        subtotal = self.nights_total(room_type, price, start_date, end_date)
+        plan = self.plans.get(room_type)
+        discount = (subtotal * plan.discount(nights)).quantize(CENT, ROUND_HALF_UP) if plan else Decimal(0)
+        return Quote(nights, subtotal, discount, subtotal - discount)
+
+
+def load_plans(path):
+    """{room type: RatePlan} from a JSON file in the format above."""
+    with open(path) as f:
+        return {room_type: RatePlan.from_json(spec) for room_type, spec in json.load(f).items()}
+
+
+_engine = None
+
+
+def configure(plans=None):
+    """Replaces the shared engine; plans maps room type -> RatePlan (None reads HOTEL_RATE_PLANS)."""
+    global _engine
+    if plans is None:
+        plans = load_plans(RATE_PLANS) if RATE_PLANS else {}
+    _engine = PricingEngine(plans)
+    return _engine
+
+
+def get_engine():
+    if _engine is None:
+        configure()
+    return _engine
+
+
+def quote(room_type, price, start_date, end_date):
+    """Prices a stay with the shared engine."""
+    return get_engine().quote(room_type, price, start_date, end_date)
@@ -0,0 +1,276 @@
+"""Occupancy and revenue report over a date window, computed in parallel shards.
+
+Usage: python reports.py START END [--workers N] [--room-shards N] [--check] [--archive PATH]
+       (dates as YYYY-MM-DD, END exclusive)
+
+The rooms are cut into ranges of room numbers. Each range is a shard: one
+filtered query that a worker process runs on its own database connection,
+folding the stays it reads into partial ReportTotals by calendar month; the
+parent merges the partials as they come back. Shards share nothing and every
+reservation is read once, so the work spreads across cores as history grows.
+(Cutting shards by month as well would make every month's query walk each
+room's later stays too: the overlap index leads with room_number, end_date.)
+
+Money is counted in integer cents, so partial sums merge exactly in any order.
+Nights are priced under the rate plans in pricing.py (workers get the parent's
+plans), and the billed totals match summing Billing.generate_bill over the same
+stays (--check does that serially and compares). A stay's nights are split
+across the months they fall in; its bill, long-stay discount included, counts
+once, in the month it starts.
+
+Databases that live inside this process (the memory backend, SQLite
+':memory:') cannot be opened by workers, so their shards run in-process.
+With --archive the shards read an archive file (see archive.py) instead of
+the database: each worker maps the file once and bisects to its room range,
+and the workers share the mapped pages.
+"""
+import argparse
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from decimal import Decimal
+from itertools import chain
+
+import mydb
+import pricing
+from archive import Archive
+from aggregates import status_of
+
+
+def cents(price):
+    """A price as integer cents, exactly (prices are DECIMAL(10, 2) in the schema)."""
+    return int((Decimal(str(price)) * 100).to_integral_value())
+
+
+def _date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value))
+
+
+class ReportTotals:
+    """Partial or merged report figures; money in cents."""
+
+    def __init__(self):
+        self.nights_by_month = Counter()       # (year, month) -> room nights sold
+        self.revenue_by_month = Counter()      # (year, month) -> nightly revenue
+        self.revenue_by_room_type = Counter()  # room type -> nightly revenue inside the window
+        self.stays_by_status = Counter()       # status -> stays starting in the window
+        self.bills_by_status = Counter()       # status -> whole-stay bills of those stays
+
+    def add_stay(self, room, row, first, last):
+        """Folds one reservation row into the totals for the window [first, last).
+
+        room is (room_type, rack rate as Decimal) for the row's room.
+        """
+        engine = pricing.get_engine()
+        room_type, price = room
+        start, end = _date(row[2]), _date(row[3])
+        night, stop = max(start, first), min(end, last)
+        while night < stop:
+            following = min(_next_month(night), stop)
+            revenue = cents(engine.nights_total(room_type, price, night, following))
+            self.nights_by_month[night.year, night.month] += (following - night).days
+            self.revenue_by_month[night.year, night.month] += revenue
+            self.revenue_by_room_type[room_type] += revenue
+            night = following
+        if first <= start < last:
+            status = status_of(row[4], row[5])
+            self.stays_by_status[status] += 1
+            self.bills_by_status[status] += cents(engine.quote(room_type, price, start, end).total)
+
+    def merge(self, other):
+        for field, counts in vars(other).items():
+            getattr(self, field).update(counts)
+        return self
+
+    def __eq__(self, other):
+        return isinstance(other, ReportTotals) and vars(self) == vars(other)
+
+
+# ============================================================
+# Sharding
+# ============================================================
+
+def _next_month(day):
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def months(start_date, end_date):
+    """[first, last) windows, one per calendar month overlapping [start_date, end_date)."""
+    windows = []
+    first = start_date
+    while first < end_date:
+        following = _next_month(first)
+        windows.append((first, min(following, end_date)))
+        first = following
+    return windows
+
+
+def room_ranges(room_numbers, count):
+    """Up to `count` [low, high) ranges of room numbers with about the same number of rooms each."""
+    numbers = sorted(room_numbers)
+    if not numbers:
+        return []
+    count = max(1, min(count, len(numbers)))
+    bounds = [numbers[len(numbers) * i // count] for i in range(count)] + [numbers[-1] + 1]
+    return [(low, high) for low, high in zip(bounds, bounds[1:]) if low < high]
+
+
+def shards(room_numbers, start_date, end_date, room_shards):
+    return [(low, high, start_date, end_date) for low, high in room_ranges(room_numbers, room_shards)]
+
+
+# ---------------- worker side ----------------
+
+_rooms = {}      # room number -> (room_type, rack rate); set per worker process
+_archive = None  # Archive the shards read, when the report runs from one
+
+
+def _init_worker(settings, rooms, plans=None, archive_path=None):
+    global _rooms, _archive
+    _rooms = rooms
+    if plans is not None:
+        pricing.configure(plans)
+    if _archive is not None:
+        _archive.close()
+    _archive = Archive(archive_path) if archive_path else None
+    if settings is not None:
+        name, options = settings
+        mydb.configure(name, write_behind=False, instrument=False, **options)
+
+
+def shard_totals(shard):
+    """Totals for the stays of rooms [low, high) overlapping the window [first, last)."""
+    low, high, first, last = shard
+    filters = [("room_number", ">=", low), ("room_number", "<", high),
+               ("start_date", "<", last), ("end_date", ">", first)]
+    totals = ReportTotals()
+    if _archive is not None:
+        rows = _archive.reservation_rows(low, high, first, last)
+    else:
+        rows = mydb.iter_rows("reservations", filters)
+    for row in rows:
+        room = _rooms.get(int(row[1]))
+        if room is not None:
+            totals.add_stay(room, row, first, last)
+    return totals
+
+
+# ============================================================
+# Report
+# ============================================================
+
+def load_rooms(archive_path=None):
+    if archive_path:
+        with Archive(archive_path) as snapshot:
+            rows = list(snapshot.room_rows())
+    else:
+        rows = mydb.iter_rows("rooms")
+    return {int(row[0]): (str(row[1]), pricing.money(row[2])) for row in rows}
+
+
+def generate(start_date, end_date, workers=None, room_shards=None, archive_path=None):
+    """Computes the report totals for [start_date, end_date); returns (totals, rooms).
+
+    workers=1 runs every shard in this process; otherwise a process pool of
+    `workers` (default: one per core) runs them. archive_path reads the stays
+    from an archive file instead of the database.
+    """
+    rooms = load_rooms(archive_path)
+    workers = workers or multiprocessing.cpu_count()
+    # A few shards per worker keeps the pool busy when ranges differ in load
+    work = shards(rooms, start_date, end_date, room_shards or 4 * workers)
+    settings = None if archive_path else mydb.backend_settings()
+    totals = ReportTotals()
+    if workers == 1 or (settings is None and not archive_path):
+        _init_worker(None, rooms, archive_path=archive_path)
+        try:
+            for shard in work:
+                totals.merge(shard_totals(shard))
+        finally:
+            _init_worker(None, {})  # Unmaps the archive
+        return totals, rooms
+    # spawn, not fork: workers must not inherit the parent's connections or writer threads
+    mydb.flush()
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+                             initargs=(settings, rooms, pricing.get_engine().plans, archive_path)) as pool:
+        for partial in pool.map(shard_totals, work):
+            totals.merge(partial)
+    return totals, rooms
+
+
+def billed_totals(reservations, start_date, end_date):
+    """(stays, bills in cents) by status from Billing.generate_bill, for stays starting in the window."""
+    from imperative import Billing
+
+    stays, bills = Counter(), Counter()
+    for reservation in reservations:
+        if start_date <= reservation.start_date < end_date:
+            status = status_of(reservation.checked_in, reservation.checked_out)
+            stays[status] += 1
+            bills[status] += cents(Billing.generate_bill(reservation))
+    return stays, bills
+
+
+def check(totals, start_date, end_date):
+    """Compares the sharded totals with a serial Billing.generate_bill pass; returns the mismatches."""
+    import contextlib
+    import io
+    from imperative import HotelManagementSystem
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        hotel_system = HotelManagementSystem()
+    stays, bills = billed_totals(chain(hotel_system.reservations, hotel_system.history()), start_date, end_date)
+    mismatches = []
+    for field, serial, sharded in (("stays", stays, totals.stays_by_status), ("bills", bills, totals.bills_by_status)):
+        for status in set(serial) | set(sharded):
+            if serial[status] != sharded[status]:
+                mismatches.append((f"{field}[{status}]", sharded[status], serial[status]))
+    return mismatches
+
+
+def _dollars(amount):
+    return Decimal(amount) / 100
+
+
+def print_report(totals, rooms, start_date, end_date):
+    print(f"{'month':<10} {'nights':>9} {'occupancy':>10} {'revenue':>15}")
+    for first, last in months(start_date, end_date):
+        month = (first.year, first.month)
+        nights = totals.nights_by_month[month]
+        available = len(rooms) * (last - first).days
+        print(f"{first:%Y-%m}    {nights:>9} {nights / available if available else 0:>10.1%} "
+              f"{_dollars(totals.revenue_by_month[month]):>15,.2f}")
+    sold, revenue = sum(totals.nights_by_month.values()), sum(totals.revenue_by_month.values())
+    available = len(rooms) * (end_date - start_date).days
+    print(f"Rooms: {len(rooms)}, Room nights sold: {sold}, "
+          f"Occupancy: {sold / available if available else 0:.1%}, Revenue: ${_dollars(revenue):,.2f}")
+    for room_type, amount in sorted(totals.revenue_by_room_type.items()):
+        print(f"  {room_type}: ${_dollars(amount):,.2f}")
+    print("Stays starting in the window, billed:")
+    for status, count in sorted(totals.stays_by_status.items()):
+        print(f"  {status}: {count} stays, ${_dollars(totals.bills_by_status[status]):,.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded occupancy and revenue report.")
+    parser.add_argument("start", type=date.fromisoformat)
+    parser.add_argument("end", type=date.fromisoformat, help="exclusive")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core; 1 runs in-process)")
+    parser.add_argument("--room-shards", type=int, help="room ranges to split the work into (default: 4 per worker)")
+    parser.add_argument("--check", action="store_true", help="compare the bills with a serial Billing.generate_bill pass")
+    parser.add_argument("--archive", metavar="PATH",
+                        help="read the stays from an archive file (python archive.py PATH) instead of the database")
+    args = parser.parse_args()
+
+    totals, rooms = generate(args.start, args.end, args.workers, args.room_shards, args.archive)
+    print_report(totals, rooms, args.start, args.end)
+    if args.check:
+        mismatches = check(totals, args.start, args.end)
+        print(f"Check against Billing.generate_bill: {len(mismatches) or 'no'} mismatches")
+        for field, sharded, serial in mismatches:
+            print(f"  {field}: sharded {sharded}, serial {serial}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+from bisect import bisect_left, bisect_right, insort
+
+from aggregates import CHECKED_IN, CHECKED_OUT, RESERVED, status_of
+from store import ReservationStore
+
+
+def reservation_status(reservation):
+    return status_of(reservation.checked_in, reservation.checked_out)
+
+
+# Indexed in-memory store for the objects of imperative.HotelManagementSystem
+class HotelRepository:
+    def __init__(self, keep_history=False):
+        self.rooms = {}          # room_number -> Room
+        self.customers = {}      # name -> Customer
+        self.reservations = {}   # (customer_name, room_number, start_date) -> Reservation
+        # Checked-out stays not loaded as objects, as compact rows; None leaves them in the database
+        self.history = ReservationStore() if keep_history else None
+
+        # Secondary indexes
+        self._by_pair = {}       # (customer_name, room_number) -> [Reservation] ordered by start date
+        self._by_date = {}       # start_date -> [Reservation]
+        self._dates = []         # sorted distinct start dates, for range queries
+        self._by_status = {RESERVED: {}, CHECKED_IN: {}, CHECKED_OUT: {}}  # status -> {key: Reservation}
+        self._status = {}        # key -> status currently indexed
+
+    @staticmethod
+    def key(reservation):
+        return (reservation.customer.name, reservation.room.room_number, reservation.start_date)
+
+    # ---------------- rooms and customers ----------------
+
+    def add_room(self, room):
+        self.rooms[room.room_number] = room
+
+    def get_room(self, room_number):
+        return self.rooms.get(room_number)
+
+    def add_customer(self, customer):
+        self.customers[customer.name] = customer
+
+    def get_customer(self, name):
+        return self.customers.get(name)
+
+    # ---------------- reservations ----------------
+
+    def add_reservation(self, reservation):
+        key = self.key(reservation)
+        self.reservations[key] = reservation
+
+        pair = self._by_pair.setdefault(key[:2], [])
+        pair.append(reservation)
+        if len(pair) > 1 and pair[-2].start_date > reservation.start_date:
+            pair.sort(key=lambda r: r.start_date)
+
+        if reservation.start_date not in self._by_date:
+            self._by_date[reservation.start_date] = []
+            insort(self._dates, reservation.start_date)
+        self._by_date[reservation.start_date].append(reservation)
+
+        status = reservation_status(reservation)
+        self._by_status[status][key] = reservation
+        self._status[key] = status
+
+    def refresh_status(self, reservation):
+        """Moves a reservation to the right status bucket after check-in/out."""
+        key = self.key(reservation)
+        status = reservation_status(reservation)
+        previous = self._status.get(key)
+        if previous != status:
+            if previous is not None:
+                del self._by_status[previous][key]
+            self._by_status[status][key] = reservation
+            self._status[key] = status
+
+    def get_reservation(self, customer_name, room_number, start_date):
+        return self.reservations.get((customer_name, room_number, start_date))
+
+    def find_reservation(self, customer_name, room_number, checked_in=None, checked_out=None):
+        """First reservation for this customer and room, optionally filtered by check-in/out state."""
+        for reservation in self._by_pair.get((customer_name, room_number), ()):
+            if ((checked_in is None or reservation.checked_in == checked_in)
+                    and (checked_out is None or reservation.checked_out == checked_out)):
+                return reservation
+        return None
+
+    def reservations_with_status(self, status):
+        return list(self._by_status[status].values())
+
+    def reservations_starting(self, start, end=None):
+        """Reservations whose start date falls in [start, end] (just `start` when end is None)."""
+        if end is None:
+            return list(self._by_date.get(start, ()))
+        found = []
+        for day in self._dates[bisect_left(self._dates, start):bisect_right(self._dates, end)]:
+            found.extend(self._by_date[day])
+        return found
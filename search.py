@@ -0,0 +1,240 @@
+"""Customer search: exact, typeahead and fuzzy lookups by name and contact info.
+
+Names and contact info are normalised to lowercase words ("Ann-Marie O'Neil"
+-> "ann marie o neil"). Three indexes sit side by side:
+
+- exact: a dict from the normalised name to the customer, so case and
+  punctuation do not matter;
+- prefix: sorted arrays of normalised names and contact info, searched with
+  bisect for typeahead;
+- fuzzy: every distinct word is indexed by its first letter and trigrams
+  (" sm", "smi", ...), and each word lists the customers that use it. A
+  query word is matched to the vocabulary words with the same first letter
+  whose trigram sets are similar enough (Dice coefficient >= FUZZY_MIN),
+  then customers are scored by how well their words cover all the query
+  words. Typos in the first letter are rare and keying on it cuts the
+  posting lists about twentyfold.
+
+Short words lose most of their trigrams to a single typo ("jonh" and "john"
+share one of four), so every word is also indexed under itself and each way
+of deleting one letter. Two words one edit apart (insertion, deletion,
+substitution or swapped neighbours) share one of those keys, which finds
+them in a few dict lookups whatever the first letter; they score
+1 - 1 / length.
+
+Fuzzy candidates are drawn from the query word with the fewest customers and
+scored against the others, so work depends on how selective the query is,
+not on the number of customers. Customer ids are positions in `names`;
+postings are typed arrays, about 4 bytes per (word, customer) pair.
+"""
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+FUZZY_MIN = 0.5         # Dice similarity a word needs to count as a match for a query word
+MAX_CANDIDATES = 2000   # customers scored per fuzzy query, at most
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def words(text):
+    return _WORD.findall(str(text).lower())
+
+
+def normalize(text):
+    return " ".join(words(text))
+
+
+def trigrams(word):
+    padded = f" {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletions(word):
+    """The word and every string made by deleting one of its letters."""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def edit_distance(a, b, limit):
+    """Edits (insert, delete, substitute, swap neighbours) turning a into b; limit + 1 once past limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Only the differing middle needs the table
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), limit + 1)
+    previous, row = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and cost and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit and min(previous) > limit:  # A swap can still reach back one row
+            return limit + 1
+    return min(row[-1], limit + 1)
+
+
+class CustomerIndex:
+    """Exact, prefix and fuzzy lookups over customers' names and contact info."""
+
+    def __init__(self):
+        self.names = []                 # customer id -> name
+        self._ids = {}                  # normalised name -> customer id
+        self._prefixes = {"name": ([], array('i')), "contact_info": ([], array('i'))}  # sorted keys, customer ids
+        self._vocabulary = {}           # word -> word id
+        self._words = []                # word id -> word
+        self._gram_counts = array('i')  # word id -> number of distinct trigrams
+        self._postings = []             # word id -> array of customer ids
+        self._grams = {}                # first letter + trigram -> array of word ids
+        self._deletions = {}            # word or word less one letter -> [word id]
+        self._customer_words = array('i')    # word ids of every customer, back to back
+        self._offsets = array('i', [0])      # customer id -> start of its words; one past the end last
+
+    @classmethod
+    def from_customers(cls, customers):
+        """Builds an index from (name, contact_info) pairs, sorting the prefix arrays once."""
+        index = cls()
+        entries = {field: [] for field in index._prefixes}
+        for name, contact_info in customers:
+            customer_id = index._add(name, contact_info)
+            if customer_id is not None:
+                entries["name"].append((normalize(name), customer_id))
+                entries["contact_info"].append((normalize(contact_info), customer_id))
+        for field, pairs in entries.items():
+            pairs.sort()
+            index._prefixes[field] = ([key for key, _ in pairs], array('i', [i for _, i in pairs]))
+        return index
+
+    def add(self, name, contact_info=""):
+        customer_id = self._add(name, contact_info)
+        if customer_id is not None:
+            for field, value in (("name", name), ("contact_info", contact_info)):
+                keys, ids = self._prefixes[field]
+                key = normalize(value)
+                i = bisect_left(keys, key)
+                keys.insert(i, key)
+                ids.insert(i, customer_id)
+
+    def _add(self, name, contact_info):
+        key = normalize(name)
+        if key in self._ids:
+            return None
+        customer_id = len(self.names)
+        self.names.append(name)
+        self._ids[key] = customer_id
+        for word in set(words(name)) | set(words(contact_info)):
+            word_id = self._vocabulary.get(word)
+            if word_id is None:
+                word_id = self._vocabulary[word] = len(self._words)
+                self._words.append(word)
+                self._postings.append(array('i'))
+                grams = trigrams(word)
+                self._gram_counts.append(len(grams))
+                for gram in grams:
+                    key = word[0] + gram
+                    ids = self._grams.get(key)
+                    if ids is None:
+                        ids = self._grams[key] = array('i')
+                    ids.append(word_id)
+                for key in deletions(word):
+                    self._deletions.setdefault(key, []).append(word_id)
+            self._postings[word_id].append(customer_id)
+            self._customer_words.append(word_id)
+        self._offsets.append(len(self._customer_words))
+        return customer_id
+
+    def __len__(self):
+        return len(self.names)
+
+    # ---------------- lookups ----------------
+
+    def exact(self, name):
+        """The customer name matching `name` up to case and punctuation, or None."""
+        customer_id = self._ids.get(normalize(name))
+        return None if customer_id is None else self.names[customer_id]
+
+    def prefix(self, text, k=10, field="name"):
+        """Up to k names whose `field` (name or contact_info) starts with `text`, in sorted order."""
+        key = normalize(text)
+        if not key:
+            return []
+        keys, ids = self._prefixes[field]
+        found = []
+        for i in range(bisect_left(keys, key), len(keys)):
+            if len(found) == k or not keys[i].startswith(key):
+                break
+            found.append(self.names[ids[i]])
+        return found
+
+    def _similar_words(self, word):
+        """{word id: similarity} for vocabulary words whose trigrams are close to `word`'s."""
+        grams = trigrams(word)
+        overlaps = Counter()
+        for gram in grams:
+            ids = self._grams.get(word[0] + gram)
+            if ids is not None:
+                overlaps.update(ids)
+        size, counts, vocabulary = len(grams), self._gram_counts, self._words
+        # Dice >= FUZZY_MIN needs at least this overlap, whatever the other word's size
+        need = FUZZY_MIN * size / (2 - FUZZY_MIN)
+        similar = {}
+        for word_id in [word_id for word_id, overlap in overlaps.items() if overlap >= need]:
+            similarity = 2 * overlaps[word_id] / (size + counts[word_id])
+            if similarity >= FUZZY_MIN:
+                similar[word_id] = similarity
+        # Words one edit away; sharing a deletion can also mean two edits, so check
+        nearby = set()
+        for key in deletions(word):
+            nearby.update(self._deletions.get(key, ()))
+        for word_id in nearby:
+            other = vocabulary[word_id]
+            if edit_distance(word, other, 1) <= 1:
+                similarity = 1.0 if other == word else 1 - 1 / max(len(word), len(other))
+                if similarity > similar.get(word_id, 0.0):
+                    similar[word_id] = similarity
+        return similar
+
+    def fuzzy(self, text, k=10):
+        """Up to k (score, name) pairs, best first; score is the mean best similarity per query word."""
+        query = list(dict.fromkeys(words(text)))
+        # Query words with no similar word at all still count in the mean, as 0
+        matches = [similar for similar in map(self._similar_words, query) if similar]
+        if not matches:
+            return []
+        postings = self._postings
+        # Seed from the most selective query word, its closest words first
+        matches.sort(key=lambda similar: sum(len(postings[word_id]) for word_id in similar))
+        candidates = set()
+        for word_id in sorted(matches[0], key=matches[0].get, reverse=True):
+            candidates.update(postings[word_id])
+            if len(candidates) >= MAX_CANDIDATES:
+                break
+        customer_words, offsets = self._customer_words, self._offsets
+        scored = []
+        for customer_id in candidates:
+            own = customer_words[offsets[customer_id]:offsets[customer_id + 1]]
+            score = 0.0
+            for similar in matches:
+                score += max([similar.get(word_id, 0.0) for word_id in own])
+            scored.append((score / len(query), self.names[customer_id]))
+        return heapq.nsmallest(k, scored, key=lambda match: (-match[0], match[1]))
+
+    def search(self, text, k=10):
+        """Up to k names for a search box: the exact match, then prefix matches, then fuzzy ones."""
+        found = dict.fromkeys(filter(None, [self.exact(text)]))
+        for field in self._prefixes:
+            if len(found) < k:
+                found.update(dict.fromkeys(self.prefix(text, k, field)))
+        if len(found) < k:
+            found.update(dict.fromkeys(name for _, name in self.fuzzy(text, k)))
+        return list(found)[:k]
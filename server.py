@@ -0,0 +1,379 @@
+"""HTTP/JSON API for the hotel system, served by asyncio.
+
+Usage: python server.py [--host HOST] [--port PORT]
+
+Endpoints (request and response bodies are JSON; dates are YYYY-MM-DD):
+  GET  /rooms                        all rooms
+  GET  /rooms?type=T&start=D&end=D   rooms of type T free for [start, end)
+  GET  /rooms/NUMBER
+  POST /rooms                        {"room_number", "room_type", "price"}
+  GET  /customers
+  GET  /customers?q=TEXT[&limit=N]   search: exact, then name/contact prefix, then fuzzy name matches
+  GET  /customers/NAME
+  POST /customers                    {"name", "contact_info", "payment_method"}
+  GET  /reservations[?status=S]      loaded reservations (reserved, checked_in, checked_out)
+  POST /reservations                 {"customer_name", "room_number", "start_date", "end_date"}
+                                     ("room_type" instead of "room_number" assigns a room)
+  POST /check-in                     {"customer_name", "room_number"}
+  POST /check-out                    {"customer_name", "room_number"}; returns the bill
+  GET  /report
+  GET  /cache                        read-through cache hit/miss/eviction counters
+  GET  /metrics                      Prometheus text (query and operation latency; needs HOTEL_METRICS=1)
+
+The event loop only parses HTTP and holds connections open, so one process
+serves hundreds of keep-alive clients. Every request runs the same business
+logic as imperative.py on a single worker thread: the blocking mydb calls stay
+off the loop, and the in-memory indexes see one request at a time.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import metrics
+import mydb
+from aggregates import CHECKED_IN, CHECKED_OUT, RESERVED
+from imperative import Billing, HotelManagementSystem
+from repository import reservation_status
+
+STATUSES = (RESERVED, CHECKED_IN, CHECKED_OUT)
+
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """Raised by a handler to answer with an error status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ============================================================
+# JSON conversion
+# ============================================================
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def room_json(room):
+    return {"room_number": room.room_number, "room_type": room.room_type,
+            "price": room.price, "available": room.available}
+
+
+def customer_json(customer):
+    return {"name": customer.name, "contact_info": customer.contact_info,
+            "payment_method": customer.payment_method}
+
+
+def reservation_json(reservation):
+    return {"customer_name": reservation.customer.name, "room_number": reservation.room.room_number,
+            "start_date": reservation.start_date, "end_date": reservation.end_date,
+            "status": reservation_status(reservation)}
+
+
+# Read a required field from a request body or query string
+def _field(data, name, convert=str):
+    if data.get(name) in (None, ""):
+        raise HTTPError(400, f"Missing {name}")
+    try:
+        return convert(data[name])
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"Invalid {name}: {data[name]!r}")
+
+
+def _date(value):
+    return date.fromisoformat(str(value))
+
+
+# ============================================================
+# Service
+# ============================================================
+
+# (method, path pattern, handler name); path groups are passed to the handler
+ROUTES = [
+    ("GET", re.compile(r"/rooms"), "list_rooms"),
+    ("POST", re.compile(r"/rooms"), "add_room"),
+    ("GET", re.compile(r"/rooms/(\d+)"), "get_room"),
+    ("GET", re.compile(r"/customers"), "list_customers"),
+    ("POST", re.compile(r"/customers"), "add_customer"),
+    ("GET", re.compile(r"/customers/([^/]+)"), "get_customer"),
+    ("GET", re.compile(r"/reservations"), "list_reservations"),
+    ("POST", re.compile(r"/reservations"), "make_reservation"),
+    ("POST", re.compile(r"/check-in"), "check_in"),
+    ("POST", re.compile(r"/check-out"), "check_out"),
+    ("GET", re.compile(r"/report"), "report"),
+    ("GET", re.compile(r"/cache"), "cache"),
+    ("GET", re.compile(r"/metrics"), "metrics"),
+]
+
+
+class HotelService:
+    """Routes HTTP requests to a HotelManagementSystem owned by one worker thread."""
+
+    def __init__(self):
+        self.hotel_system = None  # Loaded on the worker by start()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="hotel")
+
+    async def start(self):
+        self.hotel_system = await self._call(HotelManagementSystem)
+
+    def close(self):
+        self._executor.shutdown()
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    # ---------------- handlers: run on the worker, return (status, payload) ----------------
+
+    def list_rooms(self, query, body):
+        if "type" in query:
+            start_date, end_date = _field(query, "start", _date), _field(query, "end", _date)
+            rooms = self.hotel_system.find_available(query["type"], start_date, end_date)
+        else:
+            rooms = self.hotel_system.rooms
+        return 200, [room_json(room) for room in rooms]
+
+    def get_room(self, query, body, room_number):
+        room = self.hotel_system.find_room(int(room_number))
+        if room is None:
+            raise HTTPError(404, f"No room {room_number}")
+        return 200, room_json(room)
+
+    def add_room(self, query, body):
+        room_number = _field(body, "room_number", int)
+        room_type = _field(body, "room_type")
+        price = _field(body, "price", float)
+        if self.hotel_system.find_room(room_number):
+            raise HTTPError(409, f"Room {room_number} already exists")
+        self.hotel_system.add_room(room_number, room_type, price)
+        return 201, room_json(self.hotel_system.repository.get_room(room_number))
+
+    def list_customers(self, query, body):
+        if "q" in query:
+            limit = _field(query, "limit", int) if "limit" in query else 10
+            customers = self.hotel_system.search_customers(query["q"], limit)
+        else:
+            customers = self.hotel_system.customers
+        return 200, [customer_json(customer) for customer in customers]
+
+    def get_customer(self, query, body, name):
+        customer = self.hotel_system.find_customer(name)
+        if customer is None:
+            raise HTTPError(404, f"No customer {name}")
+        return 200, customer_json(customer)
+
+    def add_customer(self, query, body):
+        name = _field(body, "name")
+        if self.hotel_system.find_customer(name):
+            raise HTTPError(409, f"Customer {name} already exists")
+        customer = self.hotel_system.add_customer(name, body.get("contact_info", ""), body.get("payment_method", ""))
+        return 201, customer_json(customer)
+
+    def list_reservations(self, query, body):
+        if "status" in query:
+            status = _field(query, "status")
+            if status not in STATUSES:
+                raise HTTPError(400, f"Invalid status: {status!r} (expected one of {', '.join(STATUSES)})")
+            reservations = self.hotel_system.repository.reservations_with_status(status)
+        else:
+            reservations = self.hotel_system.reservations
+        return 200, [reservation_json(res) for res in reservations]
+
+    def make_reservation(self, query, body):
+        customer_name = _field(body, "customer_name")
+        start_date, end_date = _field(body, "start_date", _date), _field(body, "end_date", _date)
+        customer = self.hotel_system.find_customer(customer_name)
+        if body.get("room_number") in (None, "") and body.get("room_type"):
+            room_type = _field(body, "room_type")
+            if customer is None:
+                raise HTTPError(404, "Invalid customer")
+            if end_date <= start_date:
+                raise HTTPError(400, "End date must be after start date")
+            reservation = self.hotel_system.assign_room(customer, room_type, start_date, end_date)
+            if reservation is None:
+                raise HTTPError(409, f"No {room_type} room is available from {start_date} to {end_date}")
+            return 201, reservation_json(reservation)
+        room_number = _field(body, "room_number", int)
+        room = self.hotel_system.find_room(room_number)
+        if customer is None or room is None:
+            raise HTTPError(404, "Invalid customer or room")
+        if end_date <= start_date:
+            raise HTTPError(400, "End date must be after start date")
+        reservation = self.hotel_system.make_reservation(customer, room, start_date, end_date)
+        if reservation is None:
+            raise HTTPError(409, f"Room {room_number} is not available from {start_date} to {end_date}")
+        return 201, reservation_json(reservation)
+
+    def check_in(self, query, body):
+        customer_name, room_number = _field(body, "customer_name"), _field(body, "room_number", int)
+        reservation = self.hotel_system.repository.find_reservation(customer_name, room_number,
+                                                                    checked_in=False, checked_out=False)
+        if reservation is None:
+            raise HTTPError(404, "No valid reservation found for this customer and room")
+        self.hotel_system.check_in(reservation)
+        return 200, reservation_json(reservation)
+
+    def check_out(self, query, body):
+        customer_name, room_number = _field(body, "customer_name"), _field(body, "room_number", int)
+        reservation = self.hotel_system.repository.find_reservation(customer_name, room_number, checked_in=True)
+        if reservation is None:
+            raise HTTPError(404, "No valid check-in found for this customer and room")
+        self.hotel_system.check_out(reservation)
+        return 200, {**reservation_json(reservation), "bill": Billing.generate_bill(reservation)}
+
+    def report(self, query, body):
+        self.hotel_system.generate_report()
+        aggregates = self.hotel_system.aggregates
+        return 200, {
+            "total_rooms": aggregates.total_rooms,
+            "occupied_rooms": aggregates.occupied_rooms,
+            "total_revenue": aggregates.revenue(),
+            "revenue_by_status": dict(aggregates.revenue_by_status),
+            "revenue_by_room_type": dict(aggregates.revenue_by_room_type),
+        }
+
+    def cache(self, query, body):
+        return 200, mydb.cache_stats()
+
+    # Plain text rather than JSON, for a Prometheus scrape
+    def metrics(self, query, body):
+        return 200, metrics.render()
+
+    # ---------------- dispatch ----------------
+
+    def _handle(self, name, args, query, body):
+        """Runs a handler on the worker; the console messages the business logic prints become "message"."""
+        out = io.StringIO()
+        try:
+            # Only the worker thread prints, so swapping stdout here is safe
+            with contextlib.redirect_stdout(out):
+                status, payload = getattr(self, name)(query, body, *args)
+        except HTTPError as err:
+            return err.status, {"error": str(err)}
+        except Exception as err:
+            return 500, {"error": f"{type(err).__name__}: {err}"}
+        message = out.getvalue().strip()
+        if message and isinstance(payload, dict):
+            payload = {**payload, "message": message}
+        return status, payload
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        path = unquote(url.path).rstrip("/") or "/"
+        path_matched = False
+        for route_method, pattern, name in ROUTES:
+            match = pattern.fullmatch(path)
+            if match and route_method == method:
+                break
+            path_matched = path_matched or match is not None
+        else:
+            if path_matched:
+                return 405, {"error": f"{method} not allowed on {path}"}
+            return 404, {"error": f"No route {path}"}
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError as err:
+            return 400, {"error": f"Invalid JSON body: {err}"}
+        if not isinstance(data, dict):
+            return 400, {"error": "Request body must be a JSON object"}
+        return await self._call(self._handle, name, match.groups(), query, data)
+
+    # ---------------- HTTP/1.1 ----------------
+
+    async def handle_connection(self, reader, writer):
+        """Serves requests on one connection until the client closes it or asks to."""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                    headers = dict(
+                        (name.strip().lower(), value.strip())
+                        for name, _, value in (line.partition(":") for line in lines[1:] if line)
+                    )
+                    body = await reader.readexactly(int(headers.get("content-length", 0)))
+                except (ValueError, asyncio.IncompleteReadError):
+                    await self._respond(writer, 400, {"error": "Malformed request"}, keep_alive=False)
+                    break
+
+                status, payload = await self.dispatch(method, target, body)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            data, content_type = json.dumps(payload, default=_json_default).encode(), "application/json"
+        head = f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+        if not keep_alive:
+            head += "Connection: close\r\n"
+        writer.write(head.encode() + b"\r\n" + data)
+        await writer.drain()
+
+
+async def start_server(host="127.0.0.1", port=8080):
+    """Loads the hotel and starts listening; returns (asyncio server, service)."""
+    service = HotelService()
+    await service.start()
+    server = await asyncio.start_server(service.handle_connection, host, port, backlog=1024)
+    return server, service
+
+
+async def serve(host, port):
+    server, service = await start_server(host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the hotel system as an HTTP/JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Fast startup for the desk clients: background loading and startup timing.
+
+The desk menus are shown as soon as the modules are imported. Records are
+loaded from the database on a background thread meanwhile (in_background),
+and the first menu action waits for that load if it is still running. Along
+the way the clients mark() the phases of startup. `--profile-startup` prints
+those marks and the slowest imports, then exits without waiting for input.
+
+Import this module first, so its clock starts before the other imports.
+"""
+import os
+import sys
+import threading
+import time
+
+_START = time.perf_counter()
+_marks = {}  # label -> seconds since _START, first time only
+
+
+def mark(label):
+    """Records when a startup phase finished; later marks of the same label are ignored."""
+    _marks.setdefault(label, time.perf_counter() - _START)
+
+
+# Result of a call running on a daemon thread, so exiting the menu never waits
+# for it (concurrent.futures would add its logging import to every startup)
+class Background:
+    def __init__(self, fn, *args):
+        self._done = threading.Event()
+        self._value = self._error = None
+        threading.Thread(target=self._run, args=(fn, args), name="warm-load", daemon=True).start()
+
+    def _run(self, fn, args):
+        try:
+            self._value = fn(*args)
+        except BaseException as exc:
+            self._error = exc
+        finally:
+            self._done.set()
+
+    def result(self):
+        """Waits for the call; returns its value or raises its exception."""
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+def in_background(fn, *args):
+    """Starts fn(*args) on a background thread; returns its Background."""
+    return Background(fn, *args)
+
+
+def _process_age():
+    """Seconds from process start to _START (Linux only, to the clock tick), or None."""
+    try:
+        with open("/proc/self/stat") as f:
+            started = int(f.read().rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return max(0.0, uptime - started - (time.perf_counter() - _START))
+
+
+def import_times(module, top=10):
+    """[(name, seconds)] for the slowest direct imports of `module`, timed in a fresh interpreter."""
+    import subprocess
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    found, children = [], []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative [us] | name", nested imports indented two
+        # spaces per level and listed before the module that imported them
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2][1:]
+        depth, seconds = (len(name) - len(name.lstrip(" "))) // 2, int(parts[1]) / 1e6
+        if depth == 1:
+            children.append((name.strip(), seconds))
+        elif depth == 0:
+            if name == module:
+                found = [(f"{module} (total)", seconds)] + sorted(children, key=lambda child: -child[1])[:top]
+            children = []
+    return found
+
+
+def report(module):
+    """Prints the marks so far and the slowest imports of `module`."""
+    print(f"\nStartup profile ({module}); milliseconds since its first import:")
+    age = _process_age()
+    if age is not None:
+        print(f"  {'python started':<32}{-age * 1e3:>8.1f}")
+    for label, seconds in sorted(_marks.items(), key=lambda item: item[1]):
+        print(f"  {label:<32}{seconds * 1e3:>8.1f}")
+    print("Slowest imports (fresh interpreter, python -X importtime):")
+    for name, seconds in import_times(module):
+        print(f"  {name:<32}{seconds * 1e3:>8.1f}")
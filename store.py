@@ -0,0 +1,101 @@
+"""Columnar reservation store backed by typed arrays.
+
+Each reservation is a position in parallel `array` columns (customer id, room
+number, start/end as day ordinals, status bits), so a stay costs about 17 bytes
+instead of a Python object, its dict and two date objects. Customer names are
+interned once and referenced by integer id. Suited to holding a long
+checked-out history in memory, e.g. for recomputing aggregates.
+
+With HOTEL_KEEP_HISTORY=1 the desk (imperative.HotelManagementSystem) reads
+the checked-out stays into a ReservationStore at startup, and history() and
+reports stream them from memory instead of querying the database each time.
+"""
+import os
+from array import array
+from datetime import date
+
+from aggregates import status_of
+from mydb import iter_rows
+
+KEEP_HISTORY = os.environ.get('HOTEL_KEEP_HISTORY', '0') == '1'  # hold checked-out stays in memory
+
+_CHECKED_IN = 1
+_CHECKED_OUT = 2
+
+
+def _ordinal(value):
+    return (value if isinstance(value, date) else date.fromisoformat(str(value))).toordinal()
+
+
+class ReservationStore:
+    """Append-only reservations in parallel arrays; rows come back in the reservations table's column order."""
+
+    def __init__(self):
+        self.customer_names = []  # customer id -> name
+        self._customer_ids = {}   # name -> customer id
+        self.customer_ids = array('i')
+        self.room_numbers = array('i')
+        self.starts = array('i')  # date ordinals
+        self.ends = array('i')
+        self.statuses = array('b')
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Builds a store from raw reservation rows (customer_name, room_number, start_date, end_date, checked_in, checked_out)."""
+        store = cls()
+        store.extend(rows)
+        return store
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(*row)
+
+    @classmethod
+    def load(cls, filters=()):
+        """Streams the matching reservations from the configured backend."""
+        return cls.from_rows(iter_rows("reservations", filters))
+
+    def append(self, customer_name, room_number, start_date, end_date, checked_in=False, checked_out=False):
+        """Adds a reservation; returns its position."""
+        customer_id = self._customer_ids.get(customer_name)
+        if customer_id is None:
+            customer_id = self._customer_ids[customer_name] = len(self.customer_names)
+            self.customer_names.append(customer_name)
+        self.customer_ids.append(customer_id)
+        self.room_numbers.append(int(room_number))
+        self.starts.append(_ordinal(start_date))
+        self.ends.append(_ordinal(end_date))
+        self.statuses.append((_CHECKED_IN if checked_in else 0) | (_CHECKED_OUT if checked_out else 0))
+        return len(self.statuses) - 1
+
+    def set_status(self, position, checked_in, checked_out):
+        self.statuses[position] = (_CHECKED_IN if checked_in else 0) | (_CHECKED_OUT if checked_out else 0)
+
+    def __len__(self):
+        return len(self.statuses)
+
+    def __getitem__(self, position):
+        status = self.statuses[position]
+        return (self.customer_names[self.customer_ids[position]], self.room_numbers[position],
+                date.fromordinal(self.starts[position]), date.fromordinal(self.ends[position]),
+                bool(status & _CHECKED_IN), bool(status & _CHECKED_OUT))
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    def facts(self, rooms):
+        """(room_type, price, start_date, end_date, status) per stay, as aggregates.recompute takes.
+
+        rooms maps room number -> (room_type, price); stays of unknown rooms are skipped.
+        """
+        for position in range(len(self)):
+            room = rooms.get(self.room_numbers[position])
+            if room is not None:
+                status = self.statuses[position]
+                yield (room[0], room[1], date.fromordinal(self.starts[position]), date.fromordinal(self.ends[position]),
+                       status_of(status & _CHECKED_IN, status & _CHECKED_OUT))
+
+    def nbytes(self):
+        """Bytes held by the column arrays (the interned names are extra)."""
+        columns = (self.customer_ids, self.room_numbers, self.starts, self.ends, self.statuses)
+        return sum(column.itemsize * len(column) for column in columns)
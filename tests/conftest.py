@@ -0,0 +1,21 @@
+import pytest
+
+import mydb
+import pricing
+
+
+@pytest.fixture
+def memory_db():
+    """A fresh in-memory database, with no rate plans, for each test."""
+    backend = mydb.configure("memory", write_behind=False, instrument=False)
+    pricing.configure({})
+    yield backend
+    mydb.shutdown()
+    pricing.configure({})
+
+
+@pytest.fixture
+def hotel(memory_db):
+    from imperative import HotelManagementSystem
+
+    return HotelManagementSystem()
@@ -0,0 +1,34 @@
+from datetime import date
+
+import mydb
+
+
+def _rooms(hotel, count):
+    for number in range(1, count + 1):
+        hotel.add_room(number, "Double", 120)
+
+
+def test_block_books_every_stay(hotel):
+    _rooms(hotel, 3)
+    guest = hotel.add_customer("Tour", "tour@example.com", "invoice")
+    stays = [("Double", date(2025, 5, 1), date(2025, 5, 4))] * 3
+
+    booked = hotel.assign_block(guest, stays)
+
+    assert sorted(reservation.room.room_number for reservation in booked) == [1, 2, 3]
+    assert len(list(mydb.iter_rows("reservations"))) == 3
+
+
+def test_block_books_nothing_when_another_desk_took_a_room(hotel):
+    _rooms(hotel, 3)
+    guest = hotel.add_customer("Tour", "tour@example.com", "invoice")
+    hotel.add_customer("Walk-in", "", "cash")
+    # Booked straight in the database, as another desk would; this desk's index has not seen it
+    assert mydb.book_reservation("Walk-in", 3, date(2025, 5, 2), date(2025, 5, 3))
+
+    assert hotel.assign_block(guest, [("Double", date(2025, 5, 1), date(2025, 5, 4))] * 3) is None
+
+    assert [row[0] for row in mydb.iter_rows("reservations")] == ["Walk-in"]
+    assert not hotel.repository.reservations
+    # The planned nights were handed back, so a smaller block still fits
+    assert len(hotel.assign_block(guest, [("Double", date(2025, 5, 1), date(2025, 5, 4))] * 2)) == 2
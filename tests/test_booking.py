@@ -0,0 +1,26 @@
+from datetime import date
+
+import mydb
+
+
+def test_overlapping_stay_is_turned_away(hotel):
+    hotel.add_room(101, "Single", 100)
+    guest = hotel.add_customer("Ann", "ann@example.com", "card")
+    assert hotel.make_reservation(guest, hotel.find_room(101), date(2025, 3, 1), date(2025, 3, 5))
+
+    assert hotel.make_reservation(guest, hotel.find_room(101), date(2025, 3, 4), date(2025, 3, 6)) is None
+    # Another desk is turned away by the database too; back to back stays are fine
+    assert mydb.book_reservation("Ann", 101, date(2025, 2, 27), date(2025, 3, 2)) is False
+    assert mydb.book_reservation("Ann", 101, date(2025, 3, 5), date(2025, 3, 7))
+
+
+def test_early_departure_frees_the_rest_of_the_stay(hotel):
+    hotel.add_room(101, "Single", 100)
+    ann = hotel.add_customer("Ann", "ann@example.com", "card")
+    bob = hotel.add_customer("Bob", "bob@example.com", "cash")
+    stay = hotel.make_reservation(ann, hotel.find_room(101), date(2025, 3, 1), date(2025, 3, 8))
+    hotel.check_in(stay)
+    hotel.check_out(stay)
+
+    assert hotel.make_reservation(bob, hotel.find_room(101), date(2025, 3, 4), date(2025, 3, 6))
+    assert mydb.book_reservation("Ann", 101, date(2025, 3, 6), date(2025, 3, 8))
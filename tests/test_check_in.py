@@ -0,0 +1,48 @@
+from datetime import date
+
+import mydb
+
+
+def test_check_in_skips_a_checked_out_stay_in_the_same_room(hotel):
+    hotel.add_room(101, "Single", 100)
+    guest = hotel.add_customer("Ann", "ann@example.com", "card")
+    first = hotel.make_reservation(guest, hotel.find_room(101), date(2025, 3, 1), date(2025, 3, 3))
+    second = hotel.make_reservation(guest, hotel.find_room(101), date(2025, 3, 10), date(2025, 3, 12))
+    hotel.check_in(first)
+    hotel.check_out(first)
+
+    found = hotel.repository.find_reservation("Ann", 101, checked_in=False, checked_out=False)
+    assert found is second
+    hotel.check_in(found)
+    assert first.checked_out and not first.checked_in
+    assert second.checked_in
+    rows = {row[2]: row for row in mydb.iter_rows("reservations")}
+    assert rows[date(2025, 3, 1)][5]
+    assert rows[date(2025, 3, 10)][4] and not rows[date(2025, 3, 10)][5]
+
+
+def test_functional_desk_checks_in_and_out_one_stay_at_a_time(memory_db):
+    import functional
+
+    state = functional.load_state([], [], [])
+    state = functional.add_room(state, functional.create_room(101, "Single", 200))
+    state = functional.add_customer(state, functional.create_customer("Ann", "ann@example.com", "card"))
+    for start_date, end_date in ((date(2025, 3, 10), date(2025, 3, 11)), (date(2025, 3, 1), date(2025, 3, 2))):
+        reservation, availability = functional.create_reservation(
+            state.customers["Ann"], state.rooms[101], start_date, end_date, state.availability)
+        state = functional.add_reservation(state, reservation, availability)
+
+    def statuses():
+        return {row[2]: (bool(row[4]), bool(row[5])) for row in mydb.iter_rows("reservations")}
+
+    state = functional.check_in_reservation(state, "Ann", 101)
+    assert statuses() == {date(2025, 3, 1): (True, False), date(2025, 3, 10): (False, False)}
+    state, first_bill = functional.check_out_reservation(state, "Ann", 101)
+    assert statuses() == {date(2025, 3, 1): (True, True), date(2025, 3, 10): (False, False)}
+
+    state = functional.check_in_reservation(state, "Ann", 101)
+    state, second_bill = functional.check_out_reservation(state, "Ann", 101)
+    assert statuses() == {date(2025, 3, 1): (True, True), date(2025, 3, 10): (True, True)}
+    assert first_bill + second_bill == 400
+    # Nothing is left to check out, and the closed stays are not billed again
+    assert functional.check_out_reservation(state, "Ann", 101)[1] == 0
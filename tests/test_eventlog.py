@@ -0,0 +1,39 @@
+import eventlog
+import mydb
+
+
+def _desk(monkeypatch, directory):
+    from imperative import HotelManagementSystem
+
+    monkeypatch.setattr(eventlog, "EVENT_LOG", str(directory))
+    hotel = HotelManagementSystem()
+    hotel.events.close()
+    return hotel
+
+
+def test_desk_starts_from_the_database_after_an_unlogged_write(memory_db, monkeypatch, tmp_path):
+    monkeypatch.setattr(mydb, "_logged", False)
+    hotel = _desk(monkeypatch, tmp_path)
+    hotel.add_room(1, "Single", 100)
+    assert sorted(_desk(monkeypatch, tmp_path).repository.rooms) == [1]
+
+    # A writer without a log, such as bulk_import.py or night_audit.py
+    monkeypatch.setattr(mydb, "_logged", False)
+    mydb.add_record("rooms", (2, "Double", 120, True))
+
+    assert sorted(_desk(monkeypatch, tmp_path).repository.rooms) == [1, 2]
+
+
+def test_failed_and_refused_writes_are_not_counted(memory_db, monkeypatch):
+    from datetime import date
+
+    monkeypatch.setattr(mydb, "_logged", False)
+    mydb.add_record("rooms", (1, "Single", 100, True))
+    mydb.add_record("customers", ("Ann", "ann@example.com", "card"))
+    assert mydb.book_reservation("Ann", 1, date(2025, 3, 1), date(2025, 3, 3))
+    counted = mydb.unlogged_writes()
+
+    mydb.add_record("rooms", (1, "Single", 100, True))  # Duplicate key: the insert fails
+    assert mydb.book_reservation("Ann", 1, date(2025, 3, 2), date(2025, 3, 4)) is False
+
+    assert mydb.unlogged_writes() == counted
@@ -0,0 +1,50 @@
+from datetime import date
+from decimal import Decimal
+from itertools import chain
+
+import pricing
+import reports
+from imperative import Billing
+from pricing import RatePlan, Season
+
+
+def _priced_hotel(hotel):
+    # Summer and weekend surcharges with a long-stay discount, so nights and bills round differently
+    pricing.configure({
+        "Single": RatePlan([Season("summer", (6, 1), (9, 1), Decimal("1.35"))], Decimal("1.15"),
+                           long_stay=[(7, "0.1")]),
+        "Suite": RatePlan(weekend=Decimal("1.2"), long_stay=[(3, "0.05")]),
+    })
+    hotel.add_room(101, "Single", 99.99)
+    hotel.add_room(201, "Suite", 249.95)
+    ann = hotel.add_customer("Ann", "ann@example.com", "card")
+    bob = hotel.add_customer("Bob", "bob@example.com", "cash")
+    stays = [
+        hotel.make_reservation(ann, hotel.find_room(101), date(2025, 5, 28), date(2025, 6, 6)),
+        hotel.make_reservation(bob, hotel.find_room(201), date(2025, 6, 13), date(2025, 6, 17)),
+        hotel.make_reservation(bob, hotel.find_room(101), date(2025, 6, 20), date(2025, 6, 22)),
+    ]
+    hotel.check_in(stays[0])
+    hotel.check_out(stays[0])
+    hotel.check_in(stays[1])
+    return stays
+
+
+def test_report_revenue_is_the_sum_of_the_bills(hotel):
+    stays = _priced_hotel(hotel)
+
+    billed = sum(Billing.generate_bill(reservation) for reservation in stays)
+    hotel.generate_report()
+    assert hotel.aggregates.revenue() == billed
+    assert hotel.check_aggregates() == []
+
+
+def test_sharded_report_bills_match_billing(hotel):
+    _priced_hotel(hotel)
+    start_date, end_date = date(2025, 5, 1), date(2025, 7, 1)
+
+    totals, _ = reports.generate(start_date, end_date, workers=1)
+
+    _, bills = reports.billed_totals(chain(hotel.reservations, hotel.history()), start_date, end_date)
+    assert totals.bills_by_status == bills
+    assert reports.check(totals, start_date, end_date) == []
@@ -0,0 +1,18 @@
+import mydb
+
+
+def test_customer_index_is_built_on_first_lookup(memory_db):
+    from imperative import HotelManagementSystem
+
+    mydb.add_record("customers", ("Ann-Marie O'Neil", "ann@example.com", "card"))
+    hotel = HotelManagementSystem()
+    assert hotel._customer_index is None
+
+    hotel.add_customer("Bob Stone", "bob@example.com", "cash")
+    assert hotel._customer_index is None
+    assert hotel.customer_index.exact("ann marie o'neil") == "Ann-Marie O'Neil"
+
+    # Once built, the index takes new customers as they are added
+    hotel.add_customer("Carla Reyes", "carla@example.com", "card")
+    assert [customer.name for customer in hotel.search_customers("Carla Reyse")] == ["Carla Reyes"]
+    assert hotel.customer_index.exact("bob stone") == "Bob Stone"
@@ -0,0 +1,30 @@
+import asyncio
+
+from server import HotelService
+
+
+def _get(service, target):
+    async def request():
+        await service.start()
+        return await service.dispatch("GET", target, b"")
+
+    return asyncio.run(request())
+
+
+def test_unknown_reservation_status_is_a_bad_request(memory_db):
+    service = HotelService()
+    try:
+        status, payload = _get(service, "/reservations?status=cancelled")
+    finally:
+        service.close()
+
+    assert status == 400
+    assert "cancelled" in payload["error"]
+
+
+def test_reservations_filter_by_status(memory_db):
+    service = HotelService()
+    try:
+        assert _get(service, "/reservations?status=checked_in") == (200, [])
+    finally:
+        service.close()
@@ -0,0 +1,34 @@
+from datetime import date
+
+import mydb
+from store import ReservationStore
+
+
+def test_rows_round_trip_through_the_arrays():
+    rows = [("Ann", 101, date(2025, 3, 1), date(2025, 3, 3), True, True),
+            ("Bob", 102, date(2025, 3, 2), date(2025, 3, 4), False, False),
+            ("Ann", 102, date(2025, 3, 5), date(2025, 3, 6), True, False)]
+    store = ReservationStore.from_rows(rows)
+
+    assert list(store) == rows
+    assert store.customer_names == ["Ann", "Bob"]
+    store.set_status(1, True, True)
+    assert store[1][4:] == (True, True)
+    assert [fact[4] for fact in store.facts({101: ("Single", 100)})] == ["checked_out"]
+
+
+def test_desk_keeps_checked_out_history_in_the_store(memory_db):
+    from imperative import HotelManagementSystem
+
+    mydb.add_record("rooms", (101, "Single", 100, True))
+    mydb.add_record("customers", ("Ann", "ann@example.com", "card"))
+    mydb.add_record("reservations", ("Ann", 101, date(2025, 3, 1), date(2025, 3, 3)))
+    mydb.add_record("reservations", ("Ann", 101, date(2025, 3, 10), date(2025, 3, 12)))
+    mydb.update_record("reservations", {"checked_in": True, "checked_out": True}, ("Ann", 101, date(2025, 3, 1)))
+
+    hotel = HotelManagementSystem(keep_history=True)
+
+    assert list(hotel.repository.history) == [("Ann", 101, date(2025, 3, 1), date(2025, 3, 3), True, True)]
+    assert [(res.start_date, res.checked_out) for res in hotel.history()] == [(date(2025, 3, 1), True)]
+    assert len(hotel.reservations) == 1
+    assert hotel.check_aggregates() == []
@@ -0,0 +1,109 @@
+"""Write-behind queue with group commit.
+
+Business operations submit their database changes as one unit and carry on; a
+background thread drains the queue and commits everything waiting (up to
+flush_size changes, or whatever arrived within flush_interval seconds) in a
+single transaction. A check-in storm then costs one commit per batch instead of
+one per statement.
+
+Units are committed in the order they were submitted, and a unit is never split
+across transactions. If a batch fails, its units are retried one at a time so a
+bad unit does not take the others down with it.
+"""
+import queue
+import threading
+import time
+
+
+class WriteBehindQueue:
+    """Bounded FIFO of change units, committed in batches by one writer thread.
+
+    apply(changes) must apply a list of changes in one transaction, raising on failure.
+    """
+
+    def __init__(self, apply, max_pending=10000, flush_interval=0.01, flush_size=500):
+        self._apply = apply
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self._queue = queue.Queue(max_pending)  # Full queue blocks submit(): backpressure
+        self._pending = 0                       # Units submitted but not yet committed
+        self._idle = threading.Condition()
+        self._closed = False
+        # Counters for benchmarks and monitoring
+        self.units = 0
+        self.changes = 0
+        self.commits = 0
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, changes):
+        """Queues one operation's changes; they will be committed together."""
+        if self._closed:
+            raise RuntimeError("Write-behind queue is closed")
+        with self._idle:
+            self._pending += 1
+        self._queue.put(list(changes))
+
+    def flush(self):
+        """Blocks until everything submitted so far is committed."""
+        with self._idle:
+            while self._pending:
+                self._idle.wait()
+
+    def close(self):
+        """Commits what is queued and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    # ---------------- writer thread ----------------
+
+    def _collect(self, first):
+        """Gathers the batch that starts with `first`; returns (batch, stop requested)."""
+        batch, size = [first], len(first)
+        deadline = time.monotonic() + self.flush_interval
+        while size < self.flush_size:
+            try:
+                unit = self._queue.get_nowait()
+            except queue.Empty:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    unit = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if unit is None:
+                return batch, True
+            batch.append(unit)
+            size += len(unit)
+        return batch, False
+
+    def _commit(self, batch):
+        try:
+            self._apply([change for unit in batch for change in unit])
+            self.commits += 1
+        except Exception:
+            # Fall back to one transaction per unit so only the bad ones are lost
+            for unit in batch:
+                try:
+                    self._apply(unit)
+                    self.commits += 1
+                except Exception as err:
+                    print(f"Error writing queued changes {unit}: {err}")
+        self.units += len(batch)
+        self.changes += sum(len(unit) for unit in batch)
+        with self._idle:
+            self._pending -= len(batch)
+            self._idle.notify_all()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            self._commit(batch)